@@ -0,0 +1,241 @@
+from pymongo import UpdateOne, ReplaceOne, ASCENDING, DESCENDING
+from database import MongoDB
+from scrapers.common import pprint
+from collections import Counter
+import argparse
+import hashlib
+import json
+import time
+
+# Number of job posts whose contribution is computed and written at once
+BATCH_SIZE = 500
+
+# Skill classes counted as n-grams, and the job post field holding the noun chunks of each one
+SKILL_KINDS = {'hard_skill': 'hard_skills', 'soft_skill': 'soft_skills'}
+
+# Same n-grams as the `CountVectorizer` of `compute_frequencies()` in notebooks 3, 5 and 6
+NGRAM_RANGE = (1, 2)
+
+# Fields of the job posts that the counts are broken down by, the whole corpus is kept under `all`
+DIMENSIONS = ('role', 'industry', 'level', 'date')
+
+# Fields of the job posts their contribution depends on, a refreshed description always comes with a new `last_accessed`
+FINGERPRINT_FIELDS = ('last_accessed', 'roles', 'industry', 'level') + tuple(SKILL_KINDS.values())
+
+# Fields of the count documents, their `_id` is a sub-document of the same fields
+COUNT_KEY = ('kind', 'dimension', 'value', 'term')
+
+def build_analyzer():
+    '''
+    Returns the tokenizer of `compute_frequencies()`, turning a noun chunk into its n-grams without English stop words.
+    '''
+
+    from sklearn.feature_extraction.text import CountVectorizer
+    return CountVectorizer(ngram_range=NGRAM_RANGE, analyzer='word', stop_words='english').build_analyzer()
+
+def post_dimensions(document: dict) -> list:
+    '''
+    Lists the `(dimension, value)` groups a job post is counted in.
+    '''
+
+    groups = [('all', '')]
+    groups += [('role', role) for role in document.get('roles') or []]
+    for dimension, field in (('industry', 'industry'), ('level', 'level')):
+        if document.get(field):
+            groups.append((dimension, document[field]))
+    if document.get('last_accessed'):
+        groups.append(('date', document['last_accessed'].strftime('%Y-%m-%d')))
+    return groups
+
+class AggregateStore:
+    '''
+    Maintains the skill n-gram and word counts of the job posts in the `aggregates` collection, per role, industry,
+    level and scrape date, so that top skill reports are a lookup instead of a pass over the corpus.
+
+    The terms and groups each job post was counted with are kept in the `aggregated` collection. When a job post is
+    inserted, labelled again by `classify.py` or scraped again, only the difference to its previous contribution is
+    applied with `$inc`. When it is deleted, its previous contribution is subtracted.
+
+    Args:
+    -------
+    - `database` (MongoDB): The database containing the job posts
+
+    Methods:
+    -------
+    - `prune()`:  Subtracts the job posts which are no longer in the database from the counts
+    - `update()`: Applies the changes of the new, modified and deleted job posts to the counts
+    - `top()`:    Looks up the most frequent terms of a group
+    '''
+
+    def __init__(self, database: MongoDB):
+        self.name = self.__class__.__name__
+        self.database = database
+        self.counts = database.db.aggregates
+        self.snapshots = database.db.aggregated
+        self.analyzer = None
+
+        # Counts written while the `_id` was a joined string are rebuilt from scratch by the next `update()`
+        if self.counts.find_one({'_id': {'$type': 'string'}}, {'_id': 1}) is not None:
+            self.counts.drop()
+            self.snapshots.drop()
+
+        self.counts.create_index([('kind', ASCENDING), ('dimension', ASCENDING), ('value', ASCENDING), ('count', DESCENDING)])
+
+    def contribution(self, document: dict) -> dict:
+        '''
+        Computes what a job post adds to the counts.
+
+        Returns:
+        -------
+        - `dict`: The groups of the job post and, for each kind, pairs of `[term, count]`
+        '''
+
+        if self.analyzer is None:
+            self.analyzer = build_analyzer()
+
+        terms = {'posts': [['', 1]], 'word': list(map(list, Counter(str(document.get('description') or '').split()).items()))}
+        for kind, field in SKILL_KINDS.items():
+            ngrams = Counter(ngram for chunk in document.get(field) or [] for ngram in self.analyzer(chunk))
+            terms[kind] = list(map(list, ngrams.items()))
+        return {'groups': list(map(list, post_dimensions(document))), 'terms': terms}
+
+    @staticmethod
+    def fingerprint(document: dict) -> list:
+        # The labelled skills are hashed, so that relabelling by `classify.py` is noticed without storing them twice
+        skills = json.dumps([document.get(field) or [] for field in SKILL_KINDS.values()])
+        return [hashlib.sha1(skills.encode('utf-8')).hexdigest(), document.get('last_accessed'), document.get('roles'),
+                document.get('industry'), document.get('level')]
+
+    @staticmethod
+    def apply(delta: Counter, contribution: dict, sign: int) -> None:
+        for dimension, value in contribution['groups']:
+            for kind, terms in contribution['terms'].items():
+                for term, count in terms:
+                    delta[(kind, dimension, value, term)] += sign * count
+
+    def pending(self) -> list:
+        '''
+        Lists the ids of the job posts that are new or changed since they were last counted, without reading the descriptions.
+        '''
+
+        stored = {document['_id']: document['fingerprint'] for document in self.snapshots.find({}, {'fingerprint': 1})}
+        projection = dict.fromkeys(FINGERPRINT_FIELDS, 1)
+        return [document['_id'] for document in self.database.find(projection, batch_size=BATCH_SIZE)
+                if stored.get(document['_id']) != self.fingerprint(document)]
+
+    def write(self, delta: Counter) -> None:
+        '''
+        Applies the merged changes of a batch to the counts, removing the terms which dropped to zero.
+        '''
+
+        # Terms of a batch are merged first, so each one is written once no matter how many job posts contain it
+        requests = [UpdateOne({'_id': dict(zip(COUNT_KEY, key))},
+                              {'$inc': {'count': count}, '$setOnInsert': dict(zip(COUNT_KEY, key))},
+                              upsert=True)
+                    for key, count in delta.items() if count]
+        if requests:
+            self.counts.bulk_write(requests, ordered=False)
+
+        # Only the terms decreased by this batch may have dropped to zero, they are looked up by `_id`
+        decreased = [dict(zip(COUNT_KEY, key)) for key, count in delta.items() if count < 0]
+        if decreased:
+            self.counts.delete_many({'_id': {'$in': decreased}, 'count': {'$lte': 0}})
+
+    def prune(self, batch_size: int = BATCH_SIZE) -> int:
+        '''
+        Subtracts the contribution of the job posts which are no longer in the database and removes their snapshots.
+
+        Args:
+        -------
+        - `batch_size` (int, optional): How many job posts are subtracted and written at once
+
+        Returns:
+        -------
+        - `int`: The number of removed job posts
+        '''
+
+        jobs = {document['_id'] for document in self.database.find({'_id': 1})}
+        orphans = [document['_id'] for document in self.snapshots.find({}, {'_id': 1}) if document['_id'] not in jobs]
+
+        for i in range(0, len(orphans), batch_size):
+            ids = orphans[i:i + batch_size]
+            delta = Counter()
+            for snapshot in self.snapshots.find({'_id': {'$in': ids}}):
+                self.apply(delta, snapshot, -1)
+            self.write(delta)
+            self.snapshots.delete_many({'_id': {'$in': ids}})
+        return len(orphans)
+
+    def update(self, batch_size: int = BATCH_SIZE) -> int:
+        '''
+        Applies the contribution of the new and changed job posts to the counts, subtracting what they were counted with before,
+        and subtracts the deleted job posts.
+
+        Args:
+        -------
+        - `batch_size` (int, optional): How many job posts are processed and written at once
+
+        Returns:
+        -------
+        - `int`: The number of job posts counted again
+        '''
+
+        start = time.time()
+        pending = self.pending()
+
+        for i in range(0, len(pending), batch_size):
+            ids = pending[i:i + batch_size]
+            previous = {document['_id']: document for document in self.snapshots.find({'_id': {'$in': ids}})}
+
+            delta = Counter()
+            snapshots = []
+            for document in self.database.find(None, {'_id': {'$in': ids}}):
+                contribution = self.contribution(document)
+                if document['_id'] in previous:
+                    self.apply(delta, previous[document['_id']], -1)
+                self.apply(delta, contribution, 1)
+
+                contribution.update({'_id': document['_id'], 'fingerprint': self.fingerprint(document)})
+                snapshots.append(ReplaceOne({'_id': document['_id']}, contribution, upsert=True))
+
+            self.write(delta)
+            if snapshots:
+                self.snapshots.bulk_write(snapshots, ordered=False)
+
+        pruned = self.prune(batch_size)
+        pprint(msg=f'Updated the counts of {len(pending)} new or changed job posts and removed {pruned} deleted ones '
+                   f'in {round(time.time() - start, 2)} seconds.', type=1, prefix=self.name)
+        return len(pending)
+
+    def top(self, kind: str = 'hard_skill', dimension: str = 'all', value: str = '', num: int = 20) -> list:
+        '''
+        Looks up the most frequent terms of a group.
+
+        Args:
+        -------
+        - `kind`      (str, optional): `hard_skill`, `soft_skill`, `word`, or `posts` for the number of job posts
+        - `dimension` (str, optional): `all`, `role`, `industry`, `level` or `date`
+        - `value`     (str, optional): The value of the dimension, e.g. `Data Analyst` or `2023-02-14`
+        - `num`       (int, optional): How many terms are returned, 0 returns all of them
+
+        Returns:
+        -------
+        - `list`: Tuples of `(term, count)`, most frequent first
+        '''
+
+        query = {'kind': kind, 'dimension': dimension, 'value': value}
+        cursor = self.counts.find(query, {'term': 1, 'count': 1}).sort([('count', DESCENDING), ('term', ASCENDING)]).limit(num)
+        return [(document['term'], document['count']) for document in cursor]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update the skill and word counts and show the most frequent terms.')
+    parser.add_argument('--kind', default='hard_skill', choices=['hard_skill', 'soft_skill', 'word', 'posts'])
+    parser.add_argument('--dimension', default='all', choices=('all',) + DIMENSIONS)
+    parser.add_argument('--value', default='')
+    parser.add_argument('--num', type=int, default=20)
+    args = parser.parse_args()
+
+    store = AggregateStore(MongoDB())
+    store.update()
+    for term, count in store.top(args.kind, args.dimension, args.value, args.num):
+        print(f'{count:8d}  {term}')
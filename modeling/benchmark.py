@@ -0,0 +1,414 @@
+from database import MongoDB
+from scrapers.common import REGEX_ROLES, filter_job, match_roles
+from datetime import datetime
+import argparse
+import random
+import time
+import re
+
+def make_client(mongomock: bool):
+    '''
+    Creates the client used by a benchmark, either for a local mongod or for an in-memory mongomock.
+    '''
+
+    if mongomock:
+        import mongomock
+        return mongomock.MongoClient()
+    from pymongo import MongoClient
+    return MongoClient('localhost', 27017)
+
+def make_documents(amount: int, seed: int = 0) -> list:
+    '''
+    Generates job posts resembling the scraped ones.
+    '''
+
+    rng = random.Random(seed)
+    words = ['python', 'sql', 'spark', 'statistics', 'communication', 'cloud', 'docker', 'teamwork']
+    return [{
+        '_id':           i,
+        'url':           f'https://example.com/jobs/{i}',
+        'title':         'Data Scientist',
+        'roles':         ['Data Scientist'],
+        'company':       f'Company {i % 100}',
+        'location':      'Athens, Greece',
+        'type':          'Full-time',
+        'level':         'Mid-Senior level',
+        'industry':      'IT Services and IT Consulting',
+        'workplace':     'Hybrid',
+        'description':   ' '.join(rng.choices(words, k=300)),
+        'last_accessed': datetime.utcnow()
+    } for i in range(1, amount + 1)]
+
+def benchmark_insert(args) -> None:
+    '''
+    Compares one request per document against the bulk write path of `MongoDB.insert_documents`.
+    '''
+
+    database = MongoDB(client=make_client(args.mongomock), database='benchmark')
+    documents = make_documents(args.documents)
+
+    def run(name, func):
+        # Job posts are written into an indexed collection, as by the crawler
+        database.jobs.drop()
+        database.ensure_indexes()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print(f'{name:<24} {elapsed:8.3f} s {args.documents / elapsed:12.0f} docs/s')
+
+    def insert_one_by_one():
+        for document in documents:
+            database.jobs.insert_one(document)
+
+    run('insert_one', insert_one_by_one)
+    run('insert_many', lambda: database.insert_documents(documents, batch_size=args.batch_size, upsert=False))
+    run('bulk upsert (new)', lambda: database.insert_documents(documents, batch_size=args.batch_size))
+
+    # Measure the refresh of documents which are already stored, as happens when posts are scraped again
+    for document in documents:
+        document['last_accessed'] = datetime.utcnow()
+    start = time.perf_counter()
+    database.insert_documents(documents, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f'{"bulk upsert (existing)":<24} {elapsed:8.3f} s {args.documents / elapsed:12.0f} docs/s')
+
+    database.client.drop_database('benchmark')
+
+def filter_job_reference(job_role: str) -> list:
+    '''
+    The original role matching, searching every uncompiled expression separately.
+    '''
+
+    roles = []
+    for role in REGEX_ROLES:
+        for reg_ex in REGEX_ROLES[role]:
+            if re.search(reg_ex, job_role) != None:
+                roles.append(role)
+    return roles
+
+def make_titles(amount: int, seed: int = 0) -> list:
+    '''
+    Generates job titles combining common fragments, with repetitions as found in search results.
+    '''
+
+    rng = random.Random(seed)
+    prefixes = ['', 'Senior ', 'Junior ', 'Lead ', 'Principal ', '(Senior) ', 'Mid-level ']
+    cores = ['Data Scientist', 'data scientist', 'Data-Analyst', 'Data Analyst', 'Machine Learning Engineer',
+             'ML Engineer', 'MLOps Engineer', 'ML Ops Specialist', 'Deep Learning Researcher', 'AI Engineer',
+             'Artificial Intelligence Lead', '(AI) Consultant', 'Data Engineer', 'Big Data Engineer', 'Backend Developer',
+             'Business Analyst', 'Maintenance Technician', 'Sales Associate', 'Email Marketing Specialist', 'Data Science Manager']
+    suffixes = ['', ' - Athens', ' (Remote)', ' / Machine Learning', ' | AI', ' - Hybrid, Greece', ' with Data Engineering skills']
+    titles = [rng.choice(prefixes) + rng.choice(cores) + rng.choice(suffixes) for _ in range(amount)]
+
+    # Make part of the titles unique, as if they contained job specific text
+    for i in rng.sample(range(amount), amount // 10):
+        titles[i] += f' #{i}'
+    return titles
+
+def benchmark_roles(args) -> None:
+    '''
+    Compares the compiled role classifier against the original implementation of `filter_job`.
+    '''
+
+    titles = make_titles(args.titles)
+
+    mismatches = [title for title in titles if filter_job(title) != filter_job_reference(title)]
+    print(f'Equivalence: {len(titles) - len(mismatches)}/{len(titles)} titles produce the same roles')
+    for title in mismatches[:10]:
+        print(f'  {title!r}: {filter_job(title)} != {filter_job_reference(title)}')
+
+    def run(name, func):
+        start = time.perf_counter()
+        for title in titles:
+            func(title)
+        elapsed = time.perf_counter() - start
+        print(f'{name:<24} {elapsed:8.3f} s {len(titles) / elapsed:12.0f} titles/s')
+
+    run('reference', filter_job_reference)
+    match_roles.cache_clear()
+    run('compiled (no cache)', lambda title: match_roles.__wrapped__(title.strip()))
+    run('compiled (cold cache)', filter_job)
+    run('compiled (warm cache)', filter_job)
+
+def make_descriptions(amount: int, seed: int = 0) -> list:
+    '''
+    Generates descriptions with the formatting found in job posts: lines, bullets, e-mails, links, hashtags and Greek text.
+    '''
+
+    rng = random.Random(seed)
+    lines = ['We are looking for a Data Scientist to join our team!', '• Experience with Python, SQL & Spark (e.g. PySpark)',
+             'Send your CV to jobs@example.com', 'Visit https://www.example.com/careers for more', '#hiring #datascience',
+             'Ψάχνουμε έναν Data Engineer στην Αθήνα', 'Strong communication skills, i.e. presenting results',
+             '  - Cloud platforms (AWS/GCP/Azure)', 'Competitive salary + benefits']
+    return ['\n'.join(rng.choices(lines, k=rng.randint(5, 15))) for _ in range(amount)]
+
+def benchmark_normalize(args) -> None:
+    '''
+    Compares the throughput of the shared text normalization against the cleanup used in the notebooks. Both produce
+    the same text, see `tests/test_preprocessing.py`.
+    '''
+
+    import pandas as pd
+    from preprocessing import clean_descriptions, REPLACEMENTS, GREEK_CHARS
+
+    descriptions = pd.Series(make_descriptions(args.descriptions))
+
+    def notebook_cleanup(series):
+        def remove_greek(desc):
+            translation_table = dict.fromkeys(map(ord, GREEK_CHARS), None)
+            return desc.translate(translation_table)
+        series = series.apply(lambda x: remove_greek(x))
+        return series.replace(dict(REPLACEMENTS), regex=True)
+
+    def run(name, func):
+        start = time.perf_counter()
+        result = func(descriptions)
+        elapsed = time.perf_counter() - start
+        print(f'{name:<24} {elapsed:8.3f} s {len(descriptions) / elapsed:12.0f} descriptions/s')
+        return result
+
+    run('notebook', notebook_cleanup)
+    run('preprocessing', clean_descriptions)
+
+def benchmark_embeddings(args) -> None:
+    '''
+    Compares the nearest neighbour search of the notebooks against `EmbeddingIndex`.
+    '''
+
+    import numpy as np
+    from numpy.linalg import norm
+    from embeddings import EmbeddingIndex
+
+    index = EmbeddingIndex.from_tsv(f'{args.embeddings}_vectors.tsv', f'{args.embeddings}_metadata.tsv')
+    weights, inverse_voc = index.vectors, index.index
+    queries = random.Random(0).sample(index.words, min(args.queries, len(index)))
+
+    def notebook_most_similar(word, num):
+        similar = []
+        word_w = weights[inverse_voc[word]]
+        for key, value in inverse_voc.items():
+            if word == key:
+                continue
+            cosine = np.dot(word_w, weights[inverse_voc[key]])/(norm(word_w)*norm(weights[inverse_voc[key]]))
+            similar.append((key, cosine))
+        similar.sort(key=lambda x: x[1], reverse=True)
+        return similar[:num]
+
+    def run(name, func):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        print(f'{name:<24} {elapsed:8.3f} s {elapsed / len(queries) * 1000:10.3f} ms/query')
+        return result
+
+    expected = run('notebook', lambda: [notebook_most_similar(word, 10) for word in queries])
+    single   = run('index', lambda: [index.most_similar(word, 10) for word in queries])
+    batch    = run('index (batch)', lambda: index.most_similar_batch(queries, 10))
+
+    matches = sum([w for w, _ in a] == [w for w, _ in b] == [w for w, _ in c] for a, b, c in zip(expected, single, batch))
+    print(f'Equivalence: {matches}/{len(queries)} queries return the same words')
+
+def benchmark_store(args) -> None:
+    '''
+    Compares loading the TSV embeddings against the binary store, in both precisions.
+    '''
+
+    import os
+    import tempfile
+    from embeddings import EmbeddingIndex, tsv_to_store
+
+    vectors_path, metadata_path = f'{args.embeddings}_vectors.tsv', f'{args.embeddings}_metadata.tsv'
+
+    def run(name, func, size):
+        start = time.perf_counter()
+        index = func()
+        index.most_similar(index.words[0], 10)
+        elapsed = time.perf_counter() - start
+        print(f'{name:<24} {elapsed * 1000:10.3f} ms {size / 2**20:10.2f} MiB')
+        return index
+
+    expected = run('tsv', lambda: EmbeddingIndex.from_tsv(vectors_path, metadata_path), os.path.getsize(vectors_path))
+    queries = expected.words[:args.queries]
+
+    with tempfile.TemporaryDirectory() as directory:
+        for dtype in ('float32', 'float16'):
+            store = os.path.join(directory, dtype)
+            tsv_to_store(vectors_path, metadata_path, store, dtype)
+            size = os.path.getsize(store + '.npy')
+            run(f'npy {dtype}', lambda: EmbeddingIndex.load(store, mmap=False), size)
+            index = run(f'npy {dtype} (mmap)', lambda: EmbeddingIndex.load(store), size)
+
+            matches = sum([w for w, _ in a] == [w for w, _ in b]
+                          for a, b in zip(expected.most_similar_batch(queries, 10), index.most_similar_batch(queries, 10)))
+            print(f'Equivalence ({dtype}): {matches}/{len(queries)} queries return the same words')
+            del index
+
+def make_sequences(amount: int, vocab_size: int, length: int, seed: int = 0):
+    '''
+    Creates padded, integer encoded noun chunks with Zipf distributed words, as produced by `TextVectorization`.
+    '''
+
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    words = np.minimum(rng.zipf(1.3, size=(amount, length)), vocab_size - 1)
+    lengths = rng.integers(1, 6, size=amount)
+    words[np.arange(length) >= lengths[:, None]] = 0
+    return words
+
+def benchmark_skipgrams(args) -> None:
+    '''
+    Compares the throughput of a loop over the sequences, following the notebook, against the vectorized skip-gram
+    generator. Both produce the same pairs and distribution of negative samples, see `tests/test_skipgrams.py`.
+    '''
+
+    import numpy as np
+    from skipgrams import generate_training_data, make_sampling_table
+
+    sequences = make_sequences(args.sequences, args.vocab_size, 18)
+    sampling_table = make_sampling_table(args.vocab_size)
+
+    def notebook_generate(sequences):
+        # skipgrams() and log_uniform_candidate_sampler(unique=True) without TensorFlow, one pair at a time
+        rng = random.Random(0)
+        log_range = np.log(args.vocab_size + 1)
+        targets, contexts, labels = [], [], []
+        for sequence in sequences:
+            couples = []
+            for i, wi in enumerate(sequence):
+                if not wi or sampling_table[wi] < rng.random():
+                    continue
+                for j in range(max(0, i - args.window_size), min(len(sequence), i + args.window_size + 1)):
+                    if j != i and sequence[j]:
+                        couples.append((wi, sequence[j]))
+            rng.shuffle(couples)
+            for target_word, context_word in couples:
+                negatives = []
+                while len(negatives) < args.num_ns:
+                    candidate = min(int(np.exp(rng.random() * log_range)) - 1, args.vocab_size - 1)
+                    if candidate not in negatives:
+                        negatives.append(candidate)
+                targets.append(target_word)
+                contexts.append([context_word] + negatives)
+                labels.append([1] + [0] * args.num_ns)
+        return np.array(targets), np.array(contexts), np.array(labels)
+
+    def vectorized_generate(sequences):
+        chunks = list(generate_training_data(sequences, args.window_size, args.num_ns, args.vocab_size, seed=0))
+        return tuple(np.concatenate(arrays) for arrays in zip(*chunks))
+
+    def run(name, func):
+        start = time.perf_counter()
+        targets, contexts, labels = func(sequences)
+        elapsed = time.perf_counter() - start
+        print(f'{name:<24} {elapsed:8.3f} s {len(targets) / elapsed:12.0f} pairs/s')
+
+    run('notebook', notebook_generate)
+    run('vectorized', vectorized_generate)
+
+def peak_rss() -> tuple:
+    '''
+    Peak resident memory in MiB of this process and of its largest finished child, such as a browser which quit.
+    '''
+
+    import resource
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024)
+
+def benchmark_crawl(args) -> None:
+    '''
+    Crawls the local stand-ins of the portals with each scraper running headless, storing the job posts with `MongoDB`.
+    '''
+
+    from portals import PortalServer, make_posts
+    from scrapers import LinkedInScraper, KarieraScraper, IndeedScraper
+    from scrapers.metrics import METRICS, quantile
+    from scrapers.scheduler import SCHEDULER
+
+    factories = {
+        'linkedin': lambda url: LinkedInScraper('benchmark', 'benchmark', workers=args.workers, base_url=url, headless=True, profile_dir=None),
+        'kariera':  lambda url: KarieraScraper(workers=args.workers, http=args.http, base_url=url, headless=True),
+        'indeed':   lambda url: IndeedScraper(workers=args.workers, http=args.http, base_url=url, headless=True)
+    }
+
+    # Page latencies are taken from the timers of `load_page` and `HttpFetcher`
+    METRICS.enabled = True
+    if args.rate is not None:
+        SCHEDULER.rate = SCHEDULER.max_rate = args.rate
+    database = MongoDB(client=make_client(args.mongomock), database='benchmark')
+
+    print(f'{"portal":<10} {"postings":>8} {"stored":>8} {"pages":>7} {"seconds":>9} {"pages/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+          f'{"RSS MiB":>8} {"browser":>8}')
+    for postings in args.postings:
+        with PortalServer(make_posts(postings)) as server:
+            for portal in args.portals:
+                database.jobs.drop()
+                database.ensure_indexes()
+                METRICS.reset()
+                served = server.requests[portal]
+
+                scraper = factories[portal](server.base_url(portal))
+                start = time.perf_counter()
+                try:
+                    job_data = scraper.get_jobs(['Data Scientist'], 'Greece', max_posts=postings)
+                finally:
+                    scraper.driver.quit()
+                if job_data:
+                    database.insert_documents(job_data)
+                elapsed = time.perf_counter() - start
+
+                pages = server.requests[portal] - served
+                latencies = [value for (name, _), values in METRICS.timers.items() if name in ('page_load', 'http_fetch') for value in values]
+                p50, p95 = (quantile(latencies, q) * 1000 for q in (0.5, 0.95)) if latencies else (0, 0)
+                rss, browser = peak_rss()
+                print(f'{portal:<10} {postings:>8} {database.jobs.count_documents({}):>8} {pages:>7} {elapsed:>9.2f} {pages / elapsed:>8.1f} '
+                      f'{p50:>8.1f} {p95:>8.1f} {rss:>8.0f} {browser:>8.0f}')
+
+    METRICS.enabled = False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Performance benchmarks of the scraping and analysis pipeline.')
+    subparsers = parser.add_subparsers(required=True)
+
+    insert_parser = subparsers.add_parser('insert', help='Throughput of writing job posts to MongoDB')
+    insert_parser.add_argument('--documents', type=int, default=10000)
+    insert_parser.add_argument('--batch-size', type=int, default=1000)
+    insert_parser.add_argument('--mongomock', action='store_true', help='Use an in-memory mongomock instead of a local mongod (upserts scale poorly there)')
+    insert_parser.set_defaults(func=benchmark_insert)
+
+    roles_parser = subparsers.add_parser('roles', help='Throughput and equivalence of the role classifier')
+    roles_parser.add_argument('--titles', type=int, default=100000)
+    roles_parser.set_defaults(func=benchmark_roles)
+
+    normalize_parser = subparsers.add_parser('normalize', help='Throughput and equivalence of the text normalization')
+    normalize_parser.add_argument('--descriptions', type=int, default=100000)
+    normalize_parser.set_defaults(func=benchmark_normalize)
+
+    embeddings_parser = subparsers.add_parser('embeddings', help='Latency of nearest neighbour queries over word embeddings')
+    embeddings_parser.add_argument('--embeddings', default='../notebooks/embeddings/conv', help='Path prefix of the *_vectors.tsv and *_metadata.tsv files')
+    embeddings_parser.add_argument('--queries', type=int, default=200)
+    embeddings_parser.set_defaults(func=benchmark_embeddings)
+
+    store_parser = subparsers.add_parser('store', help='Load time and size of the TSV embeddings against the binary store')
+    store_parser.add_argument('--embeddings', default='../notebooks/embeddings/conv', help='Path prefix of the *_vectors.tsv and *_metadata.tsv files')
+    store_parser.add_argument('--queries', type=int, default=200)
+    store_parser.set_defaults(func=benchmark_store)
+
+    skipgrams_parser = subparsers.add_parser('skipgrams', help='Throughput of the skip-gram pair generation of the Word2Vec model')
+    skipgrams_parser.add_argument('--sequences', type=int, default=20000)
+    skipgrams_parser.add_argument('--vocab-size', type=int, default=4096)
+    skipgrams_parser.add_argument('--window-size', type=int, default=2)
+    skipgrams_parser.add_argument('--num-ns', type=int, default=15)
+    skipgrams_parser.set_defaults(func=benchmark_skipgrams)
+
+    crawl_parser = subparsers.add_parser('crawl', help='Pages/sec, page latency and peak memory of the scrapers against local stand-ins of the portals')
+    crawl_parser.add_argument('--postings', type=int, nargs='+', default=[100, 1000, 10000])
+    crawl_parser.add_argument('--portals', nargs='+', choices=['linkedin', 'kariera', 'indeed'], default=['linkedin', 'kariera', 'indeed'])
+    crawl_parser.add_argument('--workers', type=int, default=4, help='Browser sessions visiting the job posts of each scraper')
+    crawl_parser.add_argument('--http', action='store_true', help='Fetch the job posts of Kariera and Indeed over plain HTTP')
+    crawl_parser.add_argument('--rate', type=float, help='Initial and highest requests per second of each portal, instead of the defaults of the scheduler')
+    crawl_parser.add_argument('--mongomock', action='store_true', help='Use an in-memory mongomock instead of a local mongod')
+    crawl_parser.set_defaults(func=benchmark_crawl)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,168 @@
+from pymongo import ReplaceOne
+from database import MongoDB
+from scrapers.common import pprint
+from scrapers.metrics import METRICS
+import hashlib
+import time
+
+# spaCy pipeline used to parse the descriptions, the named entities are not needed for noun chunks
+SPACY_MODEL = 'en_core_web_sm'
+SPACY_DISABLE = ['ner', 'lemmatizer']
+
+# Number of descriptions parsed and stored at once
+BATCH_SIZE = 50
+
+# Number of processes used by spaCy
+N_PROCESS = 6
+
+# Number of ids sent with a single `$in` query, when removing the entries of deleted job posts or reading filtered ones
+ID_BATCH_SIZE = 1000
+
+def text_hash(text: str) -> str:
+    '''
+    Returns a short fingerprint of a text, used to detect changed descriptions.
+    '''
+
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class ChunkStore:
+    '''
+    Keeps the noun chunks of every job post in the `chunks` collection, keyed by the `_id` of the job post.
+
+    Only job posts which are new or whose description changed since the last update are parsed again.
+
+    Args:
+    -------
+    - `database`   (MongoDB):            The database containing the job posts
+    - `preprocess` (callable, optional): Function applied to each description before parsing
+
+    Methods:
+    -------
+    - `pending()`:     Lists the job posts which need to be parsed
+    - `prune()`:       Removes the noun chunks of deleted job posts
+    - `update()`:      Parses the pending job posts and stores their noun chunks
+    - `iter_chunks()`: Streams the stored noun chunks
+    '''
+
+    def __init__(self, database: MongoDB, preprocess = None):
+        self.name = self.__class__.__name__
+        self.database = database
+        self.chunks = database.chunks
+        self.preprocess = preprocess
+        self.nlp = None
+
+    def load_model(self):
+        if self.nlp is None:
+            import spacy
+            self.nlp = spacy.load(SPACY_MODEL, disable=SPACY_DISABLE)
+        return self.nlp
+
+    def pending(self):
+        '''
+        Streams the job posts whose noun chunks are missing or outdated.
+
+        Returns:
+        -------
+        - `generator`: Tuples of `(text, (_id, hash))`, with the text already preprocessed
+        '''
+
+        stored = {document['_id']: document['hash'] for document in self.chunks.find({}, {'hash': 1})}
+
+        for document in self.database.find({'description': 1}, batch_size=BATCH_SIZE):
+            text = str(document.get('description') or '')
+            if self.preprocess is not None:
+                text = self.preprocess(text)
+
+            fingerprint = text_hash(text)
+            if stored.get(document['_id']) != fingerprint:
+                yield text, (document['_id'], fingerprint)
+
+    def prune(self) -> int:
+        '''
+        Removes the noun chunks of the job posts which are no longer in the database.
+
+        Returns:
+        -------
+        - `int`: The number of removed entries
+        '''
+
+        jobs = {document['_id'] for document in self.database.find({'_id': 1})}
+        orphans = [document['_id'] for document in self.chunks.find({}, {'_id': 1}) if document['_id'] not in jobs]
+
+        for i in range(0, len(orphans), ID_BATCH_SIZE):
+            self.chunks.delete_many({'_id': {'$in': orphans[i:i + ID_BATCH_SIZE]}})
+        return len(orphans)
+
+    def update(self, batch_size: int = BATCH_SIZE, n_process: int = N_PROCESS) -> int:
+        '''
+        Parses the new or changed job posts and stores their noun chunks, and removes those of deleted job posts.
+
+        Args:
+        -------
+        - `batch_size` (int, optional): How many descriptions are parsed and written at once
+        - `n_process`  (int, optional): Number of processes used by spaCy
+
+        Returns:
+        -------
+        - `int`: The number of parsed job posts
+        '''
+
+        nlp = self.load_model()
+        start = time.time()
+        parsed = 0
+        requests = []
+
+        for doc, (job_id, fingerprint) in nlp.pipe(self.pending(), as_tuples=True, batch_size=batch_size, n_process=n_process):
+            chunks = [chunk.text for chunk in doc.noun_chunks]
+            requests.append(ReplaceOne({'_id': job_id}, {'_id': job_id, 'hash': fingerprint, 'chunks': chunks}, upsert=True))
+            parsed += 1
+
+            if len(requests) >= batch_size:
+                self.chunks.bulk_write(requests, ordered=False)
+                requests = []
+
+        if requests:
+            self.chunks.bulk_write(requests, ordered=False)
+        pruned = self.prune()
+
+        elapsed = time.time() - start
+        METRICS.count('spacy_docs', parsed)
+        METRICS.observe('spacy_parse', elapsed)
+        if parsed:
+            METRICS.gauge('spacy_docs_per_sec', round(parsed / max(elapsed, 1e-9), 2))
+        pprint(msg=f'Parsed {parsed} new or changed job posts and removed {pruned} deleted ones in {round(elapsed, 2)} seconds.',
+               type=1, prefix=self.name)
+        return parsed
+
+    def iter_chunks(self, filter: dict = None):
+        '''
+        Streams the stored noun chunks.
+
+        Args:
+        -------
+        - `filter` (dict, optional): Only include the job posts matching this filter, e.g. `{'roles': 'Data Analyst'}`
+
+        Returns:
+        -------
+        - `generator`: The noun chunks, one string at a time
+        '''
+
+        if not filter:
+            for document in self.chunks.find({}, {'chunks': 1}, batch_size=BATCH_SIZE):
+                yield from document['chunks']
+            return
+
+        # The ids of the matching job posts are looked up in batches, as a single `$in` of all of them may exceed the size
+        # limit of a query on a large corpus
+        ids = []
+        for document in self.database.find({'_id': 1}, filter, batch_size=ID_BATCH_SIZE):
+            ids.append(document['_id'])
+            if len(ids) >= ID_BATCH_SIZE:
+                yield from self._chunks_of(ids)
+                ids = []
+        if ids:
+            yield from self._chunks_of(ids)
+
+    def _chunks_of(self, ids: list):
+        for document in self.chunks.find({'_id': {'$in': ids}}, {'chunks': 1}, batch_size=BATCH_SIZE):
+            yield from document['chunks']
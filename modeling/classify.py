@@ -0,0 +1,257 @@
+from concurrent.futures import ProcessPoolExecutor
+from aggregates import AggregateStore
+from chunks import ChunkStore
+from database import MongoDB
+from preprocessing import clean_description
+from scrapers.common import pprint
+import argparse
+import os
+import time
+
+# Classes predicted by the skill classifiers, in the order of the labels used by the notebooks
+LABELS = ['not_skill', 'hard_skill', 'soft_skill']
+
+# Fields of the job posts holding the noun chunks of each skill class
+SKILL_FIELDS = {'hard_skill': 'hard_skills', 'soft_skill': 'soft_skills'}
+
+# Labelled noun chunks of the notebooks and the file the trained classifier is saved to
+TRAINING_DATA = '../notebooks/noun_chunks_classified.csv'
+MODEL_PATH = '../models/skill_classifier.joblib'
+
+# Random `not_skill` noun chunks kept for training, the rest are left out as in notebook 3 to balance the classes
+NOT_SKILL_SAMPLES = 700
+
+# Number of job posts whose noun chunks are classified at once
+BATCH_SIZE = 200
+
+# Number of processes classifying batches in parallel
+N_PROCESS = os.cpu_count() or 1
+
+def load_dataset(data_path: str = TRAINING_DATA, not_skills: int = NOT_SKILL_SAMPLES, seed: int = 0) -> tuple:
+    '''
+    Loads the labelled noun chunks, keeping `not_skills` random `not_skill` chunks as in notebook 3.
+
+    Returns:
+    -------
+    - `tuple`: The noun chunks and their numeric labels
+    '''
+
+    import pandas as pd
+
+    df = pd.read_csv(data_path)
+    skills = df[df['type'] != 'not_skill']
+    others = df[df['type'] == 'not_skill']
+    df = pd.concat([skills, others.sample(n=min(not_skills, len(others)), random_state=seed)], ignore_index=True)
+    return df['chunks'], df['type'].map({label: i for i, label in enumerate(LABELS)})
+
+def train_model(data_path: str = TRAINING_DATA, model_path: str = MODEL_PATH):
+    '''
+    Trains the TF-IDF and `LinearSVC` pipeline of notebook 3 on the labelled noun chunks and saves it with joblib.
+    As in notebook 3, only `NOT_SKILL_SAMPLES` random `not_skill` chunks are used, see `load_dataset()`.
+
+    Args:
+    -------
+    - `data_path`  (str, optional): CSV file with a `chunks` and a `type` column
+    - `model_path` (str, optional): The file the pipeline is saved to
+
+    Returns:
+    -------
+    - `Pipeline`: The trained pipeline
+    '''
+
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import make_pipeline
+    from sklearn.svm import LinearSVC
+
+    model = make_pipeline(TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2), stop_words='english'), LinearSVC(dual=False))
+    model.fit(*load_dataset(data_path))
+
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    joblib.dump(model, model_path)
+    return model
+
+class SkillClassifier:
+    '''
+    Classifies noun chunks as `not_skill`, `hard_skill` or `soft_skill` with a persisted model.
+
+    Scikit-learn pipelines saved with joblib (`.joblib`, `.pkl`) include their vectorizer. Any other path is loaded as a
+    Keras model, such as the Conv1D model of notebook 5, whose `TextVectorization` layer is part of the model. That
+    layer was saved with the `custom_standardization()` function of the notebook, which is replaced by
+    `standardize_tensor()` when loading.
+
+    Args:
+    -------
+    - `model_path` (str, optional): The saved model
+    '''
+
+    def __init__(self, model_path: str = MODEL_PATH):
+        self.model_path = model_path
+        self.keras = not model_path.endswith(('.joblib', '.pkl'))
+        self.model = None
+
+    def load(self):
+        if self.model is None:
+            if self.keras:
+                import tensorflow as tf
+                from preprocessing import standardize_tensor
+                self.model = tf.keras.models.load_model(self.model_path, custom_objects={'custom_standardization': standardize_tensor})
+            else:
+                import joblib
+                self.model = joblib.load(self.model_path)
+        return self.model
+
+    def predict(self, chunks: list) -> list:
+        '''
+        Classifies a batch of noun chunks.
+
+        Returns:
+        -------
+        - `list`: The name of the class of each noun chunk
+        '''
+
+        if not chunks:
+            return []
+
+        model = self.load()
+        if self.keras:
+            import numpy as np
+            predictions = np.argmax(model.predict(np.array(chunks, dtype=object), verbose=0), axis=1)
+        else:
+            predictions = model.predict(chunks)
+        return [LABELS[value] if not isinstance(value, str) else value for value in predictions]
+
+# Classifier of each worker process, loaded once by `_init_worker()`
+_classifier = None
+
+def _init_worker(model_path: str) -> None:
+    global _classifier
+    _classifier = SkillClassifier(model_path)
+    _classifier.load()
+
+def classify_batch(batch: list) -> list:
+    '''
+    Classifies the noun chunks of a batch of job posts with a single prediction.
+
+    Args:
+    -------
+    - `batch` (list): Tuples of `(_id, hash, chunks)`
+
+    Returns:
+    -------
+    - `list`: Tuples of `(_id, fields)` with the skills of each job post, ready for `MongoDB.update_documents()`
+    '''
+
+    chunks = [chunk for _, _, post_chunks in batch for chunk in post_chunks]
+    labels = iter(_classifier.predict(chunks))
+
+    updates = []
+    for job_id, fingerprint, post_chunks in batch:
+        fields = {field: [] for field in SKILL_FIELDS.values()}
+        for chunk in post_chunks:
+            label = next(labels)
+            if label in SKILL_FIELDS:
+                fields[SKILL_FIELDS[label]].append(chunk)
+        fields['skills_hash'] = fingerprint
+        updates.append((job_id, fields))
+    return updates
+
+def pending_batches(database: MongoDB, batch_size: int = BATCH_SIZE, force: bool = False):
+    '''
+    Streams the noun chunks of the job posts which were not classified since their chunks last changed.
+
+    Returns:
+    -------
+    - `generator`: Lists of up to `batch_size` tuples of `(_id, hash, chunks)`
+    '''
+
+    classified = {} if force else {document['_id']: document.get('skills_hash')
+                                   for document in database.find({'skills_hash': 1}, {'skills_hash': {'$exists': True}})}
+
+    batch = []
+    for document in database.chunks.find({}, {'hash': 1, 'chunks': 1}, batch_size=batch_size):
+        if classified.get(document['_id']) == document['hash']:
+            continue
+        batch.append((document['_id'], document['hash'], document['chunks']))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def classify(database: MongoDB, model_path: str = MODEL_PATH, batch_size: int = BATCH_SIZE,
+             n_process: int = N_PROCESS, force: bool = False, update_chunks: bool = True) -> dict:
+    '''
+    Classifies the stored noun chunks of every job post and writes the hard and soft skills back to the job posts.
+
+    The noun chunks of the new and changed job posts are parsed first with `ChunkStore`, from the descriptions cleaned
+    as in notebook 2, so that no job post is classified with missing or outdated chunks.
+
+    Batches are read from the `chunks` collection by the main process and spread over `n_process` worker processes,
+    each loading the model once. At most two batches per worker are in flight, so memory stays bounded.
+
+    Args:
+    -------
+    - `database`      (MongoDB):         The database containing the job posts and their noun chunks, see `ChunkStore`
+    - `model_path`    (str, optional):   The saved model, see `SkillClassifier`
+    - `batch_size`    (int, optional):   How many job posts are classified at once
+    - `n_process`     (int, optional):   Number of worker processes, 1 classifies in the main process
+    - `force`         (bool, optional):  Classify all job posts again, e.g. after training a new model
+    - `update_chunks` (bool, optional):  Parse the noun chunks of the new and changed job posts first
+
+    Returns:
+    -------
+    - `dict`: The number of classified posts and chunks, the elapsed seconds and the chunks per second
+    '''
+
+    name = 'SkillClassifier'
+    stats = {'posts': 0, 'chunks': 0}
+    start = time.time()
+
+    if update_chunks:
+        ChunkStore(database, preprocess=clean_description).update()
+
+    def write(batch, updates):
+        database.update_documents(updates)
+        stats['posts'] += len(batch)
+        stats['chunks'] += sum(len(chunks) for _, _, chunks in batch)
+
+    batches = pending_batches(database, batch_size, force)
+    if n_process <= 1:
+        _init_worker(model_path)
+        for batch in batches:
+            write(batch, classify_batch(batch))
+    else:
+        with ProcessPoolExecutor(n_process, initializer=_init_worker, initargs=(model_path,)) as executor:
+            in_flight = []
+            for batch in batches:
+                in_flight.append((batch, executor.submit(classify_batch, batch)))
+                if len(in_flight) >= 2 * n_process:
+                    batch, future = in_flight.pop(0)
+                    write(batch, future.result())
+            for batch, future in in_flight:
+                write(batch, future.result())
+
+    stats['seconds'] = round(time.time() - start, 2)
+    stats['chunks_per_sec'] = round(stats['chunks'] / max(time.time() - start, 1e-9), 1)
+    pprint(msg=f'Classified {stats["chunks"]} noun chunks of {stats["posts"]} job posts in {stats["seconds"]} seconds '
+               f'({stats["chunks_per_sec"]} chunks/sec).', type=1, prefix=name)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Classify the noun chunks of the stored job posts as hard or soft skills.')
+    parser.add_argument('--model', default=MODEL_PATH, help='Saved scikit-learn pipeline (.joblib) or Keras model')
+    parser.add_argument('--train', action='store_true', help=f'Train the notebook 3 pipeline on {TRAINING_DATA} first')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--processes', type=int, default=N_PROCESS)
+    parser.add_argument('--force', action='store_true', help='Classify all job posts again')
+    parser.add_argument('--skip-chunks', action='store_true', help='Classify the stored noun chunks without parsing new job posts')
+    args = parser.parse_args()
+
+    if args.train:
+        train_model(model_path=args.model)
+    database = MongoDB()
+    classify(database, args.model, args.batch_size, args.processes, args.force, update_chunks=not args.skip_chunks)
+
+    # Apply the new labels to the skill counts
+    AggregateStore(database).update()
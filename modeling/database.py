@@ -1,26 +1,220 @@
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
+from pymongo import MongoClient, UpdateOne, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
 from scrapers.common import pprint
+from scrapers.metrics import METRICS
+
+# Number of documents sent to the database with a single request
+BATCH_SIZE = 1000
+
+# Fields used to filter the job posts, each one is backed by an index
+INDEXED_FIELDS = ('roles', 'location', 'industry', 'level', 'workplace', 'last_accessed')
+
+# Fields which are refreshed when an already stored job post is scraped again
+REFRESHED_FIELDS = ('last_accessed', 'description')
 
 class MongoDB:
-    def __init__(self):
+    def __init__(self, client = None, database: str = 'scraper'):
         self.name = self.__class__.__name__
-        self.client = MongoClient('localhost', 27017)
-        self.db = self.client.scraper
+        self.client = client if client is not None else MongoClient('localhost', 27017)
+        self.db = self.client[database]
         self.jobs = self.db.jobs
+        self.chunks = self.db.chunks
+
+    def ensure_indexes(self) -> None:
+        '''
+        Creates the indexes used by the queries, if they do not exist yet.
+
+        Called once by the processes writing the job posts, such as the crawler, rather than by every reader, as each index
+        is a round trip and building the text index of a large collection can block it.
+        '''
+
+        for field in INDEXED_FIELDS:
+            self.jobs.create_index([(field, ASCENDING)])
+        self.jobs.create_index([('description', TEXT)], name='description_text')
+
+    def insert_documents(self, documents, batch_size: int = BATCH_SIZE, upsert: bool = True) -> dict:
+        '''
+        Writes job posts to the database using unordered bulk requests.
+
+        Args:
+        -------
+        - `documents`  (iterable):       The job posts to be written. Each element is a `dict` with an `_id`
+        - `batch_size` (int, optional):  How many documents are sent with a single request
+        - `upsert`     (bool, optional): Refresh the `REFRESHED_FIELDS` of job posts that already exist instead of skipping them
+
+        Returns:
+        -------
+        - `dict`: The number of inserted, updated and unchanged documents
+        '''
+
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
 
-    def insert_documents(self, documents):
-        inserted = 0
+        batch = []
         for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                with METRICS.timer('insert_documents'):
+                    self._write_batch(batch, upsert, counts)
+                batch = []
+        if batch:
+            with METRICS.timer('insert_documents'):
+                self._write_batch(batch, upsert, counts)
+
+        for kind, value in counts.items():
+            METRICS.count('documents', value, status=kind)
+
+        pprint(msg=f'Inserted {counts["inserted"]} new documents, updated {counts["updated"]} and left {counts["unchanged"]} unchanged',
+               type=1, prefix=self.name)
+        return counts
+
+    def _write_batch(self, batch: list, upsert: bool, counts: dict) -> None:
+        if not upsert:
             try:
-                self.db.jobs.insert_one(document)
-                inserted += 1
-            except DuplicateKeyError:
-                pass
-        pprint(msg=f'Inserted {inserted} new documents', type=1, prefix=self.name)
-
-    def find(self, query):
-        return self.jobs.find({}, query)
+                inserted = len(self.jobs.insert_many(batch, ordered=False).inserted_ids)
+            except BulkWriteError as e:
+                # Documents with an existing _id are rejected while the rest of the batch is still inserted
+                inserted = e.details['nInserted']
+            counts['inserted'] += inserted
+            counts['unchanged'] += len(batch) - inserted
+            return
+
+        requests = []
+        for document in batch:
+            update = {}
+            refreshed = {key: value for key, value in document.items() if key in REFRESHED_FIELDS}
+            inserted = {key: value for key, value in document.items() if key not in REFRESHED_FIELDS and key != '_id'}
+            if refreshed:
+                update['$set'] = refreshed
+            if inserted:
+                update['$setOnInsert'] = inserted
+            requests.append(UpdateOne({'_id': document['_id']}, update, upsert=True))
+
+        result = self.jobs.bulk_write(requests, ordered=False)
+        counts['inserted'] += result.upserted_count
+        counts['updated'] += result.modified_count
+        counts['unchanged'] += result.matched_count - result.modified_count
+
+    def update_documents(self, updates, batch_size: int = BATCH_SIZE) -> int:
+        '''
+        Sets fields of already stored job posts using unordered bulk requests, e.g. the skills found in their description.
+
+        Args:
+        -------
+        - `updates`    (iterable):      Tuples of `(_id, fields)`, where `fields` is a `dict` of the values to be set
+        - `batch_size` (int, optional): How many updates are sent with a single request
+
+        Returns:
+        -------
+        - `int`: The number of modified job posts
+        '''
+
+        modified = 0
+        requests = []
+        for job_id, fields in updates:
+            requests.append(UpdateOne({'_id': job_id}, {'$set': fields}))
+            if len(requests) >= batch_size:
+                modified += self.jobs.bulk_write(requests, ordered=False).modified_count
+                requests = []
+        if requests:
+            modified += self.jobs.bulk_write(requests, ordered=False).modified_count
+        return modified
+
+    def get_known_ids(self, max_age: timedelta = None) -> set:
+        '''
+        Collects the ids of the stored job posts, reading only the `_id` of each document.
+
+        Args:
+        -------
+        - `max_age` (timedelta, optional): Only include job posts accessed within this window, so that older ones get refreshed
+
+        Returns:
+        -------
+        - `set`: The ids of the stored job posts as strings
+        '''
+
+        query = {}
+        if max_age is not None:
+            query['last_accessed'] = {'$gte': datetime.utcnow() - max_age}
+        return {str(document['_id']) for document in self.jobs.find(query, {'_id': 1})}
+
+    def find(self, projection: dict = None, filter: dict = None, batch_size: int = 0, sort: list = None,
+             skip: int = 0, limit: int = 0, text: str = None):
+        '''
+        Queries the stored job posts, returning a cursor which fetches the documents in batches.
+
+        Args:
+        -------
+        - `projection` (dict, optional): The fields to be returned
+        - `filter`     (dict, optional): The conditions the job posts have to fulfil
+        - `batch_size` (int, optional):  How many documents are fetched with each round trip, 0 uses the server default
+        - `sort`       (list, optional): Pairs of `(field, direction)` defining the order of the results
+        - `skip`       (int, optional):  How many of the matching job posts are skipped
+        - `limit`      (int, optional):  Maximum number of job posts returned, 0 means no limit
+        - `text`       (str, optional):  Words to be searched in the description of the job posts, needs `ensure_indexes()`
+
+        Returns:
+        -------
+        - `Cursor`: The matching job posts
+        '''
+
+        filter = dict(filter or {})
+        if text:
+            filter['$text'] = {'$search': text}
+
+        cursor = self.jobs.find(filter, projection, batch_size=batch_size, skip=skip, limit=limit)
+        if sort:
+            cursor = cursor.sort(sort)
+        return cursor
+
+    def get_page(self, page: int, page_size: int = 50, projection: dict = None, filter: dict = None, text: str = None) -> list:
+        '''
+        Returns a page of the matching job posts, most recently accessed first.
+
+        Args:
+        -------
+        - `page`       (int):            The number of the page, starting from 0
+        - `page_size`  (int, optional):  How many job posts each page contains
+        - `projection` (dict, optional): The fields to be returned
+        - `filter`     (dict, optional): The conditions the job posts have to fulfil
+        - `text`       (str, optional):  Words to be searched in the description of the job posts, needs `ensure_indexes()`
+
+        Returns:
+        -------
+        - `list`: The job posts of the page
+        '''
+
+        sort = [('last_accessed', DESCENDING), ('_id', ASCENDING)]
+        return list(self.find(projection, filter, sort=sort, skip=page * page_size, limit=page_size, text=text))
+
+    def count(self, filter: dict = None) -> int:
+        '''
+        Counts the job posts matching a filter.
+        '''
+
+        return self.jobs.count_documents(filter or {})
+
+    def count_by(self, field: str, filter: dict = None) -> dict:
+        '''
+        Counts the job posts for each value of a field, e.g. per role, industry or level, using the database aggregation.
+
+        Args:
+        -------
+        - `field`  (str):            The field to group by. For lists, such as `roles`, every element is counted
+        - `filter` (dict, optional): The conditions the counted job posts have to fulfil
+
+        Returns:
+        -------
+        - `dict`: The number of job posts for each value, in descending order. Missing values are counted under None
+        '''
+
+        pipeline = [
+            {'$match':  filter or {}},
+            {'$unwind': {'path': f'${field}', 'preserveNullAndEmptyArrays': True}},
+            {'$group':  {'_id': f'${field}', 'count': {'$sum': 1}}},
+            {'$sort':   {'count': -1, '_id': 1}}
+        ]
+        return {group['_id']: group['count'] for group in self.jobs.aggregate(pipeline)}
 
     def get_all_documents(self):
         return self.jobs.find({})
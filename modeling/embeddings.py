@@ -0,0 +1,217 @@
+import numpy as np
+import argparse
+import io
+
+# Suffixes of the files making up an embedding store
+VECTORS_SUFFIX = '.npy'
+VOCAB_SUFFIX   = '.vocab'
+
+def save_embeddings(path: str, vectors, words: list, dtype = np.float32) -> None:
+    '''
+    Saves embeddings in binary form: a `.npy` matrix and a `.vocab` sidecar with one word per line.
+
+    Args:
+    -------
+    - `path`    (str):               Path of the store without suffix, e.g. `embeddings/conv`
+    - `vectors` (ndarray):           Matrix with one embedding per row
+    - `words`   (list):              The word of each row
+    - `dtype`   (dtype, optional):   Precision of the stored vectors, `np.float32` or `np.float16`
+    '''
+
+    if len(vectors) != len(words):
+        raise ValueError(f'Got {len(vectors)} vectors but {len(words)} words')
+
+    np.save(path + VECTORS_SUFFIX, np.asarray(vectors, dtype=dtype))
+    with io.open(path + VOCAB_SUFFIX, 'w', encoding='utf-8') as f:
+        f.writelines(word + '\n' for word in words)
+
+def load_embeddings(path: str, mmap: bool = True) -> tuple:
+    '''
+    Loads embeddings saved with `save_embeddings()`.
+
+    With `mmap` the matrix is mapped read-only instead of being read, so it is loaded lazily and
+    shared between all processes mapping the same file.
+
+    Returns:
+    -------
+    - `tuple`: The matrix of vectors and the list of words
+    '''
+
+    vectors = np.load(path + VECTORS_SUFFIX, mmap_mode='r' if mmap else None)
+    with io.open(path + VOCAB_SUFFIX, encoding='utf-8') as f:
+        words = f.read().splitlines()
+    return vectors, words
+
+def tsv_to_store(vectors_path: str, metadata_path: str, path: str, dtype = np.float32) -> None:
+    '''
+    Converts the `*_vectors.tsv` and `*_metadata.tsv` files of the TensorFlow projector into a binary store.
+    '''
+
+    vectors = np.loadtxt(vectors_path, delimiter='\t', dtype=np.float32, ndmin=2)
+    with io.open(metadata_path, encoding='utf-8') as f:
+        words = f.read().splitlines()
+    save_embeddings(path, vectors, words, dtype)
+
+def store_to_tsv(path: str, vectors_path: str, metadata_path: str) -> None:
+    '''
+    Exports a binary store to the `*_vectors.tsv` and `*_metadata.tsv` files used by the TensorFlow projector.
+    '''
+
+    vectors, words = load_embeddings(path)
+    np.savetxt(vectors_path, vectors.astype(np.float32), delimiter='\t', fmt='%.9g', encoding='utf-8')
+    with io.open(metadata_path, 'w', encoding='utf-8') as f:
+        f.writelines(word + '\n' for word in words)
+
+class EmbeddingIndex:
+    '''
+    Answers nearest neighbour queries over a matrix of word embeddings using cosine similarity.
+
+    The norms of all vectors are computed once, so each query is a single matrix-vector product followed by
+    a partial sort of the scores.
+
+    A float32 matrix is used as is, so a memory mapped store is shared between processes. A float16 store is converted
+    to float32 once, as queries against it would otherwise convert the whole matrix every time; it saves disk space and
+    load time only. Its rounding also reorders neighbours with nearly equal scores, e.g. 8 of 200 top-10 queries on the
+    notebook 5 embeddings return a different list than the float32 store.
+
+    Args:
+    -------
+    - `vectors` (ndarray): Matrix with one embedding per row
+    - `words`   (list):    The word of each row
+
+    Methods:
+    -------
+    - `from_tsv()`:           Loads the embeddings exported for the TensorFlow projector
+    - `load()`:               Loads the embeddings from a binary store, memory mapped by default
+    - `save()`:               Saves the embeddings to a binary store
+    - `most_similar()`:       Finds the words closest to a given word
+    - `most_similar_batch()`: Finds the words closest to each of several words at once
+    '''
+
+    def __init__(self, vectors, words: list):
+        if len(vectors) != len(words):
+            raise ValueError(f'Got {len(vectors)} vectors but {len(words)} words')
+
+        # A memory mapped float32 matrix is used as is, no copy of the vectors is made
+        self.vectors = vectors if vectors.dtype == np.float32 else np.asarray(vectors, dtype=np.float32)
+        self.words = list(words)
+        self.index = {word: i for i, word in enumerate(self.words)}
+
+        # Inverse norms of the rows, zero vectors get a score of 0 instead of a division by zero
+        norms = np.sqrt(np.einsum('ij,ij->i', self.vectors, self.vectors))
+        self.inv_norms = np.divide(1, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    @classmethod
+    def from_tsv(cls, vectors_path: str, metadata_path: str):
+        '''
+        Loads the embeddings from the `*_vectors.tsv` and `*_metadata.tsv` files created by the notebooks.
+        '''
+
+        vectors = np.loadtxt(vectors_path, delimiter='\t', dtype=np.float32, ndmin=2)
+        with io.open(metadata_path, encoding='utf-8') as f:
+            words = f.read().splitlines()
+        return cls(vectors, words)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        '''
+        Loads the embeddings from a binary store, see `load_embeddings()`.
+        '''
+
+        return cls(*load_embeddings(path, mmap))
+
+    def save(self, path: str, dtype = np.float32) -> None:
+        '''
+        Saves the embeddings to a binary store, see `save_embeddings()`.
+        '''
+
+        save_embeddings(path, self.vectors, self.words, dtype)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word: str):
+        return word in self.index
+
+    def scores(self, queries) -> np.ndarray:
+        '''
+        Computes the cosine similarity between each query vector and every word.
+
+        Args:
+        -------
+        - `queries` (ndarray): A single vector or a matrix with one vector per row
+
+        Returns:
+        -------
+        - `ndarray`: The similarities, with one row per query
+        '''
+
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = queries @ self.vectors.T
+        return scores * self.inv_norms / np.where(norms > 0, norms, 1)
+
+    def top_k(self, scores: np.ndarray, num: int) -> list:
+        '''
+        Selects the `num` highest scores of each row, in descending order.
+        '''
+
+        num = min(num, scores.shape[1])
+        if num <= 0:
+            return [[] for _ in scores]
+
+        best = np.argpartition(-scores, num - 1, axis=1)[:, :num]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best, best_scores = np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+        return [[(self.words[i], float(score)) for i, score in zip(row, row_scores) if np.isfinite(score)]
+                for row, row_scores in zip(best, best_scores)]
+
+    def most_similar_batch(self, words: list, num: int) -> list:
+        '''
+        Finds the most similar words for each of the given words, excluding the word itself.
+
+        Args:
+        -------
+        - `words` (list): The words to be searched
+        - `num`   (int):  How many similar words are returned for each word
+
+        Returns:
+        -------
+        - `list`: For each word a list of `(word, similarity)` tuples, most similar first
+        '''
+
+        rows = np.array([self.index[word] for word in words], dtype=np.intp)
+        scores = self.scores(self.vectors[rows])
+        scores[np.arange(len(rows)), rows] = -np.inf
+        return self.top_k(scores, num)
+
+    def most_similar(self, word: str, num: int) -> list:
+        '''
+        Finds the most similar words to the given one, excluding the word itself.
+
+        Args:
+        -------
+        - `word` (str): The word to be searched
+        - `num`  (int): How many similar words are returned
+
+        Returns:
+        -------
+        - `list`: Tuples of `(word, similarity)`, most similar first
+        '''
+
+        return self.most_similar_batch([word], num)[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert word embeddings between the TensorFlow projector TSV files and the binary store.')
+    parser.add_argument('direction', choices=['to-npy', 'to-tsv'])
+    parser.add_argument('prefix', help='Path prefix of the *_vectors.tsv and *_metadata.tsv files, e.g. ../notebooks/embeddings/conv')
+    parser.add_argument('--store', help='Path of the binary store without suffix, defaults to the prefix')
+    parser.add_argument('--float16', action='store_true', help='Store the vectors with half precision')
+    args = parser.parse_args()
+
+    store = args.store or args.prefix
+    if args.direction == 'to-npy':
+        tsv_to_store(f'{args.prefix}_vectors.tsv', f'{args.prefix}_metadata.tsv', store, np.float16 if args.float16 else np.float32)
+    else:
+        store_to_tsv(store, f'{args.prefix}_vectors.tsv', f'{args.prefix}_metadata.tsv')
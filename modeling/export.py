@@ -1,16 +1,171 @@
 from database import MongoDB
+from datetime import datetime
+import argparse
 import json
+import re
 
-db = MongoDB()
-documents = list(db.find({'_id': 0,
-                          'roles': 1,
-                          'location': 1,
-                          'type': 1,
-                          'industry': 1,
-                          'workplace': 1,
-                          'level': 1}))
+# Number of documents read from the database and written to the file at once
+BATCH_SIZE = 1000
 
-json_object = json.dumps(documents, indent=4, default=str)
+# Fields exported by default, as used by the reports
+FIELDS = ['roles', 'location', 'type', 'industry', 'workplace', 'level']
 
-with open("../reports/posts_a.json", "w") as f:
-    f.write(json_object)
\ No newline at end of file
+# Column types used for the columnar formats
+COLUMN_TYPES = {
+    '_id':           'string',
+    'url':           'string',
+    'title':         'string',
+    'roles':         'list',
+    'company':       'string',
+    'location':      'string',
+    'type':          'string',
+    'level':         'string',
+    'industry':      'string',
+    'workplace':     'string',
+    'description':   'string',
+    'last_accessed': 'timestamp'
+}
+
+def build_filter(roles: list = None, location: str = None, since: datetime = None, until: datetime = None) -> dict:
+    '''
+    Creates the database filter selecting the exported job posts.
+
+    Args:
+    -------
+    - `roles`    (list, optional):     Only job posts matching any of these roles
+    - `location` (str, optional):      Only job posts whose location contains this text
+    - `since`    (datetime, optional): Only job posts accessed at or after this time
+    - `until`    (datetime, optional): Only job posts accessed before this time
+
+    Returns:
+    -------
+    - `dict`: The filter to be used in a query
+    '''
+
+    query = {}
+    if roles:
+        query['roles'] = {'$in': roles}
+    if location:
+        query['location'] = {'$regex': re.escape(location), '$options': 'i'}
+    if since or until:
+        query['last_accessed'] = {}
+        if since:
+            query['last_accessed']['$gte'] = since
+        if until:
+            query['last_accessed']['$lt'] = until
+    return query
+
+def export_jsonl(documents, path: str) -> int:
+    '''
+    Writes the documents as JSON Lines, one document per line.
+    '''
+
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for document in documents:
+            f.write(json.dumps(document, default=str) + '\n')
+            count += 1
+    return count
+
+def export_json(documents, path: str) -> int:
+    '''
+    Writes the documents as an indented JSON array, one document at a time.
+    '''
+
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for document in documents:
+            text = json.dumps(document, indent=4, default=str).replace('\n', '\n    ')
+            f.write((',\n    ' if count else '\n    ') + text)
+            count += 1
+        f.write('\n]' if count else ']')
+    return count
+
+def export_columnar(documents, path: str, fields: list, file_format: str, batch_size: int = BATCH_SIZE) -> int:
+    '''
+    Writes the documents to a Parquet or Arrow file, one record batch at a time.
+    '''
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'string': pa.string(), 'list': pa.list_(pa.string()), 'timestamp': pa.timestamp('ms')}
+    schema = pa.schema([(field, types[COLUMN_TYPES.get(field, 'string')]) for field in fields])
+
+    if file_format == 'parquet':
+        writer = pq.ParquetWriter(path, schema)
+        write = writer.write_table
+    else:
+        writer = pa.ipc.new_file(path, schema)
+        write = writer.write
+
+    def flush(batch):
+        # Ids are numbers for some websites and text for others
+        columns = {field: [document.get(field) for document in batch] for field in fields}
+        if '_id' in columns:
+            columns['_id'] = [str(value) for value in columns['_id']]
+        write(pa.Table.from_pydict(columns, schema=schema))
+
+    count = 0
+    batch = []
+    try:
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                flush(batch)
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            flush(batch)
+            count += len(batch)
+    finally:
+        writer.close()
+    return count
+
+def export(database: MongoDB, path: str, fields: list = FIELDS, query: dict = None, batch_size: int = BATCH_SIZE) -> int:
+    '''
+    Streams job posts from the database into a file, keeping only one batch of documents in memory.
+
+    Args:
+    -------
+    - `database`   (MongoDB):        The database containing the job posts
+    - `path`       (str):            The output file. Its extension selects the format: `.jsonl`, `.json`, `.parquet` or `.arrow`
+    - `fields`     (list, optional): The fields to be exported
+    - `query`      (dict, optional): Filter selecting the exported job posts, see `build_filter()`
+    - `batch_size` (int, optional):  How many documents are read from the database at once
+
+    Returns:
+    -------
+    - `int`: The number of exported job posts
+    '''
+
+    projection = {field: 1 for field in fields}
+    if '_id' not in projection:
+        projection['_id'] = 0
+
+    documents = database.find(projection, query, batch_size=batch_size)
+    file_format = path.rsplit('.', 1)[-1]
+
+    if file_format == 'jsonl':
+        return export_jsonl(documents, path)
+    elif file_format == 'json':
+        return export_json(documents, path)
+    elif file_format in ('parquet', 'arrow'):
+        return export_columnar(documents, path, fields, file_format, batch_size)
+    raise ValueError(f'Unsupported export format: {file_format}')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export the scraped job posts to a file.')
+    parser.add_argument('--output', default='../reports/posts_a.json', help='Output file (.jsonl, .json, .parquet or .arrow)')
+    parser.add_argument('--fields', nargs='+', default=FIELDS, help='Fields to be exported')
+    parser.add_argument('--roles', nargs='+', help='Only export job posts matching any of these roles')
+    parser.add_argument('--location', help='Only export job posts whose location contains this text')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Only export job posts accessed at or after this date')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='Only export job posts accessed before this date')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    query = build_filter(args.roles, args.location, args.since, args.until)
+    exported = export(MongoDB(), args.output, args.fields, query, args.batch_size)
+    print(f'Exported {exported} job posts to {args.output}')
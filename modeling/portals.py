@@ -0,0 +1,247 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from collections import Counter
+from threading import Thread, Lock
+from html import escape
+import random
+
+# Job posts shown on each page of results, as on the real portals
+KARIERA_PAGE_SIZE = 20
+INDEED_PAGE_SIZE = 15
+LINKEDIN_PAGE_SIZE = 25
+
+# Titles of the generated job posts, the last ones are not matched by any role and are filtered out
+TITLES = ['Data Scientist', 'Senior Data Scientist', 'Machine Learning Engineer', 'Data Analyst', 'BI Analyst',
+          'Data Engineer', 'MLOps Engineer', 'Head Chef', 'Sales Representative']
+
+WORDS = ['python', 'sql', 'spark', 'statistics', 'communication', 'cloud', 'docker', 'teamwork', 'pipelines',
+         'dashboards', 'experience', 'with', 'and', 'the', 'team', 'models', 'data', 'analysis']
+
+def make_posts(amount: int, seed: int = 0) -> list:
+    '''
+    Generates the job posts served by the stand-ins.
+
+    Returns:
+    -------
+    - `list`: Dictionaries with the id, title, company, location, type, level, industry, workplace and description
+    '''
+
+    rng = random.Random(seed)
+    return [{
+        'id':          100000 + i,
+        'title':       rng.choice(TITLES),
+        'company':     f'Company {i % 250}',
+        'location':    rng.choice(['Athens, Attica, Greece', 'Thessaloniki, Central Macedonia, Greece']),
+        'type':        rng.choice(['Full-time', 'Part-time', 'Contract']),
+        'level':       rng.choice(['Entry level', 'Mid-Senior level', 'Director']),
+        'industry':    rng.choice(['IT Services and IT Consulting', 'Banking', 'Software Development']),
+        'workplace':   rng.choice(['On-site', 'Hybrid', 'Remote']),
+        'description': '\n'.join(' '.join(rng.choices(WORDS, k=40)) for _ in range(8))
+    } for i in range(amount)]
+
+def page(body: str, script: str = '') -> str:
+    return f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Jobs</title></head><body>{body}{script}</body></html>'
+
+def paragraphs(text: str) -> str:
+    return ''.join(f'<p>{escape(line)}</p>' for line in text.splitlines())
+
+def kariera_listing(posts: list, page_index: int) -> str:
+    start = page_index * KARIERA_PAGE_SIZE
+    pages = max(1, -(-len(posts) // KARIERA_PAGE_SIZE))
+    cards = ''.join(
+        f'<div data-testid="job-card"><div><div><div><img alt=""></div><div><div>{escape(post["company"])}</div>'
+        f'<div><a href="/kariera/en/jobs/{post["id"]}">{escape(post["title"])}</a></div></div></div></div></div>'
+        for post in posts[start:start + KARIERA_PAGE_SIZE])
+    pagination = ''.join(f'<li class="ant-pagination-item" title="{i}"><a>{i}</a></li>' for i in range(1, pages + 1))
+    cookies = '<div id="CybotCookiebotDialog"><button id="CybotCookiebotDialogBodyButtonDecline" onclick="this.parentNode.remove()">Decline</button></div>'
+    return page(f'{cookies}<main class="ant-layout-content">{cards}<ul class="ant-pagination">{pagination}</ul></main>')
+
+def kariera_detail(post: dict) -> str:
+    return page(
+        '<main class="ant-layout-content"><section>'
+        f'<div><div><div><div><div><div>{escape(post["title"])}</div></div></div></div></div></div>'
+        '<div><div>'
+        f'<div><section><div><a>{escape(post["company"])}</a></div></section></div>'
+        f'<div><div><div><a>{escape(post["location"])}</a></div><div></div><div><a>{post["level"]}</a></div><div><a>{post["type"]}</a></div></div>'
+        f'<div><div><a>{escape(post["industry"])}</a></div><div><a>{post["workplace"]}</a></div></div></div>'
+        f'</div><div>{paragraphs(post["description"])}</div></div>'
+        '</section></main>')
+
+def indeed_listing(posts: list, start: int, query: str) -> str:
+    cards = []
+    for i, post in enumerate(posts[start:start + INDEED_PAGE_SIZE]):
+        # The real results contain an empty element after every fifth job post
+        if i and i % 5 == 0:
+            cards.append('<li><div id="mosaic-afterFifthJobResult"></div></li>')
+        cards.append(
+            '<li><div id=""><div><div><div><div><table><tbody><tr><td><div><h2>'
+            f'<a href="/indeed/viewjob?jk={post["id"]:x}" data-jk="{post["id"]:x}"><span>{escape(post["title"])}</span></a>'
+            '</h2></div></td></tr></tbody></table></div></div></div></div></div></li>')
+
+    following = start + INDEED_PAGE_SIZE
+    navigation = '<div><a data-testid="pagination-page-1" href="#">1</a></div>'
+    if following < len(posts):
+        navigation += f'<div><a data-testid="pagination-page-next" href="/indeed/jobs?{query}&amp;start={following}">Next</a></div>'
+    return page(f'<div class="jobsearch-LeftPane"><div id="mosaic-provider-jobcards"><ul>{"".join(cards)}</ul></div><nav>{navigation}</nav></div>')
+
+def indeed_detail(post: dict) -> str:
+    return page(
+        '<div id="viewJobSSRRoot"><div></div><div><div><div></div><div></div><div></div><div><div><div><div><div>'
+        f'<div><h1 class="jobsearch-JobInfoHeader-title"><span>{escape(post["title"])}</span></h1></div>'
+        '<div></div>'
+        f'<div><div><div></div><div><div><div><div><div><div></div><div><div><a>{escape(post["company"])}</a></div></div></div></div></div></div></div></div></div>'
+        f'<div class="jobsearch-CompanyInfoWithoutHeaderImage"><div><div><div></div><div><div>{escape(post["location"])}</div></div></div></div></div>'
+        f'<div id="jobDetailsSection"><div></div><div><div>Job type</div><div>{post["type"]}</div></div></div>'
+        f'<div id="jobDescriptionText">{paragraphs(post["description"])}</div>'
+        '</div></div></div></div></div></div></div></div>')
+
+def linkedin_card(post: dict) -> str:
+    return (f'<li style="height: 120px"><div data-entity-urn="urn:li:jobPosting:{post["id"]}">'
+            f'<a href="/linkedin/jobs/view/{post["id"]}"></a><div><img alt=""></div><div><h3>{escape(post["title"])}</h3></div></div></li>')
+
+def linkedin_listing(posts: list, query: str) -> str:
+    cards = ''.join(linkedin_card(post) for post in posts[:LINKEDIN_PAGE_SIZE])
+
+    # More results are appended when the page is scrolled to the end, as on the public job search
+    script = f'''<script>
+let start = {LINKEDIN_PAGE_SIZE}, loading = false;
+function more() {{
+    if (loading || start >= {len(posts)}) return;
+    loading = true;
+    fetch('/linkedin/jobs/more?{query}&start=' + start).then(r => r.text()).then(html => {{
+        document.querySelector('ul.jobs-search__results-list').insertAdjacentHTML('beforeend', html);
+        start += {LINKEDIN_PAGE_SIZE};
+        loading = false;
+    }});
+}}
+window.addEventListener('scroll', () => {{
+    if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 10) more();
+}});
+</script>'''
+    return page(f'<main id="main-content"><section class="two-pane-serp-page__results-list"><ul class="jobs-search__results-list">{cards}</ul></section></main>', script)
+
+def linkedin_detail(post: dict) -> str:
+    return page(
+        '<div role="main"><div><div><div><div>'
+        f'<h1>{escape(post["title"])}</h1>'
+        f'<div><span><span>{escape(post["company"])}</span><span>{escape(post["location"])}</span><span>{post["workplace"]}</span></span></div>'
+        f'<div><ul><li><span>{post["type"]} · {post["level"]}</span></li><li><span>51-200 employees · {escape(post["industry"])}</span></li></ul></div>'
+        '</div></div></div></div></div>'
+        f'<div id="job-details"><span>{paragraphs(post["description"])}</span></div>')
+
+LINKEDIN_LOGIN = page(
+    '<form action="/linkedin/feed/" method="get"><input id="session_key"><input id="session_password" type="password">'
+    '<button class="sign-in-form__submit-btn--full-width" type="submit">Sign in</button></form>')
+
+LINKEDIN_FEED = page('<nav id="global-nav">Home</nav>')
+
+class PortalServer:
+    '''
+    Serves stand-ins of LinkedIn, Kariera and Indeed from a local HTTP server, so that the scrapers can be benchmarked
+    without the network. The generated pages have the structure expected by the XPaths of each scraper, including the
+    paginated results of Kariera and Indeed and the infinite scroll of LinkedIn.
+
+    Every portal is served under its own prefix, e.g. `http://127.0.0.1:<port>/kariera/`, see `base_url()`.
+
+    Args:
+    -------
+    - `posts` (list):          The job posts of every portal, see `make_posts()`
+    - `port`  (int, optional): The port of the server, 0 picks a free one
+
+    Methods:
+    -------
+    - `start()`:    Starts serving in a background thread
+    - `stop()`:     Stops the server
+    - `base_url()`: Returns the address of a portal
+    '''
+
+    def __init__(self, posts: list, port: int = 0):
+        self.posts = posts
+        self.index = {post['id']: post for post in posts}
+        self.requests = Counter()
+        self.lock = Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                portal, body = server.route(self.path)
+                with server.lock:
+                    server.requests[portal] += 1
+
+                data = (body or 'Not Found').encode('utf-8')
+                self.send_response(200 if body is not None else 404)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def base_url(self, portal: str) -> str:
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/{portal}/'
+
+    def route(self, path: str) -> tuple:
+        '''
+        Renders the page of a path.
+
+        Returns:
+        -------
+        - `tuple`: The portal and the HTML of the page, None if the path does not exist
+        '''
+
+        url = urlsplit(path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = url.path.strip('/').split('/')
+        portal, rest = parts[0], parts[1:]
+
+        try:
+            if portal == 'kariera':
+                if rest == ['en', 'jobs']:
+                    return portal, kariera_listing(self.posts, int(params.get('page', 0)))
+                if rest[:2] == ['en', 'jobs']:
+                    return portal, kariera_detail(self.index[int(rest[2])])
+            elif portal == 'indeed':
+                query = f'q={params.get("q", "")}&amp;l={params.get("l", "")}'
+                if rest == ['jobs']:
+                    return portal, indeed_listing(self.posts, int(params.get('start', 0)), query)
+                if rest == ['viewjob']:
+                    return portal, indeed_detail(self.index[int(params['jk'], 16)])
+            elif portal == 'linkedin':
+                if rest == [] or rest == ['']:
+                    return portal, LINKEDIN_LOGIN
+                if rest == ['feed']:
+                    return portal, LINKEDIN_FEED
+                if rest == ['jobs', 'search']:
+                    return portal, linkedin_listing(self.posts, url.query)
+                if rest == ['jobs', 'more']:
+                    start = int(params.get('start', 0))
+                    return portal, ''.join(linkedin_card(post) for post in self.posts[start:start + LINKEDIN_PAGE_SIZE])
+                if rest[:2] == ['jobs', 'view']:
+                    return portal, linkedin_detail(self.index[int(rest[2])])
+        except (KeyError, ValueError, IndexError):
+            pass
+        return portal, None
+
+    def start(self):
+        self.thread = Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
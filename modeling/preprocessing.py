@@ -0,0 +1,137 @@
+import numpy as np
+import re
+
+# Greek characters removed from the descriptions, as the job posts were meant for Greece
+GREEK_CHARS = "ΑαΆάΒβΓγΔδΕεΈέΖζΗηΉήΘθΙιΊίΚκΛλΜμΝνΞξΟοΌόΠπΡρΣσςΤτΥυΎύΦφΧχΨψΩωΏώ"
+GREEK_TABLE = str.maketrans('', '', GREEK_CHARS)
+
+# Regular expressions removing unwanted formatting from the descriptions, applied in this order
+REPLACEMENTS = [
+    ('e.g.', ''), ('i.e.', ''),                                           # Remove usual examples
+    (r'\b[\w\.-]+@[\w\.-]+\.\w{2,6}\b', ''),                              # Remove e-mails
+    (r'(https?:\/\/)?([\da-z\.-]+)\.([a-z\.]{2,6})([\/\w \.-]*)', ''),    # Remove links
+    (r'\B#([a-z0-9]{1,})', ''),                                           # Remove hashtags
+    (r'[^\w\s+#]', ' '),                                                  # Remove special characters
+    (r'(\s{2,})|(\n+)', ' ')                                              # Remove new lines and whitespaces
+]
+
+# Regular expressions standardizing the noun chunks fed to the TensorFlow models, applied after lower casing. These are
+# the patterns of `custom_standardization()` in notebooks 5 and 6, which the saved models were trained with, kept as they
+# were: the dots of the examples are not escaped, and as the notebooks used plain strings the e-mail pattern starts with
+# a backspace instead of a word boundary, so it never matches
+STANDARDIZATION = [
+    ('(e.g.?)|(i.e.?).', ''),                                             # Remove usual examples
+    (r'[^\x20-\x7E]', ' '),                                               # Remove non printable and non ascii characters
+    ('\x08' + r'[\w\.-]+@[\w\.-]+\.\w{2,6}' + '\x08', ''),                # Remove e-mails
+    (r'(https?:\/\/)?([\da-z\.-]+)\.([a-z\.]{2,6})([\/\w \.-]*)', ''),    # Remove links
+    (r'\B#([a-z0-9]{1,})', ' '),                                          # Remove hashtags
+    (r'[^\w\s+#]', ' '),                                                  # Remove special characters
+    (r'(\s{2,})|(\n+)', ' ')                                              # Remove new lines and whitespaces
+]
+
+# Notebook 4 escaped the dots of the examples, the Word2Vec embeddings were trained with this version
+WORD2VEC_STANDARDIZATION = [(r'(e\.g\.?)|(i\.e\.?).', '')] + STANDARDIZATION[1:]
+
+# Standardization of each model of the notebooks
+STANDARDIZATIONS = {'word2vec': WORD2VEC_STANDARDIZATION, 'conv': STANDARDIZATION, 'lstm': STANDARDIZATION}
+
+# Compiled once, so that no expression is parsed again for each description
+COMPILED_REPLACEMENTS     = [(re.compile(pattern), value) for pattern, value in REPLACEMENTS]
+COMPILED_STANDARDIZATIONS = {model: [(re.compile(pattern), value) for pattern, value in patterns]
+                             for model, patterns in STANDARDIZATIONS.items()}
+
+def clean_description(text: str) -> str:
+    '''
+    Removes Greek characters, e-mails, links, hashtags, special characters and repeated whitespaces from a description.
+
+    Args:
+    -------
+    - `text` (str): The description of a job post
+
+    Returns:
+    -------
+    - `str`: The cleaned description. Values which are not strings are returned unchanged
+    '''
+
+    if not isinstance(text, str):
+        return text
+
+    text = text.translate(GREEK_TABLE)
+    for pattern, value in COMPILED_REPLACEMENTS:
+        text = pattern.sub(value, text)
+    return text
+
+def standardize(text: str, model: str = 'conv') -> str:
+    '''
+    Lower cases a noun chunk and removes examples, non ascii characters, links and special characters.
+
+    Args:
+    -------
+    - `text`  (str):           The noun chunk
+    - `model` (str, optional): The model of the notebooks whose standardization is used, `word2vec`, `conv` or `lstm`
+
+    Returns:
+    -------
+    - `str`: The standardized noun chunk
+    '''
+
+    text = text.lower()
+    for pattern, value in COMPILED_STANDARDIZATIONS[model]:
+        text = pattern.sub(value, text)
+    return text
+
+# Element-wise versions, working on NumPy arrays and pandas series alike. `np.frompyfunc` still calls the function
+# once per string from a loop, it only saves the overhead of `Series.apply` and of one pass per expression
+_clean_ufunc = np.frompyfunc(clean_description, 1, 1)
+
+def clean_descriptions(values):
+    '''
+    Cleans a batch of descriptions, see `clean_description()`.
+
+    Args:
+    -------
+    - `values` (Series | ndarray | list): The descriptions
+
+    Returns:
+    -------
+    - `Series | ndarray`: The cleaned descriptions, a pandas series keeps its index
+    '''
+
+    return _clean_ufunc(values)
+
+def standardize_batch(values, model: str = 'conv'):
+    '''
+    Standardizes a batch of noun chunks, see `standardize()`.
+
+    Args:
+    -------
+    - `values` (Series | ndarray | list): The noun chunks
+    - `model`  (str, optional):           The model of the notebooks whose standardization is used
+
+    Returns:
+    -------
+    - `Series | ndarray`: The standardized noun chunks, a pandas series keeps its index
+    '''
+
+    return np.frompyfunc(lambda text: standardize(text, model), 1, 1)(values)
+
+def iter_clean(texts):
+    '''
+    Cleans descriptions one at a time from any iterable, e.g. a database cursor, see `clean_description()`.
+    '''
+
+    for text in texts:
+        yield clean_description(text)
+
+def standardize_tensor(input_data, model: str = 'conv'):
+    '''
+    TensorFlow version of `standardize()`, to be used as the `standardize` argument of a `TextVectorization` layer and
+    as the `custom_standardization` object when loading the models of notebooks 5 and 6.
+    '''
+
+    import tensorflow as tf
+
+    input_data = tf.strings.lower(input_data)
+    for pattern, value in STANDARDIZATIONS[model]:
+        input_data = tf.strings.regex_replace(input_data, pattern, value)
+    return input_data
@@ -1,28 +1,187 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from scrapers import LinkedInScraper, KarieraScraper, IndeedScraper
+from scrapers.common import pprint, wait_summary
+from scrapers.checkpoint import Checkpoint, CHECKPOINT_DIR
+from scrapers.archive import PageArchive, ARCHIVE_DIR
+from scrapers.metrics import METRICS
+from scrapers.scheduler import SCHEDULER
 from database import MongoDB
+from datetime import timedelta
+import argparse
+import time
 import json
 
+# Maximum number of scrapers running at the same time, each one owns a separate browser
+MAX_WORKERS = 3
+
+# Number of browser sessions each scraper uses to visit the job posts in parallel
+DETAIL_WORKERS = 4
+
+# Fetch the job posts of static websites over plain HTTP, falling back to the browser when needed
+HTTP_DETAILS = True
+
+# Stored job posts older than this are visited again, the rest are skipped
+STALE_AFTER = timedelta(days=7)
+
+# Keep the HTML of every fetched page, so that the fields can be extracted again without crawling
+ARCHIVE_PAGES = False
+
+# Files the metrics of a run are written to, as `.json` and as Prometheus text in `.prom`
+METRICS_PATH = '../reports/metrics'
+
+def run_scraper(factory, roles: list, location: str, known_ids: set = None, checkpoint: Checkpoint = None) -> (list | bool):
+    '''
+    Creates a scraper inside the calling worker and runs the complete scraping procedure.
+
+    Args:
+    -------
+    - `factory`    (callable):   Function returning a new scraper instance (and thus a new WebDriver)
+    - `roles`      (list):       A collection of job titles for searching
+    - `location`   (str):        The required location for the search
+    - `known_ids`  (set):        Ids of job posts which should not be visited again
+    - `checkpoint` (Checkpoint): Journal of the progress of the scraper, resumed if a previous run did not finish
+
+    Returns:
+    -------
+    - `list`: A collection containing information about the gathered job posts. Each element is a `dict`
+    - `bool`: Returns False if the scraper did not gather any job posts
+    '''
+
+    scraper = factory()
+    try:
+        return scraper.get_jobs(roles, location, known_ids=known_ids, checkpoint=checkpoint)
+    finally:
+        scraper.driver.quit()
+        if checkpoint is not None:
+            # Job posts extracted before a failure are stored now rather than on the next run
+            try:
+                checkpoint.flush()
+            finally:
+                checkpoint.close()
+
+def crawl(factories: dict, roles: list, location: str, database: MongoDB, max_workers: int = MAX_WORKERS,
+          stale_after: timedelta = STALE_AFTER, checkpoint_dir: str = CHECKPOINT_DIR) -> dict:
+    '''
+    Runs all given scrapers concurrently and stores their results as soon as each one finishes.
+
+    Args:
+    -------
+    - `factories`      (dict):                Mapping of a scraper name to a function creating that scraper
+    - `roles`          (list):                A collection of job titles for searching
+    - `location`       (str):                 The required location for the search
+    - `database`       (MongoDB):             The database the scraped job posts are inserted into
+    - `max_workers`    (int, optional):       How many scrapers are allowed to run at the same time
+    - `stale_after`    (timedelta, optional): Stored job posts older than this are visited again, if None all are visited
+    - `checkpoint_dir` (str, optional):       Directory of the journals of the scrapers. Job posts are then stored in micro-batches during
+                                              the crawl and an interrupted crawl resumes where it stopped. If None nothing is journaled
+
+    Returns:
+    -------
+    - `dict`: The number of job posts gathered by each scraper
+    '''
+
+    start = time.time()
+    scraped = {}
+
+    # Job posts stored recently are skipped before visiting their pages
+    known_ids = database.get_known_ids(stale_after) if stale_after is not None else None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for name, factory in factories.items():
+            checkpoint = Checkpoint(name, checkpoint_dir, sink=database.insert_documents) if checkpoint_dir is not None else None
+            futures[executor.submit(run_scraper, factory, roles, location, known_ids, checkpoint)] = name
+
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                scraped_jobs = future.result()
+            except Exception as e:
+                pprint(msg=f'Scraping failed with exception: {e!r}', type=3, prefix=name)
+                scraped_jobs = False
+
+            scraped[name] = len(scraped_jobs) if scraped_jobs else 0
+
+            # Journaled job posts were already stored during the crawl
+            if scraped_jobs and checkpoint_dir is None:
+                database.insert_documents(scraped_jobs)
+
+    pprint(msg=f'Crawl finished after {round(time.time() - start, 2)} seconds: {scraped}', type=4, prefix='Crawler')
+    if METRICS.enabled:
+        pprint(msg=f'Readiness waits: {wait_summary()}', type=0, prefix='Crawler')
+    pprint(msg=f'Request rates per host: {SCHEDULER.summary()}', type=0, prefix='Crawler')
+    return scraped
+
+def reextract(database: MongoDB, archive: PageArchive, portal: str = None) -> int:
+    '''
+    Extracts the job posts again from the archived pages, without a browser or network, and stores them.
+
+    Args:
+    -------
+    - `database` (MongoDB):       The database the job posts are written to
+    - `archive`  (PageArchive):   The archive of the fetched pages
+    - `portal`   (str, optional): Only the job posts of this scraper, e.g. `KarieraScraper`
+
+    Returns:
+    -------
+    - `int`: The number of extracted job posts
+    '''
+
+    job_data = archive.reextract(portal)
+    if job_data:
+        database.insert_documents(job_data)
+
+        # The extracted fields replace the stored ones, instead of only refreshing the description
+        database.update_documents((job['_id'], {key: value for key, value in job.items() if key != '_id'}) for job in job_data)
+    return len(job_data)
+
 if __name__ == "__main__":
-    # Search keywords used for scraping job posts
-    role = ["Data Scientist", "Machine Learning", "Data Analyst", "ML Ops", "Data Engineer"]
-    location = "Greece"
+    parser = argparse.ArgumentParser(description='Scrape job posts from LinkedIn, Kariera and Indeed.')
+    parser.add_argument('--archive', action='store_true', default=ARCHIVE_PAGES, help=f'Keep the HTML of every fetched page in {ARCHIVE_DIR}')
+    parser.add_argument('--reextract', nargs='?', const='all', metavar='SCRAPER',
+                        help='Extract the job posts from the archived pages instead of crawling, optionally of a single scraper')
+    parser.add_argument('--metrics', nargs='?', const=METRICS_PATH, metavar='PATH',
+                        help=f'Record the timings and throughput of the run and write them to PATH.json and PATH.prom (default {METRICS_PATH})')
+    parser.add_argument('--aggregates', action='store_true',
+                        help='Update the skill and word counts of the new and changed job posts afterwards, see aggregates.py')
+    args = parser.parse_args()
 
-    # Read the secret credentials for login
-    with open("../credentials.json",'r') as secrets:
-        creds = json.load(secrets)
+    # Enabled before any browser is created, so that the sessions are instrumented
+    METRICS.enabled = args.metrics is not None
 
     # Initialize the MongoDB database
     database = MongoDB()
+    database.ensure_indexes()
+
+    if args.reextract:
+        reextract(database, PageArchive(), None if args.reextract == 'all' else args.reextract)
+    else:
+        # Search keywords used for scraping job posts
+        role = ["Data Scientist", "Machine Learning", "Data Analyst", "ML Ops", "Data Engineer"]
+        location = "Greece"
+
+        # Read the secret credentials for login
+        with open("../credentials.json",'r') as secrets:
+            creds = json.load(secrets)
+
+        archive = PageArchive() if args.archive else None
+
+        # Scrapers are created inside their own worker so that each one gets a separate browser
+        factories = {
+            'LinkedInScraper': lambda: LinkedInScraper(creds['username'], creds['password'], workers=DETAIL_WORKERS, archive=archive),
+            'KarieraScraper':  lambda: KarieraScraper(workers=DETAIL_WORKERS, http=HTTP_DETAILS, archive=archive),
+            'IndeedScraper':   lambda: IndeedScraper(workers=DETAIL_WORKERS, http=HTTP_DETAILS, archive=archive)
+        }
+
+        # Perform scraping from all available websites concurrently
+        crawl(factories, role, location, database, max_workers=MAX_WORKERS)
+
+    # Count the words of the new and refreshed job posts, scikit-learn is only loaded when asked for
+    if args.aggregates:
+        from aggregates import AggregateStore
+        with METRICS.timer('aggregates'):
+            AggregateStore(database).update()
 
-    # List of created scrapers
-    scrapers = [
-        LinkedInScraper(creds['username'], creds['password']),
-        KarieraScraper(),
-        IndeedScraper()
-    ]
-
-    # Perform scraping from all available websites
-    for scraper in scrapers:
-        scraped_jobs = scraper.get_jobs(role, location)
-        if scraped_jobs:
-            database.insert_documents(scraped_jobs)
+    if METRICS.enabled:
+        METRICS.write(args.metrics)
+        pprint(msg=f'Metrics written to {args.metrics}.json and {args.metrics}.prom', type=1, prefix='Crawler')
@@ -1,36 +1,126 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 from datetime import datetime
-import time
 from .common import *
+from .pool import DriverPool
+from .metrics import METRICS
+from .fetch import HttpFetcher, node_text
+
+# Address of the portal, replaced by a local stand-in when benchmarking
+BASE_URL = 'https://gr.indeed.com/'
+
+# Maximum number of seconds to wait for a page to become ready
+TIMEOUT = 10
+
+# XPath of the job cards contained in a page of results
+JOB_CARD = "//div[@id='mosaic-provider-jobcards']/ul/li"
+
+# Fields of each job card, relative to the card. Cards whose first element has an id are placeholders
+JOB_INFO = './div/div[1]/div/div[1]/div/table[1]/tbody/tr/td/div[1]/h2'
+LISTING_FIELDS = {
+    'placeholder': ('./div', 'id'),
+    'title':       JOB_INFO + '/a/span',
+    'url':         (JOB_INFO + '/a', 'href'),
+    'id':          (JOB_INFO + '/a', 'data-jk')
+}
+
+# XPaths of the information contained in the page of a job post
+JOB_SECTION = '//div[@id="viewJobSSRRoot"]/div[2]/div/div[4]/div/div/div[1]/div[1]'
+DETAIL_XPATHS = {
+    'title':       JOB_SECTION + '//h1[contains(@class, "jobsearch-JobInfoHeader-title")]',
+    'company':     JOB_SECTION + '/div[3]/div[1]/div[2]/div/div/div/div[1]/div[2]/div/a',
+    'location':    JOB_SECTION + '//div[contains(@class, "jobsearch-CompanyInfoWithoutHeaderImage")]/div/div/div[2]/div',
+    'type':        JOB_SECTION + '//div[@id="jobDetailsSection"]/div[2]/div[2]',
+    'description': JOB_SECTION + '//*[@id="jobDescriptionText"]'
+}
+
+def make_job(fields: dict, job_record: tuple) -> (dict | None):
+    '''
+    Builds a job post from the text of its fields, whether they were read by the browser or parsed from the HTML.
+
+    Args:
+    -------
+    - `fields`     (dict):  The text of each field of `DETAIL_XPATHS`, None for the fields missing from the page
+    - `job_record` (tuple): The url, id and titles of the job post
+
+    Returns:
+    -------
+    - `dict`: The information gathered about the job post
+    - `None`: If any of the required fields is missing from the page
+    '''
+
+    job_url, job_id, job_roles = job_record
+    if not all(fields[name] is not None for name in ('title', 'location', 'description')):
+        return None
 
-TIMEOUT = 2
+    job = {}
+    job['_id']   = str(job_id)
+    job['url']   = job_url
+    job['title'] = fields['title']
+    job['roles'] = job_roles
+
+    # This site allows for missing value under the company name
+    if fields['company'] is not None:
+        job['company'] = fields['company']
+
+    job['location'] = fields['location']
+
+    # This site allows for missing value under the type variable
+    if fields['type'] is not None:
+        job["type"] = fields['type']
+
+    job['description']   = fields['description']
+    job['last_accessed'] = datetime.utcnow()
+
+    return job
+
+def parse_job_page(tree, job_record: tuple) -> (dict | None):
+    '''
+    Extracts the information about a job post from its HTML, without the use of a browser.
+
+    Args:
+    -------
+    - `tree`       (HtmlElement): The parsed page of the job post
+    - `job_record` (tuple):       The url, id and titles of the job post
+
+    Returns:
+    -------
+    - `dict`: The information gathered about the job post
+    - `None`: If any of the required fields is missing from the page
+    '''
+
+    return make_job({name: node_text(tree, xpath) for name, xpath in DETAIL_XPATHS.items()}, job_record)
 
 class IndeedScraper:
     '''
     Creates a new instance of the scraper (Indeed).
 
+    Args:
+    -------
+    - `workers` (int):  Number of browser sessions used to scrap the job posts in parallel
+    - `http`    (bool): Fetch the pages of the job posts over plain HTTP, using the browser only when that fails
+    - `archive` (PageArchive): Optional archive keeping the HTML of the fetched pages
+    - `base_url` (str): Address of the portal
+    - `headless` (bool): Run the browser without a window
+
     Methods:
     -------
     - `login()`:           Performs the login to LinkedIn
     - `load_more()`:       Loads the next page until a thrueshold
     - `filter_job()`:      Uses regex to match title of job
+    - `extract_job`:       Formats the data from a single job into a dictionary
     - `extract_job_data`:  Formats the data from each job into a dictionary
     - `get_jobs`:          Main scraping method which automates the procedure
     '''
 
-    def __init__(self):
+    def __init__(self, workers=1, http=False, archive=None, base_url=BASE_URL, headless=True):
         self.name = self.__class__.__name__
-        self.options = webdriver.EdgeOptions()
-        #self.options.add_argument("headless")
-        self.options.add_argument('--ignore-certificate-errors')
-        self.options.add_argument("--start-maximized")
-        self.options.add_argument("--disable-gpu")
-        self.options.add_argument("--no-sandbox")
-        self.options.add_argument("--disable-notifications")
-        self.options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        self.driver = webdriver.Edge(options=self.options)
+        self.driver = create_driver(headless=headless)
+        self.headless = headless
+        self.workers = workers
+        self.archive = archive
+        self.base_url = base_url
+        self.fetcher = HttpFetcher(archive=archive, portal=self.name) if http else None
 
     def load_more(self) -> bool:
         '''
@@ -50,7 +140,7 @@ class IndeedScraper:
         try:
             last_pagination = pages[-1].find_element(By.XPATH, './a')
             if last_pagination.get_attribute('data-testid') == 'pagination-page-next':
-                self.driver.get(last_pagination.get_attribute('href'))
+                load_page(self.driver, last_pagination.get_attribute('href'), JOB_CARD, TIMEOUT, label='listing')
                 return True
         except NoSuchElementException:
             return False
@@ -73,43 +163,40 @@ class IndeedScraper:
         pprint(msg=f'Gathering job posts for the following roles: {roles}', type=1, prefix=self.name)
         print_progress(0, len(roles))
 
-        job_list = []
+        # Job posts indexed by their id, keeping the order in which they were found
+        job_index = {}
 
         for i, role in enumerate(roles):
             # Replace special characters with utf characters
             role = role.replace(" ", "%20")
             location = location.replace(", ", "%2C%20")
-            url = f"https://gr.indeed.com/jobs?q={role}&l={location}"
+            url = f"{self.base_url}jobs?q={role}&l={location}"
 
             # Access url with set driver
-            self.driver.get(url)
+            load_page(self.driver, url, JOB_CARD, TIMEOUT, label='listing')
             
              # Number of initially loaded jobs
             current_job_index = 0
 
             while True:
-                job_listings = self.driver.find_elements(By.XPATH, "//div[@id='mosaic-provider-jobcards']/ul/li")
+                # All job cards of the page are read with a single round trip
+                job_listings = extract_fields(self.driver, LISTING_FIELDS, JOB_CARD)
+                if self.archive is not None:
+                    self.archive.save(self.name, self.driver.page_source, url=self.driver.current_url, kind='listing')
 
                 for job_post in job_listings:
-                    job_info_path = './div/div[1]/div/div[1]/div/table[1]/tbody/tr/td/div[1]/h2'
-
                     # This website contains an empty div every 5 job posts so we need to avoid this conflict
-                    if len(job_post.find_element(By.XPATH, './div').get_attribute('id')) != 0:
+                    if job_post['placeholder'] is None or len(job_post['placeholder']) != 0:
                         continue
-                    
+
                     current_job_index += 1
-                    try:
-                        job_roles = filter_job(job_post.find_element(By.XPATH, job_info_path + '/a/span').text)
-                        if not job_roles:
-                            continue
-                        job_url = job_post.find_element(By.XPATH, job_info_path + '/a').get_attribute('href')
-                        job_id = job_post.find_element(By.XPATH, job_info_path + '/a').get_attribute('data-jk')
-
-                        exists = [item for item in job_list if item[1] == job_id]
-                        if not exists:
-                            job_list.append((job_url, job_id, job_roles))
-                    except NoSuchElementException:
-                        pass
+                    if job_post['title'] is None or job_post['url'] is None:
+                        continue
+                    job_roles = filter_job(job_post['title'])
+                    if not job_roles:
+                        continue
+
+                    add_job(job_index, job_post['url'], job_post['id'], job_roles)
 
                 # Limit job posts accessed as bigger number results in less accuracy of titles
                 if current_job_index >= max_posts:
@@ -119,73 +206,87 @@ class IndeedScraper:
                    break
 
             print_progress(i+1, len(roles),
-                msg_complete = pprint(msg=f'Number of total jobs identified: {len(job_list)}', type=1, prefix=self.name, as_str=True)
+                msg_complete = pprint(msg=f'Number of total jobs identified: {len(job_index)}', type=1, prefix=self.name, as_str=True)
             )
 
-        return job_list
+        return list(job_index.values())
 
-    def extract_job_data(self, job_list: list):
+    def new_driver(self):
         '''
-        Scraps and extracts the information about a specific job post.
+        Creates an additional browser session, headless unless the scraper was created with a window.
+        '''
+
+        return create_driver(headless=self.headless)
+
+    def extract_job(self, driver, job_record: tuple) -> dict:
+        '''
+        Scraps and extracts the information about a single job post.
 
         Args:
         -------
-        - `job_list` (list): A collection of scraped job posts with their url, id and titles
+        - `driver`     (WebDriver): The browser session used to access the job post
+        - `job_record` (tuple):     The url, id and titles of the job post
+
+        Returns:
+        -------
+        - `dict`: The information gathered about the job post
+        '''
+
+        job_url, job_id, job_roles = job_record
+        load_page(driver, job_url, DETAIL_XPATHS['description'], TIMEOUT, label='detail')
+        if self.archive is not None:
+            self.archive.save(self.name, driver.page_source, job_id, job_url, job_roles)
+
+        # Every field is read with a single round trip to the browser
+        job = make_job(extract_fields(driver, DETAIL_XPATHS), job_record)
+        if job is None:
+            raise NoSuchElementException(f'A required field is missing from the job post {job_id}')
+        return job
+
+    def extract_job_data(self, job_list: list, checkpoint = None):
+        '''
+        Scraps and extracts the information about each job post using a pool of browser sessions.
+
+        Args:
+        -------
+        - `job_list`   (list):       A collection of scraped job posts with their url, id and titles
+        - `checkpoint` (Checkpoint): Optional journal receiving each extracted job post
 
         Returns:
         -------
         - `list`: A collection containing information about the gathered job posts. Each element is a `dict`
         '''
 
-        pprint(msg='Scraping data for each job post.', type=1, prefix=self.name)
+        job_data = []
+
+        # Try the lightweight HTTP requests first and keep the browser for the pages that failed
+        if self.fetcher is not None:
+            job_data, job_list = self.fetcher.extract(job_list, parse_job_page, checkpoint.add if checkpoint is not None else None)
+            pprint(msg=f'Job data were processed over HTTP for {len(job_data)} job posts, {len(job_list)} left for the browser.', type=1, prefix=self.name)
+            if not job_list:
+                return job_data
+
+        pprint(msg=f'Scraping data for each job post using {self.workers} browser session(s).', type=1, prefix=self.name)
         print_progress(0, len(job_list))
 
-        job_data = []
-        job_info_section = f'//div[@id="viewJobSSRRoot"]/div[2]/div/div[4]/div/div/div[1]/div[1]'
-
-        for i, job_record in enumerate(job_list):
-            job_url, job_id, job_roles = job_record
-            job = {}
-            self.driver.get(job_url)
-            time.sleep(1)
-
-            job_container = self.driver.find_element(By.XPATH, job_info_section)
-            try:
-                job['_id']   = str(job_id)
-                job['url']   = job_url
-                job['title'] = job_container.find_element(By.XPATH, './/h1[contains(@class, "jobsearch-JobInfoHeader-title")]').text
-                job['roles'] = job_roles
-
-                # This site allows for missing value under the company name
-                try:
-                    job['company'] = self.driver.find_element(By.XPATH, job_info_section + '/div[3]/div[1]/div[2]/div/div/div/div[1]/div[2]/div/a').text
-                except NoSuchElementException:
-                    pass
-
-                job['location'] = job_container.find_element(By.XPATH, './/div[contains(@class, "jobsearch-CompanyInfoWithoutHeaderImage")]/div/div/div[2]/div').text
-
-                # This site allows for missing value under the type variable
-                try:
-                    job["type"] = job_container.find_element(By.XPATH, './/div[@id="jobDetailsSection"]/div[2]/div[2]').text
-                except NoSuchElementException:
-                    pass
-
-                job['description']  = job_container.find_element(By.ID, 'jobDescriptionText').text
-                job['last_accessed'] = datetime.utcnow()
-
-                job_data.append(job)
-
-            except NoSuchElementException:
-                pprint(msg=f'Exception retrieving data from job url:\n{job_url}', type=3, prefix=self.name)
-                break
-
-            print_progress(i+1, len(job_list),
-                msg_complete = pprint(msg='All job data were processed successfully.', type=4, prefix=self.name, as_str=True)
-            )
+        with DriverPool(self.new_driver, min(self.workers, len(job_list)), driver=self.driver) as pool:
+            for i, (job_record, job, error) in enumerate(pool.imap_unordered(self.extract_job, job_list)):
+                if error is None:
+                    job_data.append(job)
+                    METRICS.count('details_parsed', portal=self.name, source='browser')
+                    if checkpoint is not None:
+                        checkpoint.add(job)
+                else:
+                    METRICS.count('details_failed', portal=self.name, source='browser')
+                    pprint(msg=f'Exception retrieving data from job url:\n{job_record[0]}', type=3, prefix=self.name)
+
+                print_progress(i+1, len(job_list),
+                    msg_complete = pprint(msg=f'Job data were processed for {len(job_data)} job posts.', type=4, prefix=self.name, as_str=True)
+                )
 
         return job_data
 
-    def get_jobs(self, roles: list, location: str, max_posts: int = 250) -> (list | bool):
+    def get_jobs(self, roles: list, location: str, max_posts: int = 250, known_ids: set = None, checkpoint = None) -> (list | bool):
         '''
         Performs the necessary steps to scrap data from LinkedIn given a job title and location.
 
@@ -194,6 +295,8 @@ class IndeedScraper:
         - `roles`         (list): A collection of job titles for searching
         - `location`      (str):  The required location for the search
         - `max_posts`     (int):  Optional value, how may posts to search for each role. Default is set to 250
+        - `known_ids`     (set):  Optional value, ids of job posts which are already stored and should not be visited again
+        - `checkpoint`    (Checkpoint): Optional value, journal of the progress. A journaled job list is resumed instead of searched again
 
         Returns:
         -------
@@ -201,11 +304,33 @@ class IndeedScraper:
         - `bool`: Returns False if either no job posts were found or the login failed
         '''
 
-        job_list = self.get_job_list(roles, location, max_posts)
-
-        if not job_list:
-            pprint(msg='No jobs found during search.', type=3, prefix=self.name)
-            return False
-
-        return self.extract_job_data(job_list)
+        if checkpoint is not None and checkpoint.job_list is not None:
+            job_list = checkpoint.job_list
+        else:
+            with METRICS.timer('phase', portal=self.name, phase='search'):
+                job_list = self.get_job_list(roles, location, max_posts)
+
+            if not job_list:
+                pprint(msg='No jobs found during search.', type=3, prefix=self.name)
+                return False
+
+            # Skip the job posts which are already stored in the database
+            if known_ids:
+                job_list = drop_known(job_list, known_ids)
+                if not job_list:
+                    pprint(msg='All job posts found are already stored.', type=1, prefix=self.name)
+                    return False
+
+            if checkpoint is not None:
+                checkpoint.start(job_list)
+
+        # Continue from the first job post which was not extracted before
+        if checkpoint is not None:
+            job_list = checkpoint.remaining(job_list)
+            if not job_list:
+                return checkpoint.finish()
+
+        with METRICS.timer('phase', portal=self.name, phase='details'):
+            job_data = self.extract_job_data(job_list, checkpoint)
+        return checkpoint.finish() if checkpoint is not None else job_data
         
\ No newline at end of file
@@ -1,38 +1,127 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.support import expected_conditions as EC
 from datetime import datetime
-import time
 from .common import *
+from .pool import DriverPool
+from .metrics import METRICS
+from .fetch import HttpFetcher, node_text
+
+# Address of the portal, replaced by a local stand-in when benchmarking
+BASE_URL = 'https://www.kariera.gr/'
+
+# Maximum number of seconds to wait for a page to become ready
+TIMEOUT = 10
+
+# XPath of the job cards contained in a page of results
+JOB_CARD = "//*[@data-testid='job-card']"
+
+# Fields of each job card, relative to the card
+LISTING_FIELDS = {
+    'title': './/div[1]/div[1]/div[2]/div[2]/a',
+    'url':   ('.//div[1]/div[1]/div[2]/div[2]/a', 'href')
+}
+
+# XPaths of the information contained in the page of a job post
+JOB_SECTION = '//main[@class="ant-layout-content"]/section'
+DETAIL_XPATHS = {
+    'title':       JOB_SECTION + '/div[1]/div/div/div[1]/div/div',
+    'company':     JOB_SECTION + '/div[2]/div[1]/div[1]/section/div[1]/a[1]',
+    'location':    JOB_SECTION + '/div[2]/div[1]/div[2]/div[1]/div[1]/a',
+    'type':        JOB_SECTION + '/div[2]/div[1]/div[2]/div[1]/div[4]/a',
+    'level':       JOB_SECTION + '/div[2]/div[1]/div[2]/div[1]/div[3]/a',
+    'industry':    JOB_SECTION + '/div[2]/div[1]/div[2]/div[2]/div[1]/a',
+    'workplace':   JOB_SECTION + '/div[2]/div[1]/div[2]/div[2]/div[2]/a',
+    'description': JOB_SECTION + '/div[2]/div[2]'
+}
+
+def make_job(fields: dict, job_record: tuple) -> (dict | None):
+    '''
+    Builds a job post from the text of its fields, whether they were read by the browser or parsed from the HTML.
+
+    Args:
+    -------
+    - `fields`     (dict):  The text of each field of `DETAIL_XPATHS`, None for the fields missing from the page
+    - `job_record` (tuple): The url, id and titles of the job post
+
+    Returns:
+    -------
+    - `dict`: The information gathered about the job post
+    - `None`: If any of the required fields is missing from the page
+    '''
 
-TIMEOUT = 2
+    job_url, job_id, job_roles = job_record
+    if not all(fields[name] is not None for name in ('title', 'location', 'type', 'level', 'industry', 'description')):
+        return None
+
+    job = {}
+    job['_id']   = int(job_id)
+    job['url']   = job_url
+    job['title'] = fields['title']
+    job['roles'] = job_roles
+
+    # This site allows for no value under the company name
+    if fields['company'] is not None:
+        job['company'] = fields['company']
+
+    job['location']    = fields['location']
+    job["type"]        = fields['type']
+    job["level"]       = fields['level']
+    job["industry"]    = fields['industry']
+    job['workplace']   = fields['workplace'] or 'On-site'
+    job['description'] = fields['description']
+
+    job['last_accessed'] = datetime.utcnow()
+
+    return job
+
+def parse_job_page(tree, job_record: tuple) -> (dict | None):
+    '''
+    Extracts the information about a job post from its HTML, without the use of a browser.
+
+    Args:
+    -------
+    - `tree`       (HtmlElement): The parsed page of the job post
+    - `job_record` (tuple):       The url, id and titles of the job post
+
+    Returns:
+    -------
+    - `dict`: The information gathered about the job post
+    - `None`: If any of the required fields is missing from the page
+    '''
+
+    return make_job({name: node_text(tree, xpath) for name, xpath in DETAIL_XPATHS.items()}, job_record)
 
 class KarieraScraper:
     '''
     Creates a new instance of the scraper (Kariera).
 
+    Args:
+    -------
+    - `workers` (int):  Number of browser sessions used to scrap the job posts in parallel
+    - `http`    (bool): Fetch the pages of the job posts over plain HTTP, using the browser only when that fails
+    - `archive` (PageArchive): Optional archive keeping the HTML of the fetched pages
+    - `base_url` (str): Address of the portal
+    - `headless` (bool): Run the browser without a window
+
     Methods:
     -------
     - `login()`:           Performs the login to LinkedIn
     - `load_more()`:       Loads the next page until a thrueshold
     - `filter_job()`:      Uses regex to match title of job
+    - `extract_job`:       Formats the data from a single job into a dictionary
     - `extract_job_data`:  Formats the data from each job into a dictionary
     - `get_jobs`:          Main scraping method which automates the procedure
     '''
 
-    def __init__(self):
+    def __init__(self, workers=1, http=False, archive=None, base_url=BASE_URL, headless=True):
         self.name = self.__class__.__name__
-        self.options = webdriver.EdgeOptions()
-        #self.options.add_argument("headless")
-        self.options.add_argument('--ignore-certificate-errors')
-        self.options.add_argument("--start-maximized")
-        self.options.add_argument("--disable-gpu")
-        self.options.add_argument("--no-sandbox")
-        self.options.add_argument("--disable-notifications")
-        self.options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        self.driver = webdriver.Edge(options=self.options)
+        self.driver = create_driver(headless=headless)
+        self.headless = headless
+        self.workers = workers
+        self.archive = archive
+        self.base_url = base_url
+        self.fetcher = HttpFetcher(archive=archive, portal=self.name) if http else None
 
     def load_more(self, url: str, current_page: int) -> bool:
         '''
@@ -47,8 +136,7 @@ class KarieraScraper:
         pages = self.driver.find_elements(By.CLASS_NAME, "ant-pagination-item")
         for page in pages:
             if int(page.get_attribute("title")) > current_page:
-                self.driver.get(url + f'&page={current_page}')
-                time.sleep(TIMEOUT)
+                load_page(self.driver, url + f'&page={current_page}', JOB_CARD, TIMEOUT, label='listing')
                 return True
         return False
 
@@ -71,42 +159,39 @@ class KarieraScraper:
         pprint(msg=f'Gathering job posts for the following roles: {roles}', type=1, prefix=self.name)
         print_progress(0, len(roles))
 
-        job_list = []
+        # Job posts indexed by their id, keeping the order in which they were found
+        job_index = {}
 
         for i, role in enumerate(roles):
             # Replace special characters with utf characters
             role = role.replace(" ", "%20")
-            url = f"https://www.kariera.gr/en/jobs?title={role}"
+            url = f"{self.base_url}en/jobs?title={role}"
 
             # Access url with set driver
-            self.driver.get(url)
-            try:
-                WebDriverWait(self.driver,5).until(EC.visibility_of_all_elements_located((By.ID,"CybotCookiebotDialogBodyButtonDecline")))
-                self.driver.find_element(By.ID,"CybotCookiebotDialogBodyButtonDecline").click()
-            except TimeoutException:
-                pass
+            load_page(self.driver, url, JOB_CARD, TIMEOUT, label='listing')
+            if wait_until(self.driver, EC.element_to_be_clickable((By.ID, "CybotCookiebotDialogBodyButtonDecline")), 5, label='cookies'):
+                self.driver.find_element(By.ID, "CybotCookiebotDialogBodyButtonDecline").click()
 
             # Number of initially loaded jobs
             current_page = 1
             current_job_index = 0
 
             while True:
-                job_listings = self.driver.find_elements(By.XPATH, "//*[@data-testid='job-card']")
+                # All job cards of the page are read with a single round trip
+                job_listings = extract_fields(self.driver, LISTING_FIELDS, JOB_CARD)
+                if self.archive is not None:
+                    self.archive.save(self.name, self.driver.page_source, url=self.driver.current_url, kind='listing')
 
                 for job_post in job_listings:
                     current_job_index += 1
-                    try:
-                        job_roles = filter_job(job_post.find_element(By.XPATH, './/div[1]/div[1]/div[2]/div[2]/a').text)
-                        if not job_roles:
-                            continue
-                        job_url = job_post.find_element(By.XPATH, './/div[1]/div[1]/div[2]/div[2]/a').get_attribute('href')
-                        job_id = job_url.split('/')[-1]
-
-                        exists = [item for item in job_list if item[1] == job_id]
-                        if not exists:
-                            job_list.append((job_url, job_id, job_roles))
-                    except NoSuchElementException:
-                        pass
+                    if job_post['title'] is None or job_post['url'] is None:
+                        continue
+                    job_roles = filter_job(job_post['title'])
+                    if not job_roles:
+                        continue
+                    job_id = job_post['url'].split('/')[-1]
+
+                    add_job(job_index, job_post['url'], job_id, job_roles)
 
                 # Limit job posts accessed as bigger number results in less accuracy of titles
                 if current_job_index >= max_posts:
@@ -118,78 +203,87 @@ class KarieraScraper:
                     break
 
             print_progress(i+1, len(roles),
-                msg_complete = pprint(msg=f'Number of total jobs identified: {len(job_list)}', type=1, prefix=self.name, as_str=True)
+                msg_complete = pprint(msg=f'Number of total jobs identified: {len(job_index)}', type=1, prefix=self.name, as_str=True)
             )
 
-        return job_list
+        return list(job_index.values())
+
+    def new_driver(self):
+        '''
+        Creates an additional browser session, headless unless the scraper was created with a window.
+        '''
+
+        return create_driver(headless=self.headless)
 
-    def extract_job_data(self, job_list: list):
+    def extract_job(self, driver, job_record: tuple) -> dict:
         '''
-        Scraps and extracts the information about a specific job post.
+        Scraps and extracts the information about a single job post.
 
         Args:
         -------
-        - `job_list` (list): A collection of scraped job posts with their url, id and titles
+        - `driver`     (WebDriver): The browser session used to access the job post
+        - `job_record` (tuple):     The url, id and titles of the job post
+
+        Returns:
+        -------
+        - `dict`: The information gathered about the job post
+        '''
+
+        job_url, job_id, job_roles = job_record
+        load_page(driver, job_url, DETAIL_XPATHS['description'], TIMEOUT, label='detail')
+        if self.archive is not None:
+            self.archive.save(self.name, driver.page_source, job_id, job_url, job_roles)
+
+        # Every field is read with a single round trip to the browser
+        job = make_job(extract_fields(driver, DETAIL_XPATHS), job_record)
+        if job is None:
+            raise NoSuchElementException(f'A required field is missing from the job post {job_id}')
+        return job
+
+    def extract_job_data(self, job_list: list, checkpoint = None):
+        '''
+        Scraps and extracts the information about each job post using a pool of browser sessions.
+
+        Args:
+        -------
+        - `job_list`   (list):       A collection of scraped job posts with their url, id and titles
+        - `checkpoint` (Checkpoint): Optional journal receiving each extracted job post
 
         Returns:
         -------
         - `list`: A collection containing information about the gathered job posts. Each element is a `dict`
         '''
 
-        pprint(msg='Scraping data for each job post.', type=1, prefix=self.name)
+        job_data = []
+
+        # Try the lightweight HTTP requests first and keep the browser for the pages that failed
+        if self.fetcher is not None:
+            job_data, job_list = self.fetcher.extract(job_list, parse_job_page, checkpoint.add if checkpoint is not None else None)
+            pprint(msg=f'Job data were processed over HTTP for {len(job_data)} job posts, {len(job_list)} left for the browser.', type=1, prefix=self.name)
+            if not job_list:
+                return job_data
+
+        pprint(msg=f'Scraping data for each job post using {self.workers} browser session(s).', type=1, prefix=self.name)
         print_progress(0, len(job_list))
 
-        job_data = []
-        job_info_section = f'//main[@class="ant-layout-content"]/section'
-
-        for i, job_record in enumerate(job_list):
-            job_url, job_id, job_roles = job_record
-            job = {}
-            self.driver.get(job_url)
-            time.sleep(TIMEOUT)
-
-            try:
-                job['_id']   = int(job_id)
-                job['url']   = job_url
-                job['title'] = self.driver.find_element(By.XPATH, job_info_section + '/div[1]/div/div/div[1]/div/div').text
-                job['roles'] = job_roles
-
-                # This site allows for no value under the company name
-                try:
-                    job['company']  = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/div[1]/div[1]/section/div[1]/a[1]').text
-                except NoSuchElementException:
-                    pass
-
-                job['location'] = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/div[1]/div[2]/div[1]/div[1]/a').text
-                job["type"]     = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/div[1]/div[2]/div[1]/div[4]/a').text
-                job["level"]    = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/div[1]/div[2]/div[1]/div[3]/a').text
-                job["industry"] = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/div[1]/div[2]/div[2]/div[1]/a').text
-
-                try:
-                    job['workplace'] = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/div[1]/div[2]/div[2]/div[2]/a').text
-                except NoSuchElementException:
-                    job['workplace'] = 'On-site'
-                
-                # Get the description of the job
-                #job['description'] = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/div[2]').get_attribute('innerText')
-                job['description'] = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/div[2]').text
-
-                job['last_accessed'] = datetime.utcnow()
-
-                job_data.append(job)
-
-            except NoSuchElementException as e:
-                pprint(msg=f'Exception retrieving data from job url:\n{job_url}', type=3, prefix=self.name)
-                print(e)
-                break
-
-            print_progress(i+1, len(job_list),
-                msg_complete = pprint(msg='All job data were processed successfully.', type=4, prefix=self.name, as_str=True)
-            )
+        with DriverPool(self.new_driver, min(self.workers, len(job_list)), driver=self.driver) as pool:
+            for i, (job_record, job, error) in enumerate(pool.imap_unordered(self.extract_job, job_list)):
+                if error is None:
+                    job_data.append(job)
+                    METRICS.count('details_parsed', portal=self.name, source='browser')
+                    if checkpoint is not None:
+                        checkpoint.add(job)
+                else:
+                    METRICS.count('details_failed', portal=self.name, source='browser')
+                    pprint(msg=f'Exception retrieving data from job url:\n{job_record[0]}', type=3, prefix=self.name)
+
+                print_progress(i+1, len(job_list),
+                    msg_complete = pprint(msg=f'Job data were processed for {len(job_data)} job posts.', type=4, prefix=self.name, as_str=True)
+                )
 
         return job_data
 
-    def get_jobs(self, roles: list, location: str, max_posts: int = 250) -> (list | bool):
+    def get_jobs(self, roles: list, location: str, max_posts: int = 250, known_ids: set = None, checkpoint = None) -> (list | bool):
         '''
         Performs the necessary steps to scrap data from LinkedIn given a job title and location.
 
@@ -198,6 +292,8 @@ class KarieraScraper:
         - `roles`         (list): A collection of job titles for searching
         - `location`      (str):  The required location for the search
         - `max_posts`     (int):  Optional value, how may posts to search for each role. Default is set to 250
+        - `known_ids`     (set):  Optional value, ids of job posts which are already stored and should not be visited again
+        - `checkpoint`    (Checkpoint): Optional value, journal of the progress. A journaled job list is resumed instead of searched again
 
         Returns:
         -------
@@ -205,10 +301,32 @@ class KarieraScraper:
         - `bool`: Returns False if either no job posts were found or the login failed
         '''
 
-        job_list = self.get_job_list(roles, location, max_posts)
-
-        if not job_list:
-            pprint(msg='No jobs found during search.', type=3, prefix=self.name)
-            return False
-
-        return self.extract_job_data(job_list)
+        if checkpoint is not None and checkpoint.job_list is not None:
+            job_list = checkpoint.job_list
+        else:
+            with METRICS.timer('phase', portal=self.name, phase='search'):
+                job_list = self.get_job_list(roles, location, max_posts)
+
+            if not job_list:
+                pprint(msg='No jobs found during search.', type=3, prefix=self.name)
+                return False
+
+            # Skip the job posts which are already stored in the database
+            if known_ids:
+                job_list = drop_known(job_list, known_ids)
+                if not job_list:
+                    pprint(msg='All job posts found are already stored.', type=1, prefix=self.name)
+                    return False
+
+            if checkpoint is not None:
+                checkpoint.start(job_list)
+
+        # Continue from the first job post which was not extracted before
+        if checkpoint is not None:
+            job_list = checkpoint.remaining(job_list)
+            if not job_list:
+                return checkpoint.finish()
+
+        with METRICS.timer('phase', portal=self.name, phase='details'):
+            job_data = self.extract_job_data(job_list, checkpoint)
+        return checkpoint.finish() if checkpoint is not None else job_data
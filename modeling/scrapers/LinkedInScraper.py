@@ -1,13 +1,104 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from datetime import datetime
-import time
+import os
 from .common import *
+from .pool import DriverPool
+from .metrics import METRICS
+from .scheduler import SCHEDULER
+from .fetch import node_text
+
+# Address of the portal, replaced by a local stand-in when benchmarking
+BASE_URL = 'https://www.linkedin.com/'
+
+# Maximum number of seconds to wait for a page to become ready
+TIMEOUT = 10
+
+# Maximum number of seconds to wait for new results after scrolling
+SCROLL_TIMEOUT = 2.5
+
+# XPath of the job cards contained in the results and the fields of each card, relative to the card
+JOB_CARD = '//*[@id="main-content"]/section[@class="two-pane-serp-page__results-list"]/ul/li'
+LISTING_FIELDS = {
+    'title': './div/div[2]/h3',
+    'url':   ('./div/a', 'href'),
+    'urn':   ('./div', 'data-entity-urn')
+}
+
+# XPaths of the information contained in the page of a job post
+JOB_SECTION = '//div[@role="main"]/div[1]/div/div/div[1]'
+DETAIL_XPATHS = {
+    'title':       JOB_SECTION + '/h1',
+    'company':     JOB_SECTION + '/div[1]/span[1]/span[1]',
+    'location':    JOB_SECTION + '/div[1]/span[1]/span[2]',
+    'workplace':   JOB_SECTION + '/div[1]/span[1]/span[3]',
+    'type':        JOB_SECTION + '/div[2]/ul/li[1]/span',
+    'insights':    JOB_SECTION + '/div[2]/ul/li[2]/span',
+    'description': '//div[@id="job-details"]/span'
+}
+
+def make_job(fields: dict, job_record: tuple) -> (dict | None):
+    '''
+    Builds a job post from the text of its fields, whether they were read by the browser or parsed from the HTML.
+
+    Args:
+    -------
+    - `fields`     (dict):  The text of each field of `DETAIL_XPATHS`, None for the fields missing from the page
+    - `job_record` (tuple): The url, id and titles of the job post
+
+    Returns:
+    -------
+    - `dict`: The information gathered about the job post
+    - `None`: If any of the required fields is missing from the page
+    '''
+
+    job_url, job_id, job_roles = job_record
+    if not all(fields[name] is not None for name in ('title', 'company', 'location', 'type', 'insights', 'description')):
+        return None
+
+    job = {}
+    job['_id']      = int(job_id)
+    job['url']      = job_url
+    job['title']    = fields['title']
+    job['roles']    = job_roles
+    job['company']  = fields['company']
+    job['location'] = fields['location']
 
-TIMEOUT = 2.5
+    job_type = fields['type'].split(" · ")
+    job["type"] = job_type[0]
+    if len(job_type) > 1:
+        job["level"] = job_type[1]
+
+    job_insights = fields['insights'].split(" · ")
+    if len(job_insights) > 1:
+        job["industry"] = job_insights[1]
+
+    if fields['workplace'] is not None:
+        job['workplace'] = fields['workplace']
+
+    job['description']   = fields['description']
+    job['last_accessed'] = datetime.utcnow()
+
+    return job
+
+def parse_job_page(tree, job_record: tuple) -> (dict | None):
+    '''
+    Extracts the information about a job post from its HTML, without the use of a browser.
+
+    Args:
+    -------
+    - `tree`       (HtmlElement): The parsed page of the job post
+    - `job_record` (tuple):       The url, id and titles of the job post
+
+    Returns:
+    -------
+    - `dict`: The information gathered about the job post
+    - `None`: If any of the required fields is missing from the page
+    '''
+
+    return make_job({name: node_text(tree, xpath) for name, xpath in DETAIL_XPATHS.items()}, job_record)
 
 class LinkedInScraper:
     '''
@@ -17,32 +108,37 @@ class LinkedInScraper:
     -------
     - `username` (str): The username used to login to LinkedIn
     - `password` (str): The password used to login to LinkedIn
+    - `workers`  (int): Number of browser sessions used to scrap the job posts in parallel
+    - `archive`  (PageArchive): Optional archive keeping the HTML of the fetched pages
+    - `base_url` (str): Address of the portal
+    - `headless` (bool): Run the browser without a window
+    - `profile_dir` (str): Directory of the browser profiles, keeping the login between runs. None starts a fresh profile
 
     Methods:
     -------
     - `login()`:           Performs the login to LinkedIn
-    - `infinite_scroll()`: Scrolls to the end of the page
+    - `infinite_scroll()`: Scrolls to the end of the page of a browser session
+    - `search()`:          Collects the job posts of the search results
     - `filter_job()`:      Uses regex to match title of job
+    - `extract_job`:       Formats the data from a single job into a dictionary
     - `extract_job_data`:  Formats the data from each job into a dictionary
     - `get_jobs`:          Main scraping method which automates the procedure
     '''
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, workers=1, archive=None, base_url=BASE_URL, headless=True, profile_dir=PROFILE_DIR):
         self.name = self.__class__.__name__
-        self.options = webdriver.EdgeOptions()
-        #self.options.add_argument("headless")
-        self.options.add_argument('--ignore-certificate-errors')
-        self.options.add_argument("--start-maximized")
-        self.options.add_argument("--disable-gpu")
-        self.options.add_argument("--no-sandbox")
-        self.options.add_argument("--disable-notifications")
-        self.options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        self.driver = webdriver.Edge(options=self.options)
-
-        self.url_index = "https://www.linkedin.com/"
+        self.driver = create_driver(headless=headless, profile_dir=os.path.join(profile_dir, self.name) if profile_dir else None)
+        self.headless = headless
+
+        self.url_index = base_url
 
         self.username = username
         self.password = password
+        self.workers = workers
+        self.archive = archive
+
+        # Cookies of the logged in session, copied to the additional sessions of `extract_job_data()`
+        self.cookies = []
 
     def login(self) -> bool:
         '''
@@ -52,7 +148,12 @@ class LinkedInScraper:
         -------
         - `bool`: True if login was successful, otherwise False
         '''
-        self.driver.get(self.url_index)
+        SCHEDULER.run(self.url_index, lambda: self.driver.get(self.url_index))
+        ready = lambda driver: driver.find_elements(By.ID, 'global-nav') or driver.find_elements(By.ID, 'session_key')
+        if wait_until(self.driver, ready, 5, label='login') and self.driver.find_elements(By.ID, 'global-nav'):
+            pprint(msg='Reusing the LinkedIn session of the browser profile.', type=4, prefix=self.name)
+            return True
+
         WebDriverWait(self.driver,5).until(EC.visibility_of_all_elements_located((By.ID,"session_key")))
         self.driver.find_element(By.ID, 'session_key').send_keys(self.username)
         self.driver.find_element(By.ID, 'session_password').send_keys(self.password)
@@ -65,33 +166,34 @@ class LinkedInScraper:
         pprint(msg='Login to LinkedIn was successful.', type=4, prefix=self.name)
         return True
 
-    def infinite_scroll(self) -> bool:
+    def infinite_scroll(self, driver) -> bool:
         '''
         Scrolls down to the end of the page.
 
+        Args:
+        -------
+        - `driver` (WebDriver): The browser session showing the page
+
         Returns:
         -------
         - `bool`: If scroll was successful returns True. When the end of the page is found returns False
         '''
 
-        # Get scroll height
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
-
-        # Check if show more button is present and click it
-        infinite_scroller_btn = self.driver.find_elements(By.CLASS_NAME, "infinite-scroller__show-more-button--visible")
-        if infinite_scroller_btn:
-            infinite_scroller_btn[0].click()
-        self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(TIMEOUT)
+        def scroll():
+            # Get scroll height
+            last_height = driver.execute_script("return document.body.scrollHeight")
 
-        # Calculate new scroll height and compare with last value
-        new_height = self.driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
-            return False
+            # Check if show more button is present and click it
+            infinite_scroller_btn = driver.find_elements(By.CLASS_NAME, "infinite-scroller__show-more-button--visible")
+            if infinite_scroller_btn:
+                infinite_scroller_btn[0].click()
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
 
-        last_height = new_height
+            # Wait until new results extend the page, otherwise the end of the page was reached
+            return wait_for_scroll(driver, last_height, SCROLL_TIMEOUT)
 
-        return True
+        # Every scroll requests more results, so it is paced like a navigation. Reaching the end is not a failure
+        return SCHEDULER.run(self.url_index, scroll)
 
     def get_job_list(self, roles: list, location: str, max_posts: int) -> list:
         '''
@@ -111,7 +213,34 @@ class LinkedInScraper:
         pprint(msg=f'Gathering job posts for the following roles: {roles}', type=1, prefix=self.name)
         print_progress(0, len(roles))
 
-        job_list = []
+        # The results are only laid out as expected for guests, so the search runs in a separate session without a profile
+        # and the login of the profile is never touched
+        guest = create_driver(headless=self.headless)
+        try:
+            job_index = self.search(guest, roles, location, max_posts)
+        finally:
+            guest.quit()
+
+        return list(job_index.values())
+
+    def search(self, driver, roles: list, location: str, max_posts: int) -> dict:
+        '''
+        Collects the job posts of each role from the search results.
+
+        Args:
+        -------
+        - `driver`    (WebDriver): The browser session used for searching
+        - `roles`     (list):      A collection of job titles for searching
+        - `location`  (str):       The required location for the search
+        - `max_posts` (int):       How may posts to search for each role
+
+        Returns:
+        -------
+        - `dict`: The job posts found, indexed by their id in the order they were found
+        '''
+
+        # Job posts indexed by their id, keeping the order in which they were found
+        job_index = {}
 
         for i, role in enumerate(roles):
             # Replace special characters with utf characters
@@ -120,109 +249,123 @@ class LinkedInScraper:
             url = self.url_index + f"jobs/search?keywords={role}&location={location}"
 
             # Access url with set driver
-            self.driver.get(url)
+            load_page(driver, url, "//ul[@class='jobs-search__results-list']", TIMEOUT, label='listing')
 
             # Number of initially loaded jobs
             current_job_index = 0
 
             while True:
-                job_listings = len(self.driver.find_elements(By.XPATH, "//ul[@class='jobs-search__results-list']/li"))
+                # All job cards loaded so far are read with a single round trip
+                job_listings = extract_fields(driver, LISTING_FIELDS, JOB_CARD)
 
-                for _ in range(current_job_index, job_listings):
+                for job_post in job_listings[current_job_index:]:
                     current_job_index += 1
-                    try:
-                        job_path = f'//*[@id="main-content"]/section[@class="two-pane-serp-page__results-list"]/ul/li[{current_job_index}]/div'
-                        job_roles = filter_job(self.driver.find_element(By.XPATH, job_path + '/div[2]/h3').text)
-                        if not job_roles:
-                            continue
-                        job_url = self.driver.find_element(By.XPATH, job_path + '/a').get_attribute('href')
-                        job_id = self.driver.find_element(By.XPATH, job_path).get_attribute('data-entity-urn').split(":")[-1]
-
-                        exists = [item for item in job_list if item[1] == job_id]
-                        if not exists:
-                            job_list.append((job_url, job_id, job_roles))
-                    except NoSuchElementException:
-                        pass
+                    if None in (job_post['title'], job_post['url'], job_post['urn']):
+                        continue
+                    job_roles = filter_job(job_post['title'])
+                    if not job_roles:
+                        continue
+                    job_id = job_post['urn'].split(":")[-1]
+
+                    add_job(job_index, job_post['url'], job_id, job_roles)
 
                 # Limit job posts accessed as bigger number results in less accuracy of titles
                 if current_job_index >= max_posts:
                     break
 
                 # Check if page has been scrolled
-                if not self.infinite_scroll():
+                if not self.infinite_scroll(driver):
                     break
 
+            if self.archive is not None:
+                self.archive.save(self.name, driver.page_source, url=url, kind='listing')
+
             print_progress(i+1, len(roles),
-                msg_complete = pprint(msg=f'Number of total jobs identified: {len(job_list)}', type=1, prefix=self.name, as_str=True)
+                msg_complete = pprint(msg=f'Number of total jobs identified: {len(job_index)}', type=1, prefix=self.name, as_str=True)
             )
 
-        return job_list
+        return job_index
 
-    def extract_job_data(self, job_list: list):
+    def new_driver(self):
+        '''
+        Creates an additional browser session which shares the cookies of the logged in session.
         '''
-        Scraps and extracts the information about a specific job post.
+
+        driver = create_driver(headless=self.headless)
+
+        SCHEDULER.run(self.url_index, lambda: driver.get(self.url_index))
+        for cookie in self.cookies:
+            try:
+                driver.add_cookie(cookie)
+            except WebDriverException:
+                pass
+        return driver
+
+    def extract_job(self, driver, job_record: tuple) -> dict:
+        '''
+        Scraps and extracts the information about a single job post.
 
         Args:
         -------
-        - `job_list` (list): A collection of scraped job posts with their url, id and titles
+        - `driver`     (WebDriver): The browser session used to access the job post
+        - `job_record` (tuple):     The url, id and titles of the job post
+
+        Returns:
+        -------
+        - `dict`: The information gathered about the job post
+        '''
+
+        job_url, job_id, job_roles = job_record
+        load_page(driver, job_url, DETAIL_XPATHS['description'], TIMEOUT, label='detail')
+        if self.archive is not None:
+            self.archive.save(self.name, driver.page_source, job_id, job_url, job_roles)
+
+        # Every field is read with a single round trip to the browser
+        job = make_job(extract_fields(driver, DETAIL_XPATHS), job_record)
+        if job is None:
+            raise NoSuchElementException(f'A required field is missing from the job post {job_id}')
+        return job
+
+    def extract_job_data(self, job_list: list, checkpoint = None):
+        '''
+        Scraps and extracts the information about each job post using a pool of browser sessions.
+
+        Args:
+        -------
+        - `job_list`   (list):       A collection of scraped job posts with their url, id and titles
+        - `checkpoint` (Checkpoint): Optional journal receiving each extracted job post
 
         Returns:
         -------
         - `list`: A collection containing information about the gathered job posts. Each element is a `dict`
         '''
 
-        pprint(msg='Scraping data for each job post.', type=1, prefix=self.name)
+        pprint(msg=f'Scraping data for each job post using {self.workers} browser session(s).', type=1, prefix=self.name)
         print_progress(0, len(job_list))
 
         job_data = []
-        job_info_section = f'//div[@role="main"]/div[1]/div/div/div[1]'
 
-        for i, job_record in enumerate(job_list):
-            job_url, job_id, job_roles = job_record
-            job = {}
-            self.driver.get(job_url)
-            time.sleep(TIMEOUT)
+        # Read once here, as the pool may create sessions from its workers while `self.driver` is visiting a job post
+        self.cookies = self.driver.get_cookies()
 
-            try:
-                job['_id']      = int(job_id)
-                job['url']      = job_url
-                job['title']    = self.driver.find_element(By.XPATH, job_info_section + '/h1').text
-                job['roles']    = job_roles
-                job['company']  = self.driver.find_element(By.XPATH, job_info_section + '/div[1]/span[1]/span[1]').text
-                job['location'] = self.driver.find_element(By.XPATH, job_info_section + '/div[1]/span[1]/span[2]').text
-                
-                job_type = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/ul/li[1]/span').text.split(" · ")
-                job["type"] = job_type[0]
-                if len(job_type) > 1:
-                    job["level"] = job_type[1]
-
-                job_insights = self.driver.find_element(By.XPATH, job_info_section + '/div[2]/ul/li[2]/span').text.split(" · ")
-                if len(job_insights) > 1:
-                    job["industry"] = job_insights[1]
-
-                try:
-                    job['workplace'] = self.driver.find_element(By.XPATH, job_info_section + '/div[1]/span[1]/span[3]').text
-                except NoSuchElementException:
-                    pass
-                
-                # Get the description of the job
-                job['description'] = self.driver.find_element(By.XPATH, f'//div[@id="job-details"]/span').get_attribute('innerText')
-
-                job['last_accessed'] = datetime.utcnow()
-
-                job_data.append(job)
-
-            except NoSuchElementException:
-                pprint(msg=f'Exception retrieving data from job url:\n{job_url}', type=3, prefix=self.name)
-                break
-
-            print_progress(i+1, len(job_list),
-                msg_complete = pprint(msg='All job data were processed successfully.', type=4, prefix=self.name, as_str=True)
-            )
+        with DriverPool(self.new_driver, min(self.workers, len(job_list)), driver=self.driver) as pool:
+            for i, (job_record, job, error) in enumerate(pool.imap_unordered(self.extract_job, job_list)):
+                if error is None:
+                    job_data.append(job)
+                    METRICS.count('details_parsed', portal=self.name, source='browser')
+                    if checkpoint is not None:
+                        checkpoint.add(job)
+                else:
+                    METRICS.count('details_failed', portal=self.name, source='browser')
+                    pprint(msg=f'Exception retrieving data from job url:\n{job_record[0]}', type=3, prefix=self.name)
+
+                print_progress(i+1, len(job_list),
+                    msg_complete = pprint(msg=f'Job data were processed for {len(job_data)} job posts.', type=4, prefix=self.name, as_str=True)
+                )
 
         return job_data
 
-    def get_jobs(self, roles: list, location: str, max_posts: int = 250) -> (list | bool):
+    def get_jobs(self, roles: list, location: str, max_posts: int = 250, known_ids: set = None, checkpoint = None) -> (list | bool):
         '''
         Performs the necessary steps to scrap data from LinkedIn given a job title and location.
 
@@ -231,6 +374,8 @@ class LinkedInScraper:
         - `roles`         (list): A collection of job titles for searching
         - `location`      (str):  The required location for the search
         - `max_posts`     (int):  Optional value, how may posts to search for each role. Default is set to 250
+        - `known_ids`     (set):  Optional value, ids of job posts which are already stored and should not be visited again
+        - `checkpoint`    (Checkpoint): Optional value, journal of the progress. A journaled job list is resumed instead of searched again
 
         Returns:
         -------
@@ -238,13 +383,35 @@ class LinkedInScraper:
         - `bool`: Returns False if either no job posts were found or the login failed
         '''
 
-        job_list = self.get_job_list(roles, location, max_posts)
+        if checkpoint is not None and checkpoint.job_list is not None:
+            job_list = checkpoint.job_list
+        else:
+            with METRICS.timer('phase', portal=self.name, phase='search'):
+                job_list = self.get_job_list(roles, location, max_posts)
+
+            if not job_list:
+                pprint(msg='No jobs found during search.', type=3, prefix=self.name)
+                return False
 
-        if not job_list:
-            pprint(msg='No jobs found during search.', type=3, prefix=self.name)
-            return False
+            # Skip the job posts which are already stored in the database
+            if known_ids:
+                job_list = drop_known(job_list, known_ids)
+                if not job_list:
+                    pprint(msg='All job posts found are already stored.', type=1, prefix=self.name)
+                    return False
+
+            if checkpoint is not None:
+                checkpoint.start(job_list)
+
+        # Continue from the first job post which was not extracted before
+        if checkpoint is not None:
+            job_list = checkpoint.remaining(job_list)
+            if not job_list:
+                return checkpoint.finish()
 
         if self.login():
-            return self.extract_job_data(job_list) 
+            with METRICS.timer('phase', portal=self.name, phase='details'):
+                job_data = self.extract_job_data(job_list, checkpoint)
+            return checkpoint.finish() if checkpoint is not None else job_data
         else:
             return False
@@ -0,0 +1,166 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from threading import Lock, get_ident
+from lxml import html
+import hashlib
+import json
+import gzip
+import os
+from .common import pprint
+from .LinkedInScraper import parse_job_page as parse_linkedin
+from .KarieraScraper import parse_job_page as parse_kariera
+from .IndeedScraper import parse_job_page as parse_indeed
+
+# Directory of the archive, relative to the modeling directory
+ARCHIVE_DIR = '../archive'
+
+# Number of processes parsing archived pages at the same time
+N_PROCESS = os.cpu_count() or 1
+
+# Function extracting a job post from the page of each portal
+PARSERS = {
+    'LinkedInScraper': parse_linkedin,
+    'KarieraScraper':  parse_kariera,
+    'IndeedScraper':   parse_indeed
+}
+
+def _extract_entry(args: tuple) -> (dict | None):
+    directory, entry = args
+    archive = PageArchive(directory)
+    tree = html.fromstring(archive.read(entry['digest']))
+    job = PARSERS[entry['portal']](tree, (entry['url'], entry['_id'], entry['roles']))
+
+    # The job post is dated by the time its page was fetched, not the time it was parsed again
+    if job is not None:
+        job['last_accessed'] = datetime.fromisoformat(entry['fetched'])
+    return job
+
+class PageArchive:
+    '''
+    Keeps the raw HTML of the fetched listing and job post pages, so that the fields can be extracted again without a
+    browser or network, e.g. after a portal changed its layout.
+
+    Pages are gzip compressed and stored under their SHA-256, so identical pages are stored once. Every fetch is
+    recorded in `index.jsonl` with the portal, the `_id` of the job post, the url and the fetch time.
+
+    Args:
+    -------
+    - `directory` (str, optional): The directory of the archive
+
+    Methods:
+    -------
+    - `save()`:      Archives a fetched page
+    - `read()`:      Returns an archived page
+    - `entries()`:   Lists the archived pages
+    - `reextract()`: Extracts the job posts from the archived pages in parallel
+    '''
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        self.name = self.__class__.__name__
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.jsonl')
+        self.lock = Lock()
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, 'objects', digest[:2], digest[2:] + '.html.gz')
+
+    def save(self, portal: str, page: str, job_id = None, url: str = None, roles: list = None, kind: str = 'detail') -> str:
+        '''
+        Archives a fetched page.
+
+        Args:
+        -------
+        - `portal` (str):            The name of the scraper which fetched the page
+        - `page`   (str):            The HTML of the page
+        - `job_id` (str, optional):  The id of the job post, if the page belongs to one
+        - `url`    (str, optional):  The url of the page
+        - `roles`  (list, optional): The roles matched by the title of the job post
+        - `kind`   (str, optional):  `detail` for the page of a job post, `listing` for a page of results
+
+        Returns:
+        -------
+        - `str`: The SHA-256 of the page
+        '''
+
+        data = page.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name first, so a page is never seen half written
+            temporary = f'{path}.{os.getpid()}.{get_ident()}.tmp'
+            with gzip.open(temporary, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, path)
+
+        entry = {'portal': portal, 'kind': kind, '_id': job_id, 'url': url, 'roles': roles,
+                 'fetched': datetime.utcnow().isoformat(), 'digest': digest}
+        with self.lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+        return digest
+
+    def read(self, digest: str) -> str:
+        with gzip.open(self.object_path(digest), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def entries(self, portal: str = None, kind: str = 'detail', latest: bool = True) -> list:
+        '''
+        Lists the archived pages.
+
+        Args:
+        -------
+        - `portal` (str, optional):  Only the pages of this scraper
+        - `kind`   (str, optional):  Only the pages of this kind, None for all kinds
+        - `latest` (bool, optional): Only the most recent page of each job post
+
+        Returns:
+        -------
+        - `list`: The index entries, oldest first
+        '''
+
+        if not os.path.exists(self.index_path):
+            return []
+
+        entries = []
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if (portal is None or entry['portal'] == portal) and (kind is None or entry['kind'] == kind):
+                    entries.append(entry)
+
+        if latest:
+            entries = list({(entry['portal'], entry['kind'], str(entry['_id'] or entry['url'])): entry for entry in entries}.values())
+            entries.sort(key=lambda entry: entry['fetched'])
+        return entries
+
+    def reextract(self, portal: str = None, n_process: int = N_PROCESS) -> list:
+        '''
+        Extracts the job posts from the most recent archived page of each one, parsing the pages in parallel processes.
+
+        Args:
+        -------
+        - `portal`    (str, optional): Only the job posts of this scraper
+        - `n_process` (int, optional): Number of processes parsing pages
+
+        Returns:
+        -------
+        - `list`: The extracted job posts, ready for `MongoDB.insert_documents()`
+        '''
+
+        entries = self.entries(portal)
+        tasks = [(self.directory, entry) for entry in entries]
+
+        if n_process <= 1:
+            results = map(_extract_entry, tasks)
+            job_data = [job for job in results if job is not None]
+        else:
+            with ProcessPoolExecutor(n_process) as executor:
+                job_data = [job for job in executor.map(_extract_entry, tasks, chunksize=32) if job is not None]
+
+        pprint(msg=f'Extracted {len(job_data)} of {len(entries)} archived job posts.', type=1, prefix=self.name)
+        return job_data
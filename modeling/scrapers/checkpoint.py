@@ -0,0 +1,174 @@
+from datetime import datetime
+from threading import Lock
+import json
+import os
+from .common import pprint
+
+# Directory of the journals, relative to the modeling directory
+CHECKPOINT_DIR = '../checkpoints'
+
+# Number of extracted job posts handed to the sink at once
+SINK_BATCH_SIZE = 25
+
+def encode(value):
+    # Dates are the only values of a job post which JSON does not support
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    raise TypeError(f'Object of type {value.__class__.__name__} is not JSON serializable')
+
+def decode(document: dict):
+    if set(document) == {'$date'}:
+        return datetime.fromisoformat(document['$date'])
+    return document
+
+class Checkpoint:
+    '''
+    Journals the progress of a scraper in a JSON Lines file, so that a crawl which crashed resumes where it stopped.
+
+    The job posts found in the results are written first, followed by every extracted job post as soon as it is
+    extracted. When restarted, the scraper reuses the journaled job list and only visits the job posts which were
+    not extracted yet. The journal is removed once the scraper finishes.
+
+    Optionally, extracted job posts are also handed to a `sink` in micro-batches, e.g. `MongoDB.insert_documents`,
+    so that they are stored during the crawl instead of after it.
+
+    Args:
+    -------
+    - `name`       (str):                The name of the scraper, used for the journal file
+    - `directory`  (str, optional):      The directory of the journal
+    - `sink`       (callable, optional): Function receiving lists of extracted job posts
+    - `batch_size` (int, optional):      How many job posts are handed to the sink at once
+
+    Methods:
+    -------
+    - `start()`:     Journals the job posts found in the results
+    - `remaining()`: Removes the job posts already extracted from a job list
+    - `add()`:       Journals an extracted job post
+    - `flush()`:     Hands the job posts not handed yet to the sink
+    - `finish()`:    Flushes the sink, removes the journal and returns all extracted job posts
+    '''
+
+    def __init__(self, name: str, directory: str = CHECKPOINT_DIR, sink = None, batch_size: int = SINK_BATCH_SIZE):
+        self.name = name
+        self.path = os.path.join(directory, f'{name}.jsonl')
+        self.sink = sink
+        self.batch_size = batch_size
+        self.lock = Lock()
+
+        self.job_list = None
+        self.jobs = {}
+        self.pending = []
+        self.file = None
+        self.load()
+
+    def load(self) -> None:
+        '''
+        Reads the journal of a previous run, if there is one.
+        '''
+
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line, object_hook=decode)
+                except json.JSONDecodeError:
+                    # The last line is incomplete if the process died while writing it
+                    continue
+                if 'job_list' in entry:
+                    self.job_list = [tuple(job_record) for job_record in entry['job_list']]
+                    self.jobs = {}
+                elif 'job' in entry:
+                    self.jobs[str(entry['job']['_id'])] = entry['job']
+
+        if self.job_list is not None:
+            pprint(msg=f'Resuming from checkpoint with {len(self.jobs)} of {len(self.job_list)} job posts already extracted.',
+                   type=1, prefix=self.name)
+
+        # Job posts of the previous run might not have reached the sink before it stopped
+        if self.sink is not None and self.jobs:
+            self.sink(list(self.jobs.values()))
+
+    def write(self, entry: dict) -> None:
+        # The journal is only created once there is progress to keep
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self.file = open(self.path, 'a+', encoding='utf-8')
+
+            # Start on a new line when the previous run died in the middle of one
+            if self.file.tell() > 0:
+                self.file.seek(self.file.tell() - 1)
+                if self.file.read(1) != '\n':
+                    self.file.write('\n')
+        self.file.write(json.dumps(entry, default=encode) + '\n')
+        self.file.flush()
+
+    def start(self, job_list: list) -> None:
+        '''
+        Journals the job posts found in the results, replacing any previous progress.
+        '''
+
+        with self.lock:
+            self.job_list = list(job_list)
+            self.jobs = {}
+            self.write({'job_list': self.job_list})
+
+    def remaining(self, job_list: list) -> list:
+        '''
+        Returns the job posts which were not extracted yet, in their original order.
+        '''
+
+        return [job_record for job_record in job_list if str(job_record[1]) not in self.jobs]
+
+    def add(self, job: dict) -> None:
+        '''
+        Journals an extracted job post and hands it to the sink once a batch is complete.
+        '''
+
+        batch = None
+        with self.lock:
+            self.jobs[str(job['_id'])] = job
+            self.write({'job': job})
+
+            if self.sink is not None:
+                self.pending.append(job)
+                if len(self.pending) >= self.batch_size:
+                    batch, self.pending = self.pending, []
+
+        # The batch is taken out under the lock, so the other workers do not wait for the database
+        if batch:
+            self.sink(batch)
+
+    def flush(self) -> None:
+        '''
+        Hands the job posts which are journaled but not handed to the sink yet, e.g. when the scraper stopped early.
+        '''
+
+        if self.sink is None:
+            return
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if batch:
+            self.sink(batch)
+
+    def finish(self) -> list:
+        '''
+        Hands the last job posts to the sink and removes the journal, as the scraper completed its run.
+
+        Returns:
+        -------
+        - `list`: All job posts extracted, including the ones of a resumed run
+        '''
+
+        self.flush()
+        with self.lock:
+            self.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        return list(self.jobs.values())
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
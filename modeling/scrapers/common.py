@@ -1,4 +1,14 @@
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from functools import lru_cache
+import time
 import re
+import os
+from .metrics import METRICS
+from .scheduler import SCHEDULER, is_blocked
 
 # Types of messages colored
 TYPES = {
@@ -22,6 +32,134 @@ REGEX_ROLES = {
     'Data Engineer':  [r'.*[Dd]ata.?[Ee]ngineer.*']
 }
 
+# Number of distinct job titles whose matched roles are remembered
+ROLE_CACHE_SIZE = 65536
+
+def compile_roles(regex_roles: dict) -> tuple:
+    '''
+    Combines the regular expressions of all roles into a single compiled expression.
+
+    Each expression becomes an optional lookahead with a named group, so one match at the start of a title
+    reports every expression that would be found by `re.search`, including overlapping ones.
+
+    Args:
+    -------
+    - `regex_roles` (dict): Lists of regular expressions keyed by the role they identify
+
+    Returns:
+    -------
+    - `tuple`: The compiled expression and a list of `(group name, role)` pairs in the order of `regex_roles`
+    '''
+
+    parts, groups = [], []
+    for i, (role, expressions) in enumerate(regex_roles.items()):
+        for j, reg_ex in enumerate(expressions):
+            # Leading and trailing '.*' do not change whether a search matches, they only cause backtracking
+            reg_ex = reg_ex.removeprefix('.*')
+            if reg_ex.endswith('.*') and not reg_ex.endswith('\\.*'):
+                reg_ex = reg_ex[:-2]
+
+            name = f'role_{i}_{j}'
+            parts.append(f'(?=(?s:.*?)(?P<{name}>{reg_ex}))?')
+            groups.append((name, role))
+    return re.compile(''.join(parts)), groups
+
+ROLE_CLASSIFIER, ROLE_GROUPS = compile_roles(REGEX_ROLES)
+
+# Seconds between two checks of a readiness condition
+POLL_FREQUENCY = 0.1
+
+# Directory of the browser profiles kept between runs, relative to the modeling directory
+PROFILE_DIR = '../profiles'
+
+# Size of the browser window, as headless browsers cannot be maximized
+WINDOW_SIZE = '1920,1080'
+
+# Requests not needed to extract job posts, blocked at the network layer: images, fonts, media and trackers
+BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.m4a', '*.ogg',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*facebook.net*', '*hotjar.com*'
+]
+
+# Returns the title and the beginning of the text of a page, checked for a captcha when the page did not become ready
+PAGE_TEXT_SCRIPT = "return document.title + '\\n' + (document.body ? document.body.innerText.slice(0, 5000) : '');"
+
+# Evaluates the XPaths of declarative fields inside the page, see `extract_fields()`
+EXTRACT_SCRIPT = '''
+const [root, fields] = arguments;
+const first = (xpath, context) =>
+    document.evaluate(xpath, context, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const read = (context) => {
+    const values = {};
+    for (const [name, [xpath, attribute]] of Object.entries(fields)) {
+        const node = first(xpath, context);
+        if (node === null) {
+            values[name] = null;
+        } else if (attribute === 'text') {
+            values[name] = (node.innerText ?? node.textContent ?? '').trim();
+        } else {
+            const value = node[attribute];
+            values[name] = typeof value === 'string' ? value : node.getAttribute(attribute);
+        }
+    }
+    return values;
+};
+if (root === null) {
+    return read(document);
+}
+const nodes = document.evaluate(root, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+const rows = [];
+for (let i = 0; i < nodes.snapshotLength; i++) {
+    rows.push(read(nodes.snapshotItem(i)));
+}
+return rows;
+'''
+
+def create_driver(headless: bool = True, profile_dir: str = None, block_assets: bool = True):
+    '''
+    Starts a lean Edge (Chromium) browser session shared by all scrapers.
+
+    The session returns from a navigation as soon as the document is parsed (`eager` page load strategy), as the
+    scrapers wait for the elements they need anyway. Images, fonts, media and trackers are never downloaded.
+
+    Args:
+    -------
+    - `headless`     (bool, optional): Run the browser without a window
+    - `profile_dir`  (str, optional):  Directory of a persistent profile, so that cookies and cache survive restarts.
+                                       A profile can only be used by one browser at a time
+    - `block_assets` (bool, optional): Block the requests of `BLOCKED_URLS`
+
+    Returns:
+    -------
+    - `WebDriver`: The browser session, instrumented when the metrics are enabled
+    '''
+
+    options = webdriver.EdgeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument('--ignore-certificate-errors')
+    options.add_argument(f"--window-size={WINDOW_SIZE}")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-notifications")
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    options.page_load_strategy = 'eager'
+
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+        options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
+
+    if block_assets:
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    driver = webdriver.Edge(options=options)
+    if block_assets:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URLS})
+    return METRICS.instrument(driver)
+
 def pprint(msg: str, type: int, prefix: str = '', as_str = False) -> (str | None):
     '''
     Pretty prints a message with decorators and colors.
@@ -71,6 +209,15 @@ def print_progress(iteration: int, total: int, length = 50, msg_complete = '') -
         print(msg_complete)
 
 
+@lru_cache(maxsize=ROLE_CACHE_SIZE)
+def match_roles(job_role: str) -> tuple:
+    '''
+    Matches a job title against all roles in a single pass, remembering the result for repeated titles.
+    '''
+
+    match = ROLE_CLASSIFIER.match(job_role)
+    return tuple(role for name, role in ROLE_GROUPS if match.group(name) is not None)
+
 def filter_job(job_role: str) -> list:
     '''
     Tries to match a given job title against a list of regular expressions.
@@ -84,9 +231,170 @@ def filter_job(job_role: str) -> list:
     - `list`: List containing all matched job titles. May be empty if no matches were made.
     '''
 
-    roles = []
-    for role in REGEX_ROLES:
-        for reg_ex in REGEX_ROLES[role]:
-            if re.search(reg_ex, job_role) != None:
-                roles.append(role)
-    return roles
\ No newline at end of file
+    roles = list(match_roles(job_role.strip()))
+    METRICS.count('listings_seen')
+    if not roles:
+        METRICS.count('listings_filtered')
+    return roles
+
+def add_job(job_index: dict, job_url: str, job_id: str, job_roles: list) -> None:
+    '''
+    Adds a job post to an index of job posts, merging its roles if it was already found under another search.
+
+    Args:
+    -------
+    - `job_index` (dict): Job posts found so far, as `(url, id, roles)` tuples keyed by their id
+    - `job_url`   (str):  The url of the job post
+    - `job_id`    (str):  The id of the job post
+    - `job_roles` (list): The roles matched by the title of the job post
+    '''
+
+    if job_id not in job_index:
+        job_index[job_id] = (job_url, job_id, job_roles)
+        return
+
+    url, _, roles = job_index[job_id]
+    merged = roles + [role for role in job_roles if role not in roles]
+    if len(merged) != len(roles):
+        job_index[job_id] = (url, job_id, merged)
+
+def drop_known(job_list: list, known_ids: set) -> list:
+    '''
+    Removes the job posts whose id is contained in a set of already known ids.
+
+    Args:
+    -------
+    - `job_list`  (list): A collection of scraped job posts with their url, id and titles
+    - `known_ids` (set):  The ids of the known job posts, as strings
+
+    Returns:
+    -------
+    - `list`: The job posts which are not known yet
+    '''
+
+    new_jobs = [job_record for job_record in job_list if str(job_record[1]) not in known_ids]
+    pprint(msg=f'Skipping {len(job_list) - len(new_jobs)} already stored job posts, {len(new_jobs)} left to visit.', type=1, prefix='Crawler')
+    return new_jobs
+
+def wait_until(driver, condition, timeout: float, label: str = 'wait'):
+    '''
+    Waits until a condition is met or the timeout expires, recording how long the wait took.
+
+    Args:
+    -------
+    - `driver`    (WebDriver):     The browser session to be checked
+    - `condition` (callable):      Function receiving the driver, returning a truthy value when ready
+    - `timeout`   (float):         Maximum number of seconds to wait
+    - `label`     (str, optional): Name under which the duration of the wait is recorded
+
+    Returns:
+    -------
+    - The value returned by the condition, or False if the timeout expired
+    '''
+
+    start = time.perf_counter()
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(condition)
+    except TimeoutException:
+        return False
+    finally:
+        METRICS.observe('wait', time.perf_counter() - start, label=label)
+
+def wait_for_element(driver, xpath: str, timeout: float, label: str = 'element') -> bool:
+    '''
+    Waits until an element is present in the page.
+
+    Args:
+    -------
+    - `driver`  (WebDriver):     The browser session to be checked
+    - `xpath`   (str):           The XPath of the element
+    - `timeout` (float):         Maximum number of seconds to wait
+    - `label`   (str, optional): Name under which the duration of the wait is recorded
+
+    Returns:
+    -------
+    - `bool`: True if the element appeared before the timeout
+    '''
+
+    return bool(wait_until(driver, EC.presence_of_element_located((By.XPATH, xpath)), timeout, label))
+
+def wait_for_scroll(driver, last_height: int, timeout: float, label: str = 'scroll') -> bool:
+    '''
+    Waits until the scroll height of the page changes, meaning that new content was loaded.
+
+    Args:
+    -------
+    - `driver`      (WebDriver):     The browser session to be checked
+    - `last_height` (int):           The scroll height before new content was requested
+    - `timeout`     (float):         Maximum number of seconds to wait
+    - `label`       (str, optional): Name under which the duration of the wait is recorded
+
+    Returns:
+    -------
+    - `bool`: True if the page grew before the timeout
+    '''
+
+    return bool(wait_until(driver, lambda d: d.execute_script("return document.body.scrollHeight") != last_height, timeout, label))
+
+def load_page(driver, url: str, ready_xpath: str, timeout: float, label: str = 'page') -> bool:
+    '''
+    Navigates to a url once its host allows it, see `SCHEDULER`, and waits until the element signaling that the page is ready appears.
+
+    Args:
+    -------
+    - `driver`      (WebDriver):     The browser session used for navigation
+    - `url`         (str):           The url to be accessed
+    - `ready_xpath` (str):           The XPath of an element that is present once the page is ready
+    - `timeout`     (float):         Maximum number of seconds to wait
+    - `label`       (str, optional): Name under which the duration of the wait is recorded
+
+    Returns:
+    -------
+    - `bool`: True if the page became ready before the timeout
+    '''
+
+    def navigate():
+        with METRICS.timer('page_load', label=label):
+            with METRICS.timer('navigation', label=label):
+                driver.get(url)
+            return wait_for_element(driver, ready_xpath, timeout, label)
+
+    # The navigation is paced by the scheduler, which backs off when the browser fails to navigate or a captcha is shown.
+    # A page that never becomes ready otherwise, e.g. a removed job post, is a miss of the url rather than of the host
+    blocked = lambda ready: not ready and is_blocked(driver.execute_script(PAGE_TEXT_SCRIPT))
+    return bool(SCHEDULER.run(url, navigate, blocked=blocked, missing=lambda ready: not ready))
+
+def extract_fields(driver, fields: dict, root: str = None) -> (dict | list):
+    '''
+    Collects the fields of a page with a single round trip to the browser, instead of one `find_element` per field.
+
+    Args:
+    -------
+    - `driver` (WebDriver):     The browser session showing the page
+    - `fields` (dict):          The XPath of each field, or a tuple of the XPath and the attribute to read instead of the text
+    - `root`   (str, optional): XPath of repeated elements, such as the job cards of a page of results. The XPaths of the
+                                fields are then relative to each element
+
+    Returns:
+    -------
+    - `dict`: The value of each field, None for the fields missing from the page
+    - `list`: A `dict` for each element matching `root`, in the order of the page
+    '''
+
+    specs = {name: [spec, 'text'] if isinstance(spec, str) else list(spec) for name, spec in fields.items()}
+    with METRICS.timer('extract_fields'):
+        return driver.execute_script(EXTRACT_SCRIPT, root, specs)
+
+def wait_summary() -> dict:
+    '''
+    Summarizes the readiness waits recorded by `METRICS`, empty when the metrics are disabled.
+
+    Returns:
+    -------
+    - `dict`: For each label the number of waits, the total and the maximum duration in seconds
+    '''
+
+    with METRICS.lock:
+        waits = {dict(labels).get('label'): list(times) for (name, labels), times in METRICS.timers.items() if name == 'wait' and times}
+    return {label: {'count': len(times), 'total': round(sum(times), 3), 'max': round(max(times), 3)}
+            for label, times in waits.items()}
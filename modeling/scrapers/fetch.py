@@ -0,0 +1,177 @@
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from lxml import html
+import copy
+import re
+import requests
+from .metrics import METRICS
+from .scheduler import SCHEDULER, is_blocked
+
+# Number of pages fetched at the same time
+HTTP_WORKERS = 8
+
+# Maximum number of seconds to wait for a response
+HTTP_TIMEOUT = 10
+
+# Status codes meaning that the portal throttles or blocks the requests
+THROTTLE_STATUS = {403, 429, 503}
+
+# Title of a page, checked for a captcha as the descriptions of job posts may mention the same words
+TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+# Headers sent along with every request, resembling a regular browser
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/110.0.0.0 Safari/537.36 Edg/110.0.1587.50',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+
+# Elements rendered by browsers on separate lines
+BLOCK_TAGS = {'p', 'div', 'li', 'ul', 'ol', 'section', 'article', 'tr', 'table',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'footer'}
+
+def node_text(tree, xpath: str) -> (str | None):
+    '''
+    Extracts the text of the first element matching an XPath, similar to the text rendered by a browser.
+
+    Args:
+    -------
+    - `tree`  (HtmlElement): The parsed HTML document
+    - `xpath` (str):         The XPath of the element
+
+    Returns:
+    -------
+    - `str`:  The text of the element with one line per block element
+    - `None`: If no element matched the XPath
+    '''
+
+    nodes = tree.xpath(xpath)
+    if not nodes:
+        return None
+
+    # Work on a copy so that the parsed document stays untouched
+    node = copy.deepcopy(nodes[0])
+    for element in node.iter():
+        if element.tag == 'br' or element.tag in BLOCK_TAGS:
+            element.tail = '\n' + (element.tail or '')
+
+    lines = (' '.join(line.split()) for line in node.text_content().splitlines())
+    return '\n'.join(line for line in lines if line)
+
+class HttpFetcher:
+    '''
+    Fetches and parses pages over plain HTTP using a pooled session, without starting a browser.
+
+    Args:
+    -------
+    - `workers` (int, optional):         Number of pages fetched at the same time
+    - `archive` (PageArchive, optional): Archive keeping the HTML of the extracted job posts
+    - `portal`  (str, optional):         The name of the scraper, under which the pages are archived
+
+    Methods:
+    -------
+    - `download()`: Downloads a single page
+    - `fetch()`:    Downloads and parses a single page
+    - `extract()`:  Downloads and parses a collection of job posts in parallel
+    - `close()`:    Closes the pooled connections
+    '''
+
+    def __init__(self, workers: int = HTTP_WORKERS, archive = None, portal: str = None):
+        self.workers = workers
+        self.archive = archive
+        self.portal = portal
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def download(self, url: str) -> (str | None):
+        '''
+        Downloads a page.
+
+        Args:
+        -------
+        - `url` (str): The url of the page
+
+        Returns:
+        -------
+        - `str`:  The HTML of the page
+        - `None`: If the request failed
+        '''
+
+        def get():
+            with METRICS.timer('http_fetch', portal=self.portal):
+                return self.session.get(url, timeout=HTTP_TIMEOUT)
+
+        # Requests share the rate of their host with the browser sessions of the same portal
+        blocked = lambda response: response.status_code in THROTTLE_STATUS or is_blocked(' '.join(TITLE.findall(response.text[:5000])))
+        try:
+            response = SCHEDULER.run(url, get, failed=lambda response: response.status_code >= 500, blocked=blocked)
+            response.raise_for_status()
+        except requests.RequestException:
+            METRICS.count('http_errors', portal=self.portal)
+            return None
+        return response.text
+
+    def fetch(self, url: str):
+        '''
+        Downloads and parses a page.
+
+        Args:
+        -------
+        - `url` (str): The url of the page
+
+        Returns:
+        -------
+        - `HtmlElement`: The parsed HTML document
+        - `None`:        If the request failed
+        '''
+
+        page = self.download(url)
+        return html.fromstring(page, base_url=url) if page is not None else None
+
+    def extract(self, job_list: list, parser, callback = None) -> tuple:
+        '''
+        Downloads the page of each job post and extracts its data with the given parser.
+
+        Args:
+        -------
+        - `job_list` (list):     A collection of scraped job posts with their url, id and titles
+        - `parser`   (callable): Function receiving the parsed page and the job record, returning a `dict` or None
+        - `callback` (callable): Optional function receiving each extracted job post as soon as it is available
+
+        Returns:
+        -------
+        - `tuple`: The extracted job posts and the job records which could not be extracted
+        '''
+
+        def extract_job(job_record):
+            page = self.download(job_record[0])
+            if page is None:
+                return None
+
+            # An empty page or one the parser does not expect goes to the browser, instead of ending the whole batch
+            try:
+                job = parser(html.fromstring(page, base_url=job_record[0]), job_record)
+            except Exception:
+                job = None
+            METRICS.count('details_parsed' if job is not None else 'details_failed', portal=self.portal, source='http')
+            if job is not None and self.archive is not None:
+                self.archive.save(self.portal, page, job_record[1], job_record[0], job_record[2])
+            return job
+
+        job_data, remaining = [], []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for job_record, job in zip(job_list, executor.map(extract_job, job_list)):
+                if job is None:
+                    remaining.append(job_record)
+                else:
+                    job_data.append(job)
+                    if callback is not None:
+                        callback(job)
+        return job_data, remaining
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,199 @@
+from selenium.webdriver.support.events import EventFiringWebDriver, AbstractEventListener
+from collections import defaultdict
+from contextlib import nullcontext
+from threading import Lock
+import json
+import time
+import os
+
+# Metrics are only recorded when enabled, otherwise every call returns immediately
+METRICS_ENABLED = False
+
+# Prefix of the metric names in the Prometheus output
+PROMETHEUS_PREFIX = 'jobs_'
+
+# Quantiles reported for every timer
+QUANTILES = (0.5, 0.95)
+
+# Context returned by the timers of disabled metrics, shared as it holds no state
+NULL_TIMER = nullcontext()
+
+def quantile(values: list, q: float) -> float:
+    # Nearest rank on the sorted values, good enough for a run summary
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def format_labels(labels: tuple, extra: dict = None) -> str:
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{str(value)}"' for name, value in pairs) + '}'
+
+class Timer:
+    '''
+    Context manager recording the duration of a block into a timer.
+    '''
+
+    def __init__(self, metrics, name: str, labels: dict):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+class FindListener(AbstractEventListener):
+    '''
+    Times every `find_element` and `find_elements` call of an instrumented browser session.
+    '''
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.start = None
+
+    def before_find(self, by, value, driver) -> None:
+        self.start = time.perf_counter()
+
+    def after_find(self, by, value, driver) -> None:
+        if self.start is not None:
+            self.metrics.observe('find_element', time.perf_counter() - self.start)
+            self.start = None
+
+class Metrics:
+    '''
+    Records timers, counters and gauges of a run, e.g. page loads, waits, database writes or parsed documents, and
+    writes them as JSON and in the Prometheus text format at the end of the run.
+
+    Every metric has a name and optional labels given as keyword arguments, e.g. `count('details_parsed', portal='Indeed')`.
+    When disabled every method returns immediately and `timer()` returns a shared no-op context.
+
+    Args:
+    -------
+    - `enabled` (bool, optional): Record the metrics
+
+    Methods:
+    -------
+    - `timer()`:      Context manager timing a block of code
+    - `observe()`:    Records a duration
+    - `count()`:      Increases a counter
+    - `gauge()`:      Sets a value
+    - `instrument()`: Wraps a browser session so that its element lookups are timed
+    - `summary()`:    Summarizes the recorded metrics
+    - `write()`:      Writes the summary as JSON and in the Prometheus text format
+    '''
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.timers = defaultdict(list)
+            self.counters = defaultdict(float)
+            self.gauges = {}
+            self.started = time.time()
+
+    def timer(self, name: str, **labels):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, name, labels)
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.timers[(name, tuple(sorted(labels.items())))].append(seconds)
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def gauge(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def instrument(self, driver):
+        '''
+        Wraps a browser session, so that its `find_element` calls are timed. Returns the session unchanged when disabled.
+        '''
+
+        if not self.enabled:
+            return driver
+        return EventFiringWebDriver(driver, FindListener(self))
+
+    def summary(self) -> dict:
+        '''
+        Summarizes the recorded metrics.
+
+        Returns:
+        -------
+        - `dict`: The elapsed time of the run and, keyed by name and labels, the count, total, mean, quantiles and
+                  maximum of every timer, the value of every counter and the value of every gauge
+        '''
+
+        with self.lock:
+            timers = {name + format_labels(labels): {
+                          'count': len(values),
+                          'total': round(sum(values), 6),
+                          'mean':  round(sum(values) / len(values), 6),
+                          **{f'p{int(q * 100)}': round(quantile(values, q), 6) for q in QUANTILES},
+                          'max':   round(max(values), 6)
+                      } for (name, labels), values in self.timers.items() if values}
+            counters = {name + format_labels(labels): value for (name, labels), value in self.counters.items()}
+            gauges = {name + format_labels(labels): value for (name, labels), value in self.gauges.items()}
+
+        return {'elapsed': round(time.time() - self.started, 2), 'timers': timers, 'counters': counters, 'gauges': gauges}
+
+    def prometheus(self) -> str:
+        '''
+        Formats the recorded metrics in the Prometheus text exposition format.
+        '''
+
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.timers}):
+                metric = f'{PROMETHEUS_PREFIX}{name}_seconds'
+                lines.append(f'# TYPE {metric} summary')
+                for (timer_name, labels), values in self.timers.items():
+                    if timer_name != name or not values:
+                        continue
+                    for q in QUANTILES:
+                        lines.append(f'{metric}{format_labels(labels, {"quantile": q})} {quantile(values, q)}')
+                    lines.append(f'{metric}_sum{format_labels(labels)} {sum(values)}')
+                    lines.append(f'{metric}_count{format_labels(labels)} {len(values)}')
+
+            for name in sorted({name for name, _ in self.counters}):
+                metric = f'{PROMETHEUS_PREFIX}{name}_total'
+                lines.append(f'# TYPE {metric} counter')
+                lines += [f'{metric}{format_labels(labels)} {value}' for (counter_name, labels), value in self.counters.items() if counter_name == name]
+
+            for name in sorted({name for name, _ in self.gauges}):
+                metric = f'{PROMETHEUS_PREFIX}{name}'
+                lines.append(f'# TYPE {metric} gauge')
+                lines += [f'{metric}{format_labels(labels)} {value}' for (gauge_name, labels), value in self.gauges.items() if gauge_name == name]
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        '''
+        Writes the summary to `<path>.json` and the Prometheus text format to `<path>.prom`.
+        '''
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path + '.json', 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=4)
+        with open(path + '.prom', 'w', encoding='utf-8') as f:
+            f.write(self.prometheus())
+
+# Metrics shared by the scrapers, the database and the NLP stages of a run
+METRICS = Metrics()
@@ -0,0 +1,155 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from selenium.common.exceptions import NoSuchElementException, WebDriverException
+from queue import Queue, Empty
+from threading import Lock
+
+# Items submitted per session at once, so that a long list of items is not queued in the executor all at once
+IN_FLIGHT_PER_SESSION = 2
+
+# Seconds a task waits for a free session before checking that the pool still has any
+SESSION_WAIT = 1.0
+
+class DriverPool:
+    '''
+    A pool of browser sessions which are reused to process a collection of items in parallel.
+
+    Args:
+    -------
+    - `factory` (callable):            Function returning a new WebDriver session
+    - `size`    (int):                 Total number of sessions in the pool
+    - `driver`  (WebDriver, optional): An already running session that becomes part of the pool and is not closed by it
+    - `setup`   (callable, optional):  Function called with every session created by the pool before it is used
+
+    Methods:
+    -------
+    - `imap_unordered()`: Applies a function to each item, yielding the results as soon as they are available
+    - `close()`:          Quits all sessions created by the pool
+    '''
+
+    def __init__(self, factory, size: int = 1, driver = None, setup = None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.setup = setup
+        self.owned = []
+        self.sessions = Queue()
+        self.lock = Lock()
+
+        if driver is not None:
+            self.sessions.put(driver)
+
+        for _ in range(self.size - self.sessions.qsize()):
+            self.sessions.put(self._create())
+        self.alive = self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _create(self):
+        driver = self.factory()
+        with self.lock:
+            self.owned.append(driver)
+        if self.setup is not None:
+            self.setup(driver)
+        return driver
+
+    def _replace(self, driver):
+        '''
+        Swaps a session that stopped responding with a new one. Sessions not owned by the pool are kept.
+
+        Returns:
+        -------
+        - The session to return to the pool, None if a new one could not be created and the pool shrinks
+        '''
+
+        if driver not in self.owned:
+            return driver
+        try:
+            driver.title
+            return driver
+        except WebDriverException:
+            pass
+
+        with self.lock:
+            self.owned.remove(driver)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+        try:
+            return self._create()
+        except Exception:
+            # The dead session is dropped rather than handed to the next item
+            with self.lock:
+                self.alive -= 1
+            return None
+
+    def _acquire(self):
+        while True:
+            try:
+                return self.sessions.get(timeout=SESSION_WAIT)
+            except Empty:
+                if self.alive <= 0:
+                    raise WebDriverException('No browser session is left in the pool')
+
+    def _run(self, func, item):
+        driver = self._acquire()
+        try:
+            return func(driver, item)
+        except NoSuchElementException:
+            raise
+        except WebDriverException:
+            driver = self._replace(driver)
+            raise
+        finally:
+            if driver is not None:
+                self.sessions.put(driver)
+
+    @staticmethod
+    def _outcome(item, future) -> tuple:
+        try:
+            return item, future.result(), None
+        except Exception as e:
+            return item, None, e
+
+    def imap_unordered(self, func, items: list):
+        '''
+        Applies `func(driver, item)` to every item using the sessions of the pool.
+
+        Failures are isolated to the item that raised them, so a single broken page does not stop the rest.
+        At most `IN_FLIGHT_PER_SESSION` items per session are submitted at once.
+
+        Args:
+        -------
+        - `func`  (callable): Function receiving a session and an item
+        - `items` (iterable): The items to be processed
+
+        Returns:
+        -------
+        - `generator`: Tuples of `(item, result, exception)` in order of completion. Either `result` or `exception` is None
+        '''
+
+        limit = IN_FLIGHT_PER_SESSION * self.size
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            futures = {}
+            for item in items:
+                futures[executor.submit(self._run, func, item)] = item
+                if len(futures) >= limit:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield self._outcome(futures.pop(future), future)
+
+            for future in as_completed(futures):
+                yield self._outcome(futures[future], future)
+
+    def close(self):
+        with self.lock:
+            owned, self.owned = self.owned, []
+        for driver in owned:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
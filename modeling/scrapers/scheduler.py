@@ -0,0 +1,277 @@
+from selenium.common.exceptions import WebDriverException, TimeoutException
+from requests import RequestException
+from urllib.parse import urlsplit
+from collections import deque
+from threading import Lock
+import random
+import time
+import re
+from .metrics import METRICS
+
+# Requests per second allowed to a single host at the start, and the bounds the rate adapts within
+INITIAL_RATE = 1.0
+MIN_RATE = 0.05
+MAX_RATE = 10.0
+
+# Requests which may be sent at once after a host was idle
+BURST = 3
+
+# Additive increase after every fast response, multiplicative decrease after slow, failed and blocked ones
+RATE_INCREASE = 0.1
+SLOW_DECREASE = 0.9
+ERROR_DECREASE = 0.5
+BLOCK_DECREASE = 0.25
+
+# Responses slower than this (in seconds, smoothed) mean the host is under load
+TARGET_LATENCY = 3.0
+
+# Exponential backoff after consecutive failures: BACKOFF_BASE * 2^failures seconds with full jitter, at most BACKOFF_MAX
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 120.0
+
+# Attempts of a request after the first one fails
+MAX_RETRIES = 2
+
+# Seconds over which the effective rate is measured
+RATE_WINDOW = 60.0
+
+# Text of the pages returned when a portal suspects a bot
+BLOCK_MARKERS = re.compile(r'captcha|unusual traffic|are you a robot|verify you are human|security check|access denied|too many requests',
+                           re.IGNORECASE)
+
+# Messages of a browser which crashed or whose session was closed, which another attempt cannot recover from
+SESSION_LOST = re.compile(r'invalid session id|session deleted|no such window|target window already closed|not reachable|disconnected',
+                          re.IGNORECASE)
+
+def is_host_error(error: Exception) -> bool:
+    '''
+    Checks whether an exception of a request was caused by the network or the host, rather than by the session sending it.
+
+    Timeouts, failed HTTP requests and failed browser navigations are host errors. The subclasses of `WebDriverException`,
+    such as a missing element or an invalid session, and a crashed browser are not.
+    '''
+
+    if isinstance(error, (RequestException, TimeoutException)):
+        return True
+    return type(error) is WebDriverException and SESSION_LOST.search(error.msg or '') is None
+
+def is_blocked(text: str) -> bool:
+    '''
+    Checks the text of a page for the signs of a captcha or a block.
+    '''
+
+    return bool(text) and BLOCK_MARKERS.search(text) is not None
+
+class HostLimiter:
+    '''
+    Paces the requests to a single host with a token bucket, whose rate adapts to the responses of the host:
+    it increases additively while responses are fast and decreases multiplicatively when they are slow, fail or are
+    blocked. Failures also pause the host with an exponential backoff and jitter, for every session using it.
+
+    Args:
+    -------
+    - `host`     (str):             The host name
+    - `rate`     (float, optional): Initial requests per second
+    - `burst`    (int, optional):   Size of the bucket
+    - `max_rate` (float, optional): Upper bound of the rate
+
+    Methods:
+    -------
+    - `acquire()`: Waits until a request may be sent
+    - `success()`: Records a successful response and its latency
+    - `failure()`: Records a failed or blocked response and backs off
+    - `miss()`:    Records a response which says nothing about the load of the host
+    - `summary()`: Returns the current and the effective rate
+    '''
+
+    def __init__(self, host: str, rate: float = INITIAL_RATE, burst: int = BURST, max_rate: float = MAX_RATE):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.max_rate = max_rate
+        self.lock = Lock()
+
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.failures = 0
+        self.latency = None
+        self.completed = deque()
+
+    def acquire(self) -> float:
+        '''
+        Waits until a token is available and the host is not paused.
+
+        Returns:
+        -------
+        - `float`: The seconds spent waiting
+        '''
+
+        start = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        waited = now - start
+                        METRICS.observe('scheduler_wait', waited, host=self.host)
+                        return waited
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def success(self, latency: float) -> None:
+        with self.lock:
+            self.failures = 0
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if self.latency > TARGET_LATENCY:
+                self.rate = max(MIN_RATE, self.rate * SLOW_DECREASE)
+            else:
+                self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+            self.record()
+
+    def failure(self, blocked: bool = False) -> float:
+        '''
+        Slows down the host and pauses it for an exponentially growing, jittered delay.
+
+        Args:
+        -------
+        - `blocked` (bool, optional): The response was a captcha or a block, which slows the host down more than an error
+
+        Returns:
+        -------
+        - `float`: The seconds the host is paused
+        '''
+
+        with self.lock:
+            self.failures += 1
+            self.rate = max(MIN_RATE, self.rate * (BLOCK_DECREASE if blocked else ERROR_DECREASE))
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self.failures))
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.tokens = 0.0
+            self.record()
+        return delay
+
+    def miss(self) -> None:
+        # The host answered, but the url has nothing to return: neither the rate nor the backoff changes
+        with self.lock:
+            self.record()
+
+    def record(self) -> None:
+        now = time.monotonic()
+        self.completed.append(now)
+        while self.completed and self.completed[0] < now - RATE_WINDOW:
+            self.completed.popleft()
+        METRICS.gauge('scheduler_rate', round(self.rate, 3), host=self.host)
+
+    def effective_rate(self) -> float:
+        '''
+        Returns the requests per second actually completed over the last `RATE_WINDOW` seconds.
+        '''
+
+        with self.lock:
+            now = time.monotonic()
+            recent = [t for t in self.completed if t >= now - RATE_WINDOW]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(now - recent[0], 1e-9)
+
+    def summary(self) -> dict:
+        return {'rate': round(self.rate, 3), 'effective': round(self.effective_rate(), 3),
+                'latency': round(self.latency, 3) if self.latency is not None else None, 'failures': self.failures}
+
+class Scheduler:
+    '''
+    Sends the navigation of every scraper through a `HostLimiter` per host, retrying failed requests after backing off.
+
+    Args:
+    -------
+    - `rate`     (float, optional): Initial requests per second of every host
+    - `burst`    (int, optional):   Requests which may be sent at once after a host was idle
+    - `retries`  (int, optional):   Attempts of a request after the first one fails
+    - `max_rate` (float, optional): Upper bound of the rate of every host
+
+    Methods:
+    -------
+    - `limiter()`: Returns the limiter of the host of a url
+    - `run()`:     Runs a request once the host allows it, adapting the rate to its outcome
+    - `summary()`: Returns the current and effective rate of every host
+    '''
+
+    def __init__(self, rate: float = INITIAL_RATE, burst: int = BURST, retries: int = MAX_RETRIES, max_rate: float = MAX_RATE):
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.max_rate = max_rate
+        self.hosts = {}
+        self.lock = Lock()
+
+    def limiter(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc or url
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(host, self.rate, self.burst, self.max_rate)
+            return self.hosts[host]
+
+    def run(self, url: str, request, failed = None, blocked = None, missing = None):
+        '''
+        Runs a request once the host of its url allows it. Requests which raise a host error (see `is_host_error()`), fail
+        or are blocked slow the host down, pause it with an exponential backoff and are retried. Any other exception, such as
+        a lost browser session, is raised at once without holding it against the host. Missing results are a permanent miss of the url, which is
+        neither retried nor held against the host.
+
+        Args:
+        -------
+        - `url`     (str):                The url requested, its host is paced
+        - `request` (callable):           Function sending the request, returning its result
+        - `failed`  (callable, optional): Function receiving the result, returning True if the request failed
+        - `blocked` (callable, optional): Function receiving the result, returning True if a captcha or a block was returned
+        - `missing` (callable, optional): Function receiving the result, returning True if the url has nothing to return
+
+        Returns:
+        -------
+        - The result of the last attempt. The exception of the last attempt is raised if it raised one
+        '''
+
+        limiter = self.limiter(url)
+        for attempt in range(self.retries + 1):
+            limiter.acquire()
+            start = time.perf_counter()
+            error = None
+            try:
+                result = request()
+            except Exception as e:
+                if not is_host_error(e):
+                    raise
+                error, outcome = e, 'error'
+            else:
+                if blocked is not None and blocked(result):
+                    outcome = 'blocked'
+                elif failed is not None and failed(result):
+                    outcome = 'error'
+                elif missing is not None and missing(result):
+                    limiter.miss()
+                    METRICS.count('scheduler_missing', host=limiter.host)
+                    return result
+                else:
+                    limiter.success(time.perf_counter() - start)
+                    return result
+
+            limiter.failure(blocked=outcome == 'blocked')
+            METRICS.count(f'scheduler_{outcome}', host=limiter.host)
+
+        if error is not None:
+            raise error
+        return result
+
+    def summary(self) -> dict:
+        with self.lock:
+            limiters = list(self.hosts.values())
+        return {limiter.host: limiter.summary() for limiter in limiters}
+
+# Scheduler shared by the scrapers of a run, so that all sessions of a portal share its rate
+SCHEDULER = Scheduler()
@@ -0,0 +1,204 @@
+from classify import LABELS, MODEL_PATH, TRAINING_DATA, load_dataset
+from scrapers.common import pprint
+import numpy as np
+import argparse
+import time
+import os
+
+# Upper bound of the n-gram ranges `(1, n)` compared for the TF-IDF features, as in notebook 3
+MAX_NGRAM = 10
+
+# Cross validation folds and score used to compare the models
+CV = 10
+SCORING = 'f1_micro'
+
+# Successive halving: the share of candidates kept after each iteration is 1 / HALVING_FACTOR
+HALVING_FACTOR = 3
+
+# Directory caching the TF-IDF vectorizers fitted on each training fold between models, candidates and runs
+CACHE_DIR = '../.cache/selection'
+
+# Hyperparameters of notebook 3. Parameters which do not change the predictions, such as `n_jobs`, `warm_start`,
+# `oob_score`, `probability` or `decision_function_shape`, are left out as they only multiplied the size of the grids
+PARAM_GRIDS = {
+    'MultinomialNB':          {'alpha': np.arange(0.01, 1, 0.01)},
+    'SVC':                    {'random_state': [0], 'C': np.arange(0.01, 1, 0.01), 'kernel': ['rbf', 'linear'],
+                               'gamma': ['scale', 'auto']},
+    'LinearSVC':              {'random_state': [0], 'dual': [True], 'C': np.arange(0.01, 1, 0.01),
+                               'multi_class': ['ovr', 'crammer_singer']},
+    'RandomForestClassifier': {'random_state': [0], 'n_estimators': [50, 100, 200], 'min_samples_leaf': [1, 2],
+                               'max_depth': [None, 5], 'min_samples_split': [2, 5]},
+    'LogisticRegression':     {'random_state': [0], 'C': np.arange(0.01, 1, 0.01), 'max_iter': [1000]}
+}
+
+def make_models() -> dict:
+    '''
+    Creates the models compared by notebook 3.
+    '''
+
+    from sklearn.naive_bayes import MultinomialNB
+    from sklearn.svm import SVC, LinearSVC
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    models = [MultinomialNB(), SVC(), LinearSVC(dual=False), RandomForestClassifier(), LogisticRegression(max_iter=1000)]
+    return {model.__class__.__name__: model for model in models}
+
+def make_vectorizer(ngram_range: tuple):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(sublinear_tf=True, ngram_range=ngram_range, stop_words='english')
+
+def make_pipeline(ngram_range: tuple, model, memory = None):
+    '''
+    Chains the TF-IDF vectorizer and a model, so that cross validation fits the vectorizer on the training folds only.
+    '''
+
+    from sklearn.pipeline import Pipeline
+    return Pipeline([('tfidf', make_vectorizer(ngram_range)), ('model', model)], memory=memory)
+
+class ModelSelection:
+    '''
+    Searches the n-gram range, model and hyperparameters of the skill classifier, using every core.
+
+    Every model is cross validated as a pipeline with its TF-IDF vectorizer, so the vocabulary and IDF weights of a
+    held-out fold never reach the training. The vectorizer fitted on each training fold is cached on disk by the
+    pipeline, so that the other models, candidates and later runs on the same fold reuse it instead of fitting it
+    again. Folds and candidates are evaluated in parallel, and the hyperparameter grids are searched with successive
+    halving instead of evaluating every candidate on all data.
+
+    Args:
+    -------
+    - `chunks`    (Series | list):  The noun chunks
+    - `labels`    (Series | list):  Their numeric labels, see `LABELS`
+    - `n_jobs`    (int, optional):  Number of parallel jobs, -1 uses every core
+    - `cache_dir` (str, optional):  Directory caching the fitted vectorizers, None fits them every time
+
+    Methods:
+    -------
+    - `compare_ngrams()`: Scores every model on every n-gram range
+    - `search()`:         Searches the hyperparameters of every model
+    - `save_best()`:      Fits the best pipeline on all data and saves it
+    '''
+
+    def __init__(self, chunks, labels, n_jobs: int = -1, cache_dir: str = CACHE_DIR):
+        self.name = self.__class__.__name__
+        self.chunks = list(chunks)
+        self.labels = np.asarray(labels)
+        self.n_jobs = n_jobs
+        self.timings = []
+        self.results = {}
+
+        if cache_dir:
+            import joblib
+            self.memory = joblib.Memory(cache_dir, verbose=0)
+        else:
+            self.memory = None
+
+    def compare_ngrams(self, max_ngram: int = MAX_NGRAM, cv: int = CV) -> dict:
+        '''
+        Scores each model with cross validation on every n-gram range `(1, n)` of the features.
+
+        Returns:
+        -------
+        - `dict`: For each n-gram range, the mean score of each model
+        '''
+
+        from sklearn.model_selection import cross_val_score
+
+        scores = {}
+        for n in range(1, max_ngram + 1):
+            scores[(1, n)] = {}
+            for name, model in make_models().items():
+                start = time.time()
+                pipeline = make_pipeline((1, n), model, self.memory)
+                score = cross_val_score(pipeline, self.chunks, self.labels, cv=cv, scoring=SCORING, n_jobs=self.n_jobs).mean()
+                self.timings.append({'step': 'ngrams', 'ngram_range': (1, n), 'model': name, 'seconds': round(time.time() - start, 3)})
+                scores[(1, n)][name] = round(float(score), 5)
+            pprint(msg=f'F1-score of n-gram range {n}: {scores[(1, n)]}', type=1, prefix=self.name)
+        return scores
+
+    def search(self, ngram_range: tuple, models: list = None, cv: int = CV, factor: int = HALVING_FACTOR) -> dict:
+        '''
+        Searches the hyperparameters of each model with `HalvingGridSearchCV`.
+
+        Args:
+        -------
+        - `ngram_range` (tuple):          The n-gram range of the TF-IDF vectorizer
+        - `models`      (list, optional): Names of the models to be searched, all of `PARAM_GRIDS` by default
+        - `cv`          (int, optional):  Number of cross validation folds
+        - `factor`      (int, optional):  Only the best `1 / factor` of the candidates are kept after each iteration
+
+        Returns:
+        -------
+        - `dict`: For each model its best score, best parameters, wall time and the timings of every candidate
+        '''
+
+        from sklearn.experimental import enable_halving_search_cv
+        from sklearn.model_selection import HalvingGridSearchCV
+
+        available = make_models()
+        for name in models or PARAM_GRIDS:
+            grid = {f'model__{param}': values for param, values in PARAM_GRIDS[name].items()}
+            search = HalvingGridSearchCV(make_pipeline(ngram_range, available[name], self.memory), grid, factor=factor, cv=cv,
+                                         scoring=SCORING, n_jobs=self.n_jobs, random_state=0)
+            start = time.time()
+            search.fit(self.chunks, self.labels)
+            elapsed = round(time.time() - start, 2)
+
+            candidates = [{'params': params, 'iteration': int(iteration), 'n_resources': int(resources),
+                           'score': round(float(score), 5), 'fit_time': round(float(fit_time), 4), 'score_time': round(float(score_time), 4)}
+                          for params, iteration, resources, score, fit_time, score_time in zip(
+                              search.cv_results_['params'], search.cv_results_['iter'], search.cv_results_['n_resources'],
+                              search.cv_results_['mean_test_score'], search.cv_results_['mean_fit_time'], search.cv_results_['mean_score_time'])]
+
+            params = {param.removeprefix('model__'): value for param, value in search.best_params_.items()}
+            self.results[name] = {'ngram_range': ngram_range, 'score': round(float(search.best_score_), 5), 'params': params,
+                                  'estimator': search.best_estimator_, 'seconds': elapsed, 'candidates': candidates}
+            self.timings.append({'step': 'search', 'ngram_range': ngram_range, 'model': name, 'seconds': elapsed,
+                                 'candidates': len(candidates)})
+            pprint(msg=f'Search for {name} finished after {elapsed} seconds over {len(candidates)} fits. '
+                       f'Best score {self.results[name]["score"]} with {params}', type=1, prefix=self.name)
+        return self.results
+
+    def save_best(self, model_path: str = MODEL_PATH):
+        '''
+        Fits the vectorizer and the best model found by `search()` on all noun chunks and saves them as a single pipeline,
+        ready to be used by `classify.py`.
+
+        Returns:
+        -------
+        - `Pipeline`: The saved pipeline
+        '''
+
+        import joblib
+        from sklearn.base import clone
+
+        name, best = max(self.results.items(), key=lambda item: item[1]['score'])
+        pipeline = make_pipeline(best['ngram_range'], clone(best['estimator'].named_steps['model']))
+        pipeline.fit(self.chunks, self.labels)
+
+        os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+        joblib.dump(pipeline, model_path)
+        pprint(msg=f'Saved {name} with a score of {best["score"]} to {model_path}', type=1, prefix=self.name)
+        return pipeline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Select and save the best skill classifier of notebook 3.')
+    parser.add_argument('--data', default=TRAINING_DATA)
+    parser.add_argument('--model', default=MODEL_PATH, help='File the best pipeline is saved to')
+    parser.add_argument('--max-ngram', type=int, default=MAX_NGRAM)
+    parser.add_argument('--models', nargs='+', choices=list(PARAM_GRIDS), help='Only search these models')
+    parser.add_argument('--cv', type=int, default=CV)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    selection = ModelSelection(*load_dataset(args.data), n_jobs=args.n_jobs, cache_dir=args.cache_dir)
+    scores = selection.compare_ngrams(args.max_ngram, args.cv)
+    best_ngram_range = max(scores, key=lambda ngram_range: np.mean(list(scores[ngram_range].values())))
+
+    selection.search(best_ngram_range, args.models, args.cv)
+    selection.save_best(args.model)
+
+    for timing in selection.timings:
+        print(timing)
@@ -0,0 +1,231 @@
+import numpy as np
+
+# Number of sequences turned into training examples at once
+CHUNK_SIZE = 4096
+
+# Sampling factor of the table discarding frequent words, as used by Keras
+SAMPLING_FACTOR = 1e-5
+
+# Shuffle buffer and batch size of the training dataset, as used by the notebooks
+BUFFER_SIZE = 5000
+BATCH_SIZE = 1024
+
+def make_sampling_table(size: int, sampling_factor: float = SAMPLING_FACTOR) -> np.ndarray:
+    '''
+    Same as `tf.keras.preprocessing.sequence.make_sampling_table()`: the probability of keeping each word,
+    assuming the vocabulary is sorted by frequency and the frequencies follow Zipf's law.
+
+    Args:
+    -------
+    - `size`            (int):             The size of the vocabulary
+    - `sampling_factor` (float, optional): Lower values discard more of the frequent words
+
+    Returns:
+    -------
+    - `ndarray`: The probability of keeping the word of each index
+    '''
+
+    gamma = 0.577
+    rank = np.arange(size, dtype=np.float64)
+    rank[0] = 1
+    inv_fq = rank * (np.log(rank) + gamma) + 0.5 - 1. / (12. * rank)
+    f = sampling_factor * inv_fq
+    return np.minimum(1., f / np.sqrt(f))
+
+def positive_pairs(sequences: np.ndarray, window_size: int, sampling_table: np.ndarray = None, rng = None) -> tuple:
+    '''
+    Vectorized version of `tf.keras.preprocessing.sequence.skipgrams()` without negative samples,
+    working on a whole matrix of padded sequences at once.
+
+    Each word is paired with every word at most `window_size` positions away. Padding (index 0) is
+    skipped and, given a `sampling_table`, target words are dropped with the probability of the table.
+
+    Args:
+    -------
+    - `sequences`      (ndarray):           Integer encoded sequences, one per row, padded with 0
+    - `window_size`    (int):               How many words before and after a target word are used as context
+    - `sampling_table` (ndarray, optional): The probability of keeping each word as a target, see `make_sampling_table()`
+    - `rng`            (Generator, optional): Random generator used for the sampling
+
+    Returns:
+    -------
+    - `tuple`: The target and context words of the pairs, as two arrays
+    '''
+
+    rng = rng if rng is not None else np.random.default_rng()
+    sequences = np.asarray(sequences)
+    length = sequences.shape[1]
+
+    keep = sequences > 0
+    if sampling_table is not None:
+        keep &= sampling_table[sequences] >= rng.random(sequences.shape)
+
+    targets, contexts = [], []
+    for offset in range(-window_size, window_size + 1):
+        if offset == 0 or abs(offset) >= length:
+            continue
+
+        # Align every target with the word `offset` positions away from it
+        start, end = max(0, -offset), length - max(0, offset)
+        target = sequences[:, start:end]
+        context = sequences[:, start + offset:end + offset]
+        mask = keep[:, start:end] & (context > 0)
+
+        targets.append(target[mask])
+        contexts.append(context[mask])
+
+    if not targets:
+        return np.empty(0, dtype=sequences.dtype), np.empty(0, dtype=sequences.dtype)
+    return np.concatenate(targets), np.concatenate(contexts)
+
+def negative_samples(amount: int, num_ns: int, vocab_size: int, rng = None, oversample: int = 2) -> np.ndarray:
+    '''
+    Vectorized version of `tf.random.log_uniform_candidate_sampler()` with `unique=True`, drawing the
+    negative samples of many pairs at once.
+
+    Args:
+    -------
+    - `amount`     (int):                 Number of pairs needing negative samples
+    - `num_ns`     (int):                 Number of distinct negative samples of each pair
+    - `vocab_size` (int):                 The samples are drawn from `[0, vocab_size)`, favouring lower (more frequent) indexes
+    - `rng`        (Generator, optional): Random generator used for the sampling
+    - `oversample` (int, optional):       How many candidates are drawn per sample, rows with too many duplicates are drawn again
+
+    Returns:
+    -------
+    - `ndarray`: Matrix of `amount` rows with `num_ns` distinct indexes each
+    '''
+
+    if num_ns > vocab_size:
+        raise ValueError(f'Cannot draw {num_ns} distinct negative samples from {vocab_size} words')
+
+    rng = rng if rng is not None else np.random.default_rng()
+    log_range = np.log(vocab_size + 1)
+    samples = np.empty((amount, num_ns), dtype=np.int64)
+    pending = np.arange(amount)
+
+    while len(pending):
+        candidates = (np.exp(rng.random((len(pending), num_ns * oversample)) * log_range) - 1).astype(np.int64)
+        candidates = np.minimum(candidates, vocab_size - 1)
+
+        # Flag every candidate already drawn earlier in its row, a stable sort keeps the first occurrence first
+        order = np.argsort(candidates, axis=1, kind='stable')
+        ordered = np.take_along_axis(candidates, order, axis=1)
+        duplicate = np.zeros_like(candidates, dtype=bool)
+        np.put_along_axis(duplicate, order[:, 1:], ordered[:, 1:] == ordered[:, :-1], axis=1)
+
+        # Keep the first `num_ns` distinct candidates of each row, in the order they were drawn
+        rank = np.cumsum(~duplicate, axis=1)
+        complete = rank[:, -1] >= num_ns
+        selected = ~duplicate & (rank <= num_ns) & complete[:, None]
+        samples[pending[complete]] = candidates[selected].reshape(-1, num_ns)
+
+        pending = pending[~complete]
+        oversample *= 2
+
+    return samples
+
+def pad_sequences(sequences) -> np.ndarray:
+    '''
+    Stacks sequences of different lengths into a matrix, padding them with 0.
+    '''
+
+    length = max((len(sequence) for sequence in sequences), default=0)
+    matrix = np.zeros((len(sequences), length), dtype=np.int64)
+    for i, sequence in enumerate(sequences):
+        matrix[i, :len(sequence)] = sequence
+    return matrix
+
+def iter_chunks(sequences, chunk_size: int):
+    '''
+    Splits the sequences into padded matrices of at most `chunk_size` rows.
+    '''
+
+    if isinstance(sequences, np.ndarray) and sequences.ndim == 2:
+        for start in range(0, len(sequences), chunk_size):
+            yield sequences[start:start + chunk_size]
+        return
+
+    chunk = []
+    for sequence in sequences:
+        chunk.append(sequence)
+        if len(chunk) >= chunk_size:
+            yield pad_sequences(chunk)
+            chunk = []
+    if chunk:
+        yield pad_sequences(chunk)
+
+def generate_training_data(sequences, window_size: int, num_ns: int, vocab_size: int, seed: int = None,
+                           chunk_size: int = CHUNK_SIZE, sampling_table: np.ndarray = None):
+    '''
+    Generates skip-gram pairs with negative sampling for integer encoded sequences, one chunk of sequences at a time.
+
+    Produces the same kind of training examples as the notebook version, which drew the negative samples of each
+    pair separately: every example is a target word, its context word followed by `num_ns` negative samples, and
+    the labels `[1, 0, ..., 0]`.
+
+    Args:
+    -------
+    - `sequences`      (ndarray | iterable): Matrix of padded sequences, e.g. the output of `TextVectorization`, or any iterable of sequences
+    - `window_size`    (int):                How many words before and after a target word are used as context
+    - `num_ns`         (int):                Number of negative samples of each pair
+    - `vocab_size`     (int):                The size of the vocabulary
+    - `seed`           (int, optional):      Seed of the random generator
+    - `chunk_size`     (int, optional):      How many sequences are processed at once
+    - `sampling_table` (ndarray, optional):  The probability of keeping each word as a target, by default `make_sampling_table(vocab_size)`
+
+    Returns:
+    -------
+    - `generator`: Tuples of `(targets, contexts, labels)` arrays for each chunk. The labels are a read-only view
+    '''
+
+    rng = np.random.default_rng(seed)
+    if sampling_table is None:
+        sampling_table = make_sampling_table(vocab_size)
+    label = np.array([1] + [0] * num_ns, dtype=np.int64)
+
+    for chunk in iter_chunks(sequences, chunk_size):
+        targets, context = positive_pairs(chunk, window_size, sampling_table, rng)
+        if not len(targets):
+            continue
+
+        # Shuffle the pairs of the chunk, as `skipgrams()` does for each sequence
+        order = rng.permutation(len(targets))
+        targets, context = targets[order].astype(np.int64), context[order].astype(np.int64)
+
+        contexts = np.empty((len(targets), num_ns + 1), dtype=np.int64)
+        contexts[:, 0] = context
+        contexts[:, 1:] = negative_samples(len(targets), num_ns, vocab_size, rng)
+        yield targets, contexts, np.broadcast_to(label, contexts.shape)
+
+def make_dataset(sequences, window_size: int, num_ns: int, vocab_size: int, seed: int = None,
+                 batch_size: int = BATCH_SIZE, buffer_size: int = BUFFER_SIZE, chunk_size: int = CHUNK_SIZE):
+    '''
+    Creates the `tf.data` dataset training the Word2Vec model straight from `generate_training_data()`,
+    so that the training examples are never collected in memory.
+
+    The sequences are read again on every epoch, so they have to be a collection such as a list or an array, or an
+    object whose `__iter__` starts over, e.g. a query on the database. Iterators and generators are rejected, as they
+    would be exhausted after the first epoch and every later one would be empty.
+
+    Returns:
+    -------
+    - `Dataset`: Batches of `((targets, contexts), labels)`
+    '''
+
+    if iter(sequences) is sequences:
+        raise TypeError('The sequences are read on every epoch, pass a list, an array or another re-iterable collection '
+                        'instead of an iterator or a generator')
+
+    import tensorflow as tf
+
+    def generator():
+        for targets, contexts, labels in generate_training_data(sequences, window_size, num_ns, vocab_size, seed, chunk_size):
+            yield (targets, contexts), labels
+
+    signature = (
+        (tf.TensorSpec(shape=(None,), dtype=tf.int64), tf.TensorSpec(shape=(None, num_ns + 1), dtype=tf.int64)),
+        tf.TensorSpec(shape=(None, num_ns + 1), dtype=tf.int64)
+    )
+    dataset = tf.data.Dataset.from_generator(generator, output_signature=signature).unbatch()
+    return dataset.shuffle(buffer_size).batch(batch_size, drop_remainder=True).prefetch(tf.data.AUTOTUNE)
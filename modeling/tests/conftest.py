@@ -0,0 +1,40 @@
+import warnings
+import json
+import sys
+import os
+import pytest
+
+MODELING_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTEBOOKS_DIR = os.path.join(MODELING_DIR, '..', 'notebooks')
+
+# The modules of the modeling directory import each other as top-level modules, as when run as scripts
+sys.path.insert(0, MODELING_DIR)
+
+def notebook_cell(notebook: str, marker: str) -> str:
+    '''
+    Returns the source of the first code cell of a notebook containing a marker.
+    '''
+
+    with open(os.path.join(NOTEBOOKS_DIR, notebook + '.ipynb'), encoding='utf-8') as f:
+        cells = json.load(f)['cells']
+    for cell in cells:
+        source = ''.join(cell['source'])
+        if cell['cell_type'] == 'code' and marker in source:
+            return source
+    raise LookupError(f'No cell of {notebook} contains {marker!r}')
+
+@pytest.fixture
+def run_notebook_cells():
+    '''
+    Runs code cells of a notebook in a namespace, so that tests compare against the code of the notebooks itself.
+    '''
+
+    def run(notebook: str, markers: list, namespace: dict) -> dict:
+        for marker in markers:
+            # The notebooks use plain strings with regex escapes, which Python warns about
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                code = compile(notebook_cell(notebook, marker), notebook, 'exec')
+            exec(code, namespace)
+        return namespace
+    return run
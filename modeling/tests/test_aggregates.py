@@ -0,0 +1,52 @@
+from aggregates import AggregateStore
+from database import MongoDB
+from datetime import datetime
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+def make_posts() -> list:
+    return [
+        {'_id': 1, 'roles': ['Data Scientist'], 'industry': 'IT', 'level': 'Entry level', 'last_accessed': datetime(2023, 2, 14),
+         'description': 'python sql', 'hard_skills': ['python', 'machine learning'], 'soft_skills': ['teamwork']},
+        {'_id': 2, 'roles': ['Data Analyst'], 'industry': 'IT', 'level': 'Entry level', 'last_accessed': datetime(2023, 2, 14),
+         'description': 'sql excel', 'hard_skills': ['sql', 'excel'], 'soft_skills': ['communication']},
+        {'_id': 3, 'roles': ['Data Scientist', 'ML Engineer'], 'industry': 'Banking', 'last_accessed': datetime(2023, 2, 15),
+         'description': 'python spark', 'hard_skills': ['python', 'spark'], 'soft_skills': ['teamwork']}
+    ]
+
+def counts(store: AggregateStore) -> dict:
+    return {tuple(document['_id'].values()): document['count'] for document in store.counts.find()}
+
+@pytest.fixture
+def database():
+    return MongoDB(client=mongomock.MongoClient(), database='test')
+
+def test_deleted_posts_are_subtracted(database):
+    database.insert_documents(make_posts())
+    store = AggregateStore(database)
+    store.update()
+
+    database.jobs.delete_one({'_id': 3})
+    assert store.update() == 0
+
+    # The counts equal those of a database which never contained the deleted post
+    fresh = MongoDB(client=mongomock.MongoClient(), database='test')
+    fresh.insert_documents(make_posts()[:2])
+    expected = AggregateStore(fresh)
+    expected.update()
+
+    assert counts(store) == counts(expected)
+    assert store.snapshots.count_documents({}) == 2
+    assert store.top('posts') == [('', 2)]
+    assert ('spark', 1) not in store.top('hard_skill', num=0)
+    assert store.top('hard_skill', 'role', 'ML Engineer') == []
+
+def test_prune_without_deleted_posts_keeps_the_counts(database):
+    database.insert_documents(make_posts())
+    store = AggregateStore(database)
+    store.update()
+    before = counts(store)
+
+    assert store.prune() == 0
+    assert counts(store) == before
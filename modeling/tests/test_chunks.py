@@ -0,0 +1,29 @@
+from chunks import ChunkStore
+from database import MongoDB
+import chunks
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+@pytest.fixture
+def store(monkeypatch):
+    # Several batches of ids even for a handful of job posts
+    monkeypatch.setattr(chunks, 'ID_BATCH_SIZE', 2)
+
+    database = MongoDB(client=mongomock.MongoClient(), database='test')
+    database.insert_documents([{'_id': i, 'roles': ['Data Analyst' if i % 2 else 'Data Scientist'], 'description': ''}
+                               for i in range(1, 8)])
+    database.chunks.insert_many([{'_id': i, 'hash': '', 'chunks': [f'skill {i}', f'tool {i}']} for i in range(1, 10)])
+    return ChunkStore(database)
+
+def test_filtered_chunks_are_read_in_batches(store):
+    found = list(store.iter_chunks({'roles': 'Data Analyst'}))
+
+    assert sorted(found) == sorted(f'{kind} {i}' for i in (1, 3, 5, 7) for kind in ('skill', 'tool'))
+
+def test_all_chunks_are_read_without_a_filter(store):
+    assert len(list(store.iter_chunks())) == 18
+
+def test_prune_removes_chunks_of_deleted_posts(store):
+    assert store.prune() == 2
+    assert sorted(document['_id'] for document in store.chunks.find()) == list(range(1, 8))
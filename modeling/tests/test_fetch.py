@@ -0,0 +1,183 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+from portals import PortalServer, make_posts
+from scrapers import fetch, scheduler
+from scrapers.fetch import HttpFetcher, THROTTLE_STATUS
+from scrapers.scheduler import Scheduler
+from scrapers.KarieraScraper import parse_job_page as parse_kariera
+from scrapers.IndeedScraper import parse_job_page as parse_indeed
+from scrapers.LinkedInScraper import parse_job_page as parse_linkedin
+import sys
+import pytest
+
+POSTS = make_posts(40)
+ROLES = ['Data Scientist']
+
+# Url and id of the page of a job post on each stand-in, as collected by `get_job_list()`
+RECORDS = {
+    'kariera':  lambda base, post: (f'{base}en/jobs/{post["id"]}', str(post['id']), ROLES),
+    'indeed':   lambda base, post: (f'{base}viewjob?jk={post["id"]:x}', f'{post["id"]:x}', ROLES),
+    'linkedin': lambda base, post: (f'{base}jobs/view/{post["id"]}', str(post['id']), ROLES)
+}
+
+PARSERS = {'kariera': parse_kariera, 'indeed': parse_indeed, 'linkedin': parse_linkedin}
+
+@pytest.fixture(autouse=True)
+def fast_scheduler(monkeypatch):
+    # The pace of the real portals would make every test take minutes
+    monkeypatch.setattr(fetch, 'SCHEDULER', Scheduler(rate=1000, burst=1000, max_rate=1000))
+    monkeypatch.setattr(scheduler, 'BACKOFF_BASE', 0.001)
+
+@pytest.fixture(scope='module')
+def server():
+    with PortalServer(POSTS) as server:
+        yield server
+
+def extract(portal: str, job_list: list) -> tuple:
+    fetcher = HttpFetcher(workers=4, portal=portal)
+    try:
+        return fetcher.extract(job_list, PARSERS[portal])
+    finally:
+        fetcher.close()
+
+@pytest.mark.parametrize('portal', list(PARSERS))
+def test_extracts_every_job_post(server, portal):
+    base = server.base_url(portal)
+    job_list = [RECORDS[portal](base, post) for post in POSTS]
+
+    job_data, remaining = extract(portal, job_list)
+
+    assert remaining == []
+    assert len(job_data) == len(POSTS)
+
+    posts = {job_record[0]: post for job_record, post in zip(job_list, POSTS)}
+    for job in job_data:
+        post = posts[job['url']]
+        assert job['title'] == post['title']
+        assert job['company'] == post['company']
+        assert job['location'] == post['location']
+        assert job['type'] == post['type']
+        assert job['description'] == post['description']
+        assert job['roles'] == ROLES
+        assert job['url'].startswith(base)
+
+        # Indeed does not show the level, industry and workplace of a job post
+        if portal != 'indeed':
+            assert (job['level'], job['industry'], job['workplace']) == (post['level'], post['industry'], post['workplace'])
+
+@pytest.mark.parametrize('portal', list(PARSERS))
+def test_missing_pages_fall_back_to_the_browser(server, portal):
+    base = server.base_url(portal)
+    missing = RECORDS[portal](base, {'id': 999999})
+    job_list = [RECORDS[portal](base, POSTS[0]), missing]
+
+    job_data, remaining = extract(portal, job_list)
+
+    assert len(job_data) == 1
+    assert remaining == [missing]
+
+def test_unparsable_pages_fall_back_to_the_browser(server):
+    # A page of another portal lacks the fields of the parser
+    job_list = [RECORDS['indeed'](server.base_url('indeed'), post) for post in POSTS[:3]]
+
+    fetcher = HttpFetcher(workers=2, portal='kariera')
+    try:
+        job_data, remaining = fetcher.extract(job_list, parse_kariera)
+    finally:
+        fetcher.close()
+
+    assert job_data == []
+    assert remaining == job_list
+
+@pytest.mark.parametrize('portal', ['KarieraScraper', 'IndeedScraper', 'LinkedInScraper'])
+def test_empty_fields_are_kept(portal):
+    # `scrapers` exports the classes under the names of their modules
+    module = sys.modules[f'scrapers.{portal}']
+    # A field present on the page but without text, e.g. an empty description, is not a missing field
+    fields = {name: '' for name in module.DETAIL_XPATHS}
+    job = module.make_job(fields, ('https://example.com/1', '1', ROLES))
+
+    assert job is not None
+    assert job['description'] == ''
+    assert module.make_job({**fields, 'description': None}, ('https://example.com/1', '1', ROLES)) is None
+
+class StatusServer:
+    '''
+    Answers every request with the same status and body, counting the requests.
+    '''
+
+    def __init__(self, status: int, body: str = '<html><head><title>Jobs</title></head><body></body></html>'):
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/'
+
+    def __enter__(self):
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
+
+@pytest.mark.parametrize('status', sorted(THROTTLE_STATUS))
+def test_throttle_status_backs_off_and_retries(status):
+    with StatusServer(status) as server:
+        fetcher = HttpFetcher(workers=1, portal='kariera')
+        page = fetcher.download(server.url + 'en/jobs/1')
+        fetcher.close()
+
+    limiter = fetch.SCHEDULER.limiter(server.url)
+    assert page is None
+    assert server.requests == fetch.SCHEDULER.retries + 1
+    assert limiter.failures == fetch.SCHEDULER.retries + 1
+    assert limiter.rate < fetch.SCHEDULER.rate
+
+def test_captcha_page_falls_back_to_the_browser():
+    body = '<html><head><title>Security Check</title></head><body>Are you a robot?</body></html>'
+    with StatusServer(200, body) as server:
+        job_list = [(server.url + 'en/jobs/1', '1', ROLES)]
+        fetcher = HttpFetcher(workers=1, portal='kariera')
+        job_data, remaining = fetcher.extract(job_list, parse_kariera)
+        fetcher.close()
+
+    assert job_data == []
+    assert remaining == job_list
+    assert server.requests == fetch.SCHEDULER.retries + 1
+    assert fetch.SCHEDULER.limiter(server.url).failures == fetch.SCHEDULER.retries + 1
+
+@pytest.mark.parametrize('body', ['', ' \n '])
+def test_empty_pages_fall_back_to_the_browser(body):
+    with StatusServer(200, body) as server:
+        job_list = [(server.url + f'en/jobs/{i}', str(i), ROLES) for i in range(3)]
+        fetcher = HttpFetcher(workers=2, portal='kariera')
+        job_data, remaining = fetcher.extract(job_list, parse_kariera)
+        fetcher.close()
+
+    assert job_data == []
+    assert remaining == job_list
+
+def test_client_errors_are_not_retried():
+    with StatusServer(404) as server:
+        fetcher = HttpFetcher(workers=1, portal='kariera')
+        page = fetcher.download(server.url + 'en/jobs/1')
+        fetcher.close()
+
+    assert page is None
+    assert server.requests == 1
+    assert fetch.SCHEDULER.limiter(server.url).failures == 0
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+from benchmark import make_descriptions
+from conftest import NOTEBOOKS_DIR
+from preprocessing import clean_description, clean_descriptions, iter_clean, standardize, standardize_batch
+import pandas as pd
+import pytest
+import os
+import re
+
+DESCRIPTIONS = make_descriptions(500) + ['', 'e.g.', 'Contact: a.b-c@mail.example.gr\n\n\nhttp://x.io/a_b #ml C++ & C#']
+
+# Stand-in of the `tf.strings` functions used by `custom_standardization()` in the notebooks
+TF = SimpleNamespace(strings=SimpleNamespace(lower=lambda text: text.lower(),
+                                             regex_replace=lambda text, pattern, value: re.sub(pattern, value, text)))
+
+@pytest.fixture(scope='module')
+def chunks():
+    data = pd.read_csv(os.path.join(NOTEBOOKS_DIR, 'noun_chunks_classified.csv'))
+    return list(data['chunks'].astype(str)) + ['E.g. Python', 'i.e. SQL', 'eXgY skills', 'ideas', 'jobs@example.com', '#hiring ML']
+
+def test_clean_descriptions_match_notebook(run_notebook_cells):
+    namespace = run_notebook_cells('2_create_training_dataset', ['def remove_greek', 'replacements = {'],
+                                   {'df': pd.DataFrame({'description': DESCRIPTIONS})})
+    expected = namespace['df']['description']
+
+    assert list(clean_descriptions(pd.Series(DESCRIPTIONS))) == list(expected)
+    assert [clean_description(text) for text in DESCRIPTIONS] == list(expected)
+    assert list(iter_clean(iter(DESCRIPTIONS))) == list(expected)
+
+def test_clean_descriptions_keep_index_and_missing_values():
+    series = pd.Series(['e.g. Python!', None], index=[10, 20])
+    cleaned = clean_descriptions(series)
+
+    assert list(cleaned.index) == [10, 20]
+    assert cleaned[10] == ' Python '
+    assert pd.isna(cleaned[20])
+
+@pytest.mark.parametrize('notebook, model', [('4_word2vec', 'word2vec'), ('5_we_conv', 'conv'), ('6_we_lstm', 'lstm')])
+def test_standardize_matches_notebook(run_notebook_cells, chunks, notebook, model):
+    custom_standardization = run_notebook_cells(notebook, ['def custom_standardization'], {'tf': TF})['custom_standardization']
+    expected = [custom_standardization(chunk) for chunk in chunks]
+
+    assert [standardize(chunk, model) for chunk in chunks] == expected
+    assert list(standardize_batch(pd.Series(chunks), model)) == expected
+
+def test_standardization_differs_between_notebooks():
+    # Notebooks 5 and 6 remove any three characters starting with `e` and a following `g`, notebook 4 only examples
+    assert standardize('eXgY skills', 'conv') == ' skills'
+    assert standardize('eXgY skills', 'word2vec') == 'exgy skills'
@@ -0,0 +1,31 @@
+from benchmark import filter_job_reference, make_titles
+from scrapers.common import filter_job, match_roles
+import pytest
+
+TITLES = make_titles(5000, seed=0)
+
+EDGE_CASES = ['', ' ', '  Data Scientist  ', '\tAI Engineer\n', 'AI', '(AI)', 'Email Marketing', 'Maintenance',
+              'DATA SCIENTIST', 'dAtA sCiEnTiSt', 'data analyst', 'Ml Engineer', 'mlops', 'Data-Scientist',
+              'Data Scientist / Machine Learning Engineer | AI - Data Engineer', 'Deep Learning and ML Ops Data Analyst',
+              'Machine Learning Engineer, Artificial Intelligence', 'Data\nScientist', 'Senior AI/ML Engineer']
+
+@pytest.mark.parametrize('title', EDGE_CASES)
+def test_edge_cases_match_reference(title):
+    assert filter_job(title) == filter_job_reference(title)
+
+def test_titles_match_reference():
+    match_roles.cache_clear()
+    mismatches = [title for title in TITLES if filter_job(title) != filter_job_reference(title)]
+
+    assert mismatches == []
+
+def test_cached_results_match_reference():
+    # The second pass is answered by the cache of `match_roles()`
+    for title in TITLES[:500] * 2:
+        assert filter_job(title) == filter_job_reference(title)
+
+def test_several_roles_are_reported_in_order():
+    title = 'Data Scientist / Machine Learning Engineer | AI - Data Engineer'
+
+    assert filter_job(title) == ['Data Scientist', 'ML Engineer', 'ML Engineer', 'Data Engineer']
+    assert filter_job('Sales Associate') == []
@@ -0,0 +1,73 @@
+from selenium.common.exceptions import InvalidSessionIdException, NoSuchElementException, TimeoutException, WebDriverException
+from scrapers import scheduler
+from scrapers.scheduler import Scheduler
+import requests
+import pytest
+
+URL = 'https://example.com/jobs/1'
+
+@pytest.fixture
+def fast_scheduler(monkeypatch):
+    monkeypatch.setattr(scheduler, 'BACKOFF_BASE', 0.001)
+    return Scheduler(rate=1000, burst=1000, max_rate=1000)
+
+def run(fast_scheduler, result, **outcomes) -> int:
+    attempts = []
+    def request():
+        attempts.append(1)
+        return result
+    assert fast_scheduler.run(URL, request, **outcomes) == result
+    return len(attempts)
+
+def test_missing_results_are_not_retried_nor_held_against_the_host(fast_scheduler):
+    attempts = run(fast_scheduler, False, blocked=lambda ready: False, missing=lambda ready: not ready)
+    limiter = fast_scheduler.limiter(URL)
+
+    assert attempts == 1
+    assert limiter.failures == 0
+    assert limiter.rate == fast_scheduler.rate
+    assert limiter.paused_until == 0.0
+
+def test_blocked_results_are_retried_before_missing(fast_scheduler):
+    attempts = run(fast_scheduler, False, blocked=lambda ready: True, missing=lambda ready: not ready)
+    limiter = fast_scheduler.limiter(URL)
+
+    assert attempts == fast_scheduler.retries + 1
+    assert limiter.failures == fast_scheduler.retries + 1
+    assert limiter.rate < fast_scheduler.rate
+
+def test_failed_results_are_retried(fast_scheduler):
+    attempts = run(fast_scheduler, False, failed=lambda ready: not ready)
+
+    assert attempts == fast_scheduler.retries + 1
+    assert fast_scheduler.limiter(URL).failures == fast_scheduler.retries + 1
+
+def raise_error(fast_scheduler, error) -> int:
+    attempts = []
+    def request():
+        attempts.append(1)
+        raise error
+    with pytest.raises(type(error)):
+        fast_scheduler.run(URL, request)
+    return len(attempts)
+
+@pytest.mark.parametrize('error', [requests.ConnectionError('reset'), TimeoutException('timeout'),
+                                   WebDriverException('unknown error: net::ERR_CONNECTION_RESET')])
+def test_network_errors_are_retried(fast_scheduler, error):
+    attempts = raise_error(fast_scheduler, error)
+    limiter = fast_scheduler.limiter(URL)
+
+    assert attempts == fast_scheduler.retries + 1
+    assert limiter.failures == fast_scheduler.retries + 1
+    assert limiter.rate < fast_scheduler.rate
+
+@pytest.mark.parametrize('error', [InvalidSessionIdException('invalid session id'), NoSuchElementException('button'),
+                                   WebDriverException('disconnected: not connected to DevTools'), ValueError('bug')])
+def test_session_errors_are_raised_at_once(fast_scheduler, error):
+    attempts = raise_error(fast_scheduler, error)
+    limiter = fast_scheduler.limiter(URL)
+
+    assert attempts == 1
+    assert limiter.failures == 0
+    assert limiter.rate == fast_scheduler.rate
+    assert limiter.paused_until == 0.0
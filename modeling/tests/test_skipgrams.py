@@ -0,0 +1,109 @@
+from benchmark import make_sequences
+from skipgrams import generate_training_data, make_dataset, make_sampling_table, negative_samples, pad_sequences, positive_pairs
+from collections import Counter
+import numpy as np
+import pytest
+
+VOCAB_SIZE = 500
+WINDOW_SIZE = 2
+NUM_NS = 4
+
+SEQUENCES = make_sequences(2000, VOCAB_SIZE, 18)
+
+def reference_pairs(sequences, window_size: int) -> Counter:
+    # The loop of `tf.keras.preprocessing.sequence.skipgrams()` used by notebook 4, without subsampling
+    return Counter((wi, sequence[j]) for sequence in sequences for i, wi in enumerate(sequence) if wi
+                   for j in range(max(0, i - window_size), min(len(sequence), i + window_size + 1)) if j != i and sequence[j])
+
+def reference_negatives(amount: int, num_ns: int, vocab_size: int, seed: int = 0) -> np.ndarray:
+    # `tf.random.log_uniform_candidate_sampler(unique=True)` one pair at a time, as in notebook 4
+    rng = np.random.default_rng(seed)
+    log_range = np.log(vocab_size + 1)
+    samples = []
+    for _ in range(amount):
+        row = []
+        while len(row) < num_ns:
+            candidate = min(int(np.exp(rng.random() * log_range)) - 1, vocab_size - 1)
+            if candidate not in row:
+                row.append(candidate)
+        samples.append(row)
+    return np.array(samples)
+
+@pytest.mark.parametrize('window_size', [1, WINDOW_SIZE, 5])
+def test_positive_pairs_match_reference(window_size):
+    targets, contexts = positive_pairs(SEQUENCES, window_size)
+
+    assert Counter(zip(targets.tolist(), contexts.tolist())) == reference_pairs(SEQUENCES.tolist(), window_size)
+
+def test_positive_pairs_of_unpadded_sequences():
+    sequences = [[3, 4, 5], [6], [7, 8]]
+    targets, contexts = positive_pairs(pad_sequences(sequences), 1)
+
+    assert Counter(zip(targets.tolist(), contexts.tolist())) == reference_pairs(sequences, 1)
+
+def test_subsampling_drops_frequent_targets():
+    table = make_sampling_table(VOCAB_SIZE)
+    targets, _ = positive_pairs(SEQUENCES, WINDOW_SIZE, table, np.random.default_rng(0))
+    all_targets, _ = positive_pairs(SEQUENCES, WINDOW_SIZE)
+
+    kept = np.bincount(targets, minlength=VOCAB_SIZE) / np.maximum(np.bincount(all_targets, minlength=VOCAB_SIZE), 1)
+    assert kept[1] == pytest.approx(table[1], abs=0.02)
+    assert kept[2] == pytest.approx(table[2], abs=0.02)
+
+def test_sampling_table_matches_keras():
+    tf = pytest.importorskip('tensorflow')
+    expected = tf.keras.preprocessing.sequence.make_sampling_table(VOCAB_SIZE)
+
+    np.testing.assert_allclose(make_sampling_table(VOCAB_SIZE), expected)
+
+def test_positive_pairs_match_keras():
+    tf = pytest.importorskip('tensorflow')
+    expected = Counter()
+    for sequence in SEQUENCES[:200]:
+        couples, _ = tf.keras.preprocessing.sequence.skipgrams(sequence, VOCAB_SIZE, window_size=WINDOW_SIZE,
+                                                               negative_samples=0, shuffle=False)
+        expected.update(map(tuple, couples))
+    targets, contexts = positive_pairs(SEQUENCES[:200], WINDOW_SIZE)
+
+    assert Counter(zip(targets.tolist(), contexts.tolist())) == expected
+
+def test_negative_samples_are_distinct_and_log_uniform():
+    samples = negative_samples(20000, NUM_NS, VOCAB_SIZE, np.random.default_rng(0))
+    expected = reference_negatives(20000, NUM_NS, VOCAB_SIZE)
+
+    assert samples.shape == (20000, NUM_NS)
+    assert samples.min() >= 0 and samples.max() < VOCAB_SIZE
+    assert all(len(set(row)) == NUM_NS for row in samples.tolist())
+
+    frequencies = np.bincount(samples.ravel(), minlength=VOCAB_SIZE) / samples.size
+    expected_frequencies = np.bincount(expected.ravel(), minlength=VOCAB_SIZE) / expected.size
+    np.testing.assert_allclose(frequencies[:10], expected_frequencies[:10], atol=0.005)
+
+def test_negative_samples_need_enough_words():
+    with pytest.raises(ValueError):
+        negative_samples(1, 6, 5)
+
+def test_training_data_examples():
+    pairs = reference_pairs(SEQUENCES.tolist(), WINDOW_SIZE)
+    chunks = list(generate_training_data(SEQUENCES, WINDOW_SIZE, NUM_NS, VOCAB_SIZE, seed=0, chunk_size=300,
+                                         sampling_table=np.ones(VOCAB_SIZE)))
+    targets, contexts, labels = (np.concatenate(arrays) for arrays in zip(*chunks))
+
+    assert Counter(zip(targets.tolist(), contexts[:, 0].tolist())) == pairs
+    assert contexts.shape == labels.shape == (len(targets), NUM_NS + 1)
+    assert (labels == [1] + [0] * NUM_NS).all()
+
+def test_training_data_of_iterables_matches_arrays():
+    from_array = list(generate_training_data(SEQUENCES, WINDOW_SIZE, NUM_NS, VOCAB_SIZE, seed=0, chunk_size=300))
+    from_lists = list(generate_training_data(iter(SEQUENCES.tolist()), WINDOW_SIZE, NUM_NS, VOCAB_SIZE, seed=0, chunk_size=300))
+
+    assert len(from_array) == len(from_lists)
+    for a, b in zip(from_array, from_lists):
+        for x, y in zip(a, b):
+            np.testing.assert_array_equal(x, y)
+
+def test_dataset_rejects_one_shot_iterators():
+    with pytest.raises(TypeError):
+        make_dataset(iter(SEQUENCES), WINDOW_SIZE, NUM_NS, VOCAB_SIZE)
+    with pytest.raises(TypeError):
+        make_dataset((sequence for sequence in SEQUENCES), WINDOW_SIZE, NUM_NS, VOCAB_SIZE)